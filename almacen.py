@@ -0,0 +1,284 @@
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+from collections import defaultdict
+from datetime import datetime
+
+from flask import current_app, send_file
+from sqlalchemy import delete, event, inspect, insert, select, update
+from sqlalchemy.orm import Session
+
+from models import db, Plano, ArchivoPlano
+
+
+# Los archivos se guardan como <2 primeros caracteres>/<sha256><extensión>
+_NOMBRE_DIRECCIONADO = re.compile(r'^[0-9a-f]{2}/([0-9a-f]{64})(\.[a-z0-9]+)?$')
+
+TAMANO_BLOQUE = 1024 * 1024
+
+# Clave en session.info con las rutas cuyo archivo se borrará tras el commit
+_POR_BORRAR = 'archivos_planos_por_borrar'
+
+# Clave en session.info con los archivos movidos al almacén que aún no confirma ningún commit
+_PUBLICADOS = 'archivos_planos_publicados'
+
+
+def carpeta_planos():
+    return os.path.abspath(current_app.config['UPLOAD_FOLDER'])
+
+
+def ruta_absoluta(nombre):
+    """Ruta en disco de un valor de Plano.archivo"""
+    return os.path.join(carpeta_planos(), nombre)
+
+
+def hash_de_nombre(nombre):
+    """Hash SHA-256 contenido en el nombre, o None si es un archivo anterior al almacén por contenido"""
+    coincidencia = _NOMBRE_DIRECCIONADO.match(nombre or '')
+    return coincidencia.group(1) if coincidencia else None
+
+
+def guardar_archivo(flujo, nombre_original):
+    """Guardar un archivo subido por su hash y devolver el valor para Plano.archivo.
+
+    El contenido se lee por bloques calculando el SHA-256 mientras se escribe
+    en un temporal. Si ya existe un archivo con el mismo hash se reutiliza y
+    el temporal se descarta, de modo que subir dos veces el mismo plano no
+    ocupa más disco.
+    """
+    carpeta = carpeta_planos()
+    os.makedirs(carpeta, exist_ok=True)
+
+    sha = hashlib.sha256()
+    descriptor, temporal = tempfile.mkstemp(dir=carpeta, suffix='.subiendo')
+    try:
+        with os.fdopen(descriptor, 'wb') as destino:
+            for bloque in iter(lambda: flujo.read(TAMANO_BLOQUE), b''):
+                sha.update(bloque)
+                destino.write(bloque)
+        return publicar_archivo(temporal, sha.hexdigest(), nombre_original)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+
+def publicar_archivo(ruta_local, codigo, nombre_original):
+    """Mover al almacén un archivo ya completo cuyo SHA-256 es `codigo`.
+
+    Devuelve el valor para Plano.archivo. Si el contenido ya estaba guardado
+    se conserva la copia existente y `ruta_local` queda sin tocar. Un archivo
+    nuevo se borra si la transacción de la sesión se deshace antes de que un
+    plano lo use.
+    """
+    existente = db.session.get(ArchivoPlano, codigo)
+    if existente is not None and os.path.exists(ruta_absoluta(existente.ruta)):
+        return existente.ruta
+
+    extension = os.path.splitext(nombre_original)[1].lower()
+    nombre = f'{codigo[:2]}/{codigo}{extension}'
+    ruta = ruta_absoluta(nombre)
+    if not os.path.exists(ruta):
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        # move() copia y borra cuando el origen está en otro sistema de archivos
+        shutil.move(ruta_local, ruta)
+        db.session.info.setdefault(_PUBLICADOS, set()).add(nombre)
+    return nombre
+
+
+def enviar_plano(plano, como_adjunto=False):
+    """Respuesta con el archivo de un plano, o None si no está en disco.
+
+    El hash del contenido se usa como ETag fuerte: un If-None-Match que
+    coincide se responde con 304 sin cuerpo y las peticiones Range (visores
+    de PDF, descargas reanudadas) reciben solo los bytes pedidos.
+    """
+    ruta = ruta_absoluta(plano.archivo)
+    if not os.path.exists(ruta):
+        return None
+
+    respuesta = send_file(
+        ruta,
+        as_attachment=como_adjunto,
+        download_name=plano.nombre_plano if como_adjunto else None,
+        etag=hash_de_nombre(plano.archivo) or True,
+        conditional=True,
+    )
+    # Contenido con sesión iniciada: solo lo guarda el navegador, y lo revalida siempre
+    respuesta.cache_control.private = True
+    return respuesta
+
+
+def _variacion_referencias(session):
+    """Variación de referencias por valor de Plano.archivo en los cambios pendientes"""
+    variacion = defaultdict(int)
+    for obj in session.new:
+        if isinstance(obj, Plano):
+            variacion[obj.archivo] += 1
+    for obj in session.deleted:
+        if isinstance(obj, Plano):
+            variacion[obj.archivo] -= 1
+    for obj in session.dirty:
+        if isinstance(obj, Plano):
+            historial = inspect(obj).attrs.archivo.history
+            for anterior in historial.deleted:
+                variacion[anterior] -= 1
+            for nuevo in historial.added:
+                variacion[nuevo] += 1
+    return {nombre: delta for nombre, delta in variacion.items() if nombre and delta}
+
+
+def _actualizar_referencias(session, flush_context, instances):
+    """Mantener ArchivoPlano.referencias en la misma transacción que los planos"""
+    variacion = _variacion_referencias(session)
+    if not variacion:
+        return
+
+    por_borrar = session.info.setdefault(_POR_BORRAR, set())
+    por_borrar |= aplicar_variacion_referencias(session.connection(), variacion)
+
+
+def aplicar_variacion_referencias(conexion, variacion):
+    """Sumar `variacion` ({Plano.archivo: delta}) a las referencias de cada archivo.
+
+    Las inserciones masivas de planos con SQL directo la llaman ellas mismas.
+    Devuelve los nombres de los archivos que ya no usa ningún plano.
+    """
+    tabla = ArchivoPlano.__table__
+    por_borrar = set()
+    for nombre, delta in variacion.items():
+        codigo = hash_de_nombre(nombre)
+        if codigo is None:
+            # Archivo anterior al almacén por contenido: pertenece a un único plano
+            if delta < 0:
+                por_borrar.add(nombre)
+            continue
+
+        resultado = conexion.execute(
+            update(tabla).where(tabla.c.hash_sha256 == codigo)
+            .values(referencias=tabla.c.referencias + delta)
+        )
+        if resultado.rowcount == 0:
+            if delta > 0:
+                conexion.execute(insert(tabla).values(
+                    hash_sha256=codigo, ruta=nombre, referencias=delta,
+                    tamano=os.path.getsize(ruta_absoluta(nombre)),
+                    fecha_creacion=datetime.utcnow()
+                ))
+            continue
+
+        restantes = conexion.execute(
+            select(tabla.c.referencias).where(tabla.c.hash_sha256 == codigo)
+        ).scalar()
+        if restantes <= 0:
+            conexion.execute(delete(tabla).where(tabla.c.hash_sha256 == codigo))
+            por_borrar.add(nombre)
+    return por_borrar
+
+
+def _borrar_archivos_liberados(session):
+    """Borrar del disco los archivos que ya no usa ningún plano"""
+    nombres = session.info.pop(_POR_BORRAR, None)
+    if not nombres:
+        return
+
+    tabla = ArchivoPlano.__table__
+    with db.engine.connect() as conexion:
+        # Otra petición pudo volver a subir el mismo contenido después del commit
+        vigentes = set(conexion.execute(
+            select(tabla.c.ruta).where(tabla.c.ruta.in_(nombres))
+        ).scalars())
+    # Importación diferida: vistas_previas depende de este módulo
+    from vistas_previas import eliminar_vista_previa
+
+    for nombre in nombres - vigentes:
+        ruta = ruta_absoluta(nombre)
+        if os.path.exists(ruta):
+            os.remove(ruta)
+        codigo = hash_de_nombre(nombre)
+        if codigo is not None:
+            eliminar_vista_previa(current_app, codigo)
+
+
+def _descartar_archivos_liberados(session):
+    session.info.pop(_POR_BORRAR, None)
+
+
+def _confirmar_publicados(session):
+    session.info.pop(_PUBLICADOS, None)
+
+
+def _retirar_publicados(session):
+    """Borrar los archivos publicados en una transacción que se deshizo"""
+    nombres = session.info.pop(_PUBLICADOS, None)
+    if not nombres:
+        return
+
+    tabla = ArchivoPlano.__table__
+    with db.engine.connect() as conexion:
+        # Otra petición pudo confirmar un plano con el mismo contenido
+        vigentes = set(conexion.execute(
+            select(tabla.c.ruta).where(tabla.c.ruta.in_(nombres))
+        ).scalars())
+    for nombre in nombres - vigentes:
+        ruta = ruta_absoluta(nombre)
+        if os.path.exists(ruta):
+            os.remove(ruta)
+
+
+def migrar_archivos_planos():
+    """Pasar los archivos con nombre antiguo al almacén por contenido y recontar referencias.
+
+    Devuelve (planos migrados, archivos huérfanos eliminados).
+    """
+    migrados = 0
+    for plano in Plano.query.all():
+        if hash_de_nombre(plano.archivo) is not None:
+            continue
+        ruta = ruta_absoluta(plano.archivo)
+        if not os.path.exists(ruta):
+            continue
+        with open(ruta, 'rb') as origen:
+            plano.archivo = guardar_archivo(origen, plano.archivo)
+        migrados += 1
+        # Confirmar por plano para que ArchivoPlano ya exista si el siguiente es idéntico
+        db.session.commit()
+
+    # Recontar desde los planos por si hubo operaciones masivas fuera de la sesión
+    usos = dict(db.session.query(Plano.archivo, db.func.count(Plano.id_plano))
+                .group_by(Plano.archivo).all())
+    for archivo in ArchivoPlano.query.all():
+        archivo.referencias = usos.get(archivo.ruta, 0)
+        if archivo.referencias == 0:
+            db.session.delete(archivo)
+    db.session.commit()
+
+    # Archivos en disco sin ninguna fila que los use (subidas interrumpidas)
+    conocidos = set(usos)
+    huerfanos = 0
+    carpeta = carpeta_planos()
+    for directorio, _subdirectorios, archivos in os.walk(carpeta):
+        for nombre_archivo in archivos:
+            nombre = os.path.relpath(os.path.join(directorio, nombre_archivo), carpeta)
+            nombre = nombre.replace(os.sep, '/')
+            if hash_de_nombre(nombre) is not None and nombre not in conocidos:
+                os.remove(os.path.join(directorio, nombre_archivo))
+                huerfanos += 1
+    return migrados, huerfanos
+
+
+def init_almacen(app):
+    """Registrar el conteo de referencias y el comando de migración de archivos"""
+    if not event.contains(Session, 'before_flush', _actualizar_referencias):
+        event.listen(Session, 'before_flush', _actualizar_referencias)
+        event.listen(Session, 'after_commit', _borrar_archivos_liberados)
+        event.listen(Session, 'after_rollback', _descartar_archivos_liberados)
+        event.listen(Session, 'after_commit', _confirmar_publicados)
+        event.listen(Session, 'after_rollback', _retirar_publicados)
+
+    @app.cli.command('migrar-archivos-planos')
+    def migrar_archivos_planos_comando():
+        """Guardar los planos existentes por hash y recalcular las referencias"""
+        migrados, huerfanos = migrar_archivos_planos()
+        print(f'✅ {migrados} planos migrados, {huerfanos} archivos huérfanos eliminados')
@@ -0,0 +1,252 @@
+import hashlib
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from functools import wraps
+from typing import NamedTuple
+
+from flask import current_app, jsonify, request, url_for
+from flask_login import current_user
+from werkzeug.http import is_resource_modified
+
+from models import db, Cliente, Proyecto, Plano, Material, Inventario, Venta
+from paginacion import paginar, decodificar_cursor
+from versiones import version_y_fecha
+
+
+# API JSON de solo lectura, /api/v1/<recurso>. Las respuestas llevan ETag y
+# Last-Modified calculados con las versiones de las tablas (versiones.py): un
+# cliente que repite la petición con If-None-Match recibe un 304 con una sola
+# consulta, sin leer ni serializar filas.
+
+VERSION_API = 'v1'
+
+# Parámetros de los listados que no son filtros
+_PARAMETROS_LISTADO = {'campos', 'limite', 'despues', 'desde', 'hasta'}
+
+
+class ErrorApi(ValueError):
+    """Petición a la API que no se puede atender; se responde en JSON con `estado`"""
+
+    def __init__(self, mensaje, estado=400, **detalles):
+        super().__init__(mensaje)
+        self.estado = estado
+        self.detalles = detalles
+
+    def respuesta(self):
+        return jsonify({'error': str(self), **self.detalles}), self.estado
+
+
+class Recurso(NamedTuple):
+    """Entidad expuesta: filtros por igualdad, columna de `desde`/`hasta` y columnas ocultas"""
+    modelo: type
+    filtros: tuple = ()
+    fecha: object = None
+    ocultas: tuple = ()
+
+    @property
+    def clave(self):
+        return self.modelo.__table__.primary_key.columns[0]
+
+    @property
+    def campos(self):
+        return {columna.key: getattr(self.modelo, columna.key)
+                for columna in self.modelo.__table__.columns if columna.key not in self.ocultas}
+
+    @property
+    def tablas(self):
+        # Solo se exponen columnas propias: la versión de la tabla basta para el ETag
+        return (self.modelo.__tablename__,)
+
+
+RECURSOS = {
+    'clientes': Recurso(Cliente, ('email',)),
+    'proyectos': Recurso(Proyecto, ('id_cliente', 'estado'), Proyecto.fecha_inicio),
+    # `archivo` es la clave interna del almacén, no una URL
+    'planos': Recurso(Plano, ('id_proyecto', 'id_tipo_plano', 'id_usuario'), Plano.fecha_subida,
+                      ocultas=('archivo',)),
+    'materiales': Recurso(Material, ('categoria', 'subcategoria', 'activo')),
+    'inventario': Recurso(Inventario, ('id_material', 'ubicacion'), Inventario.fecha_actualizacion),
+    'ventas': Recurso(Venta, ('id_cliente', 'id_usuario', 'estado', 'metodo_pago'), Venta.fecha_venta),
+}
+
+
+def requiere_sesion_api(vista):
+    """Como @login_required, pero responde 401 en JSON en lugar de redirigir al formulario"""
+    @wraps(vista)
+    def envoltura(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return jsonify({'error': 'Se requiere iniciar sesión'}), 401
+        return vista(*args, **kwargs)
+    return envoltura
+
+
+def _recurso(nombre):
+    recurso = RECURSOS.get(nombre)
+    if recurso is None:
+        raise ErrorApi(f'No existe el recurso {nombre}', 404, recursos=sorted(RECURSOS))
+    return recurso
+
+
+def _columnas(recurso):
+    """Columnas pedidas en `campos` (todas si no se indica); la clave primaria va siempre"""
+    campos = recurso.campos
+    pedidos = [campo.strip() for campo in request.args.get('campos', '').split(',') if campo.strip()]
+    desconocidos = [campo for campo in pedidos if campo not in campos]
+    if desconocidos:
+        raise ErrorApi(f'Campos desconocidos: {", ".join(desconocidos)}', campos_validos=list(campos))
+    if not pedidos:
+        return list(campos.values())
+    return [campos[nombre] for nombre in dict.fromkeys([recurso.clave.key] + pedidos)]
+
+
+def _convertir(columna, texto, parametro):
+    """Valor de un parámetro de la URL con el tipo de la columna"""
+    tipo = columna.type.python_type
+    try:
+        if tipo is bool:
+            if texto.lower() not in ('true', 'false', '1', '0'):
+                raise ValueError
+            return texto.lower() in ('true', '1')
+        if tipo is datetime:
+            return datetime.fromisoformat(texto)
+        if tipo is date:
+            return date.fromisoformat(texto)
+        return tipo(texto)
+    except (ValueError, InvalidOperation):
+        raise ErrorApi(f'{parametro}: valor no válido para {tipo.__name__}')
+
+
+def _filtros(recurso):
+    desconocidos = set(request.args) - _PARAMETROS_LISTADO - set(recurso.filtros)
+    if desconocidos:
+        raise ErrorApi(f'Parámetros desconocidos: {", ".join(sorted(desconocidos))}',
+                       filtros_validos=list(recurso.filtros))
+
+    campos = recurso.campos
+    condiciones = [campos[nombre] == _convertir(campos[nombre], request.args[nombre], nombre)
+                   for nombre in recurso.filtros if nombre in request.args]
+
+    desde, hasta = request.args.get('desde'), request.args.get('hasta')
+    if (desde or hasta) and recurso.fecha is None:
+        raise ErrorApi('Este recurso no admite filtro por fecha (desde/hasta)')
+    # Fechas de día completas, con `hasta` incluido, también sobre columnas DateTime
+    if desde:
+        condiciones.append(recurso.fecha >= _dia(desde, 'desde'))
+    if hasta:
+        condiciones.append(recurso.fecha < _dia(hasta, 'hasta') + timedelta(days=1))
+    return condiciones
+
+
+def _dia(texto, parametro):
+    try:
+        return date.fromisoformat(texto)
+    except ValueError:
+        raise ErrorApi(f'{parametro}: fecha no válida, se espera AAAA-MM-DD')
+
+
+def _limite():
+    maximo = current_app.config['API_MAX_POR_PAGINA']
+    try:
+        limite = int(request.args.get('limite', current_app.config['API_POR_PAGINA']))
+    except ValueError:
+        limite = 0
+    if not 1 <= limite <= maximo:
+        raise ErrorApi(f'limite: debe ser un entero entre 1 y {maximo}')
+    return limite
+
+
+def _json(valor):
+    # Importes como cadenas para conservar los céntimos exactos, como en ventas.venta_a_json
+    if isinstance(valor, Decimal):
+        return str(valor)
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    return valor
+
+
+def _fila_a_json(fila):
+    return {campo: _json(valor) for campo, valor in fila._mapping.items()}
+
+
+def _respuesta_condicional(recurso, generar):
+    """Responder 304 sin leer las filas si la versión del cliente es la actual.
+
+    El ETag combina la ruta, sus parámetros y la versión de las tablas del
+    recurso; `generar` solo se llama si hay que enviar el cuerpo.
+    """
+    firma, modificado = version_y_fecha(*recurso.tablas)
+    parametros = sorted(request.args.items(multi=True))
+    etag = hashlib.sha1(f'{VERSION_API}|{request.path}|{parametros}|{firma}'.encode()).hexdigest()
+
+    if is_resource_modified(request.environ, etag=etag, last_modified=modificado):
+        respuesta = jsonify(generar())
+    else:
+        respuesta = current_app.response_class(status=304)
+    respuesta.set_etag(etag)
+    if modificado is not None:
+        respuesta.last_modified = modificado
+    # Cualquier caché intermedia debe revalidar con el servidor; la respuesta depende de la sesión
+    respuesta.cache_control.private = True
+    respuesta.cache_control.no_cache = True
+    respuesta.vary.add('Cookie')
+    return respuesta
+
+
+def indice_api():
+    """Recursos disponibles con sus campos y filtros"""
+    return jsonify({
+        'version': VERSION_API,
+        'recursos': {
+            nombre: {
+                'url': url_for('api_listado', recurso=nombre),
+                'campos': list(recurso.campos),
+                'filtros': list(recurso.filtros),
+                'fecha': recurso.fecha.key if recurso.fecha is not None else None,
+            }
+            for nombre, recurso in RECURSOS.items()
+        },
+    })
+
+
+def listado_api(nombre):
+    """Página de un recurso ordenada por clave primaria, con el enlace a la siguiente.
+
+    Los parámetros se validan antes de consultar nada. Un cursor `despues`
+    que no es válido es un error: volver al principio en silencio haría
+    que un cliente sincronizando recorriera la tabla sin fin.
+    """
+    recurso = _recurso(nombre)
+    columnas = _columnas(recurso)
+    condiciones = _filtros(recurso)
+    limite = _limite()
+    orden = [(recurso.clave, False)]
+    despues = request.args.get('despues')
+    if despues and decodificar_cursor(despues, orden) is None:
+        raise ErrorApi('despues: cursor no válido')
+
+    def generar():
+        consulta = db.session.query(*columnas).filter(*condiciones)
+        pagina = paginar(consulta, orden, despues=despues, por_pagina=limite)
+        siguiente = None
+        if pagina.tiene_siguiente:
+            parametros = dict(request.args.items(), despues=pagina.cursor_siguiente)
+            siguiente = url_for('api_listado', recurso=nombre, **parametros)
+        return {'datos': [_fila_a_json(fila) for fila in pagina], 'siguiente': siguiente}
+
+    return _respuesta_condicional(recurso, generar)
+
+
+def detalle_api(nombre, id):
+    recurso = _recurso(nombre)
+    columnas = _columnas(recurso)
+    desconocidos = set(request.args) - {'campos'}
+    if desconocidos:
+        raise ErrorApi(f'Parámetros desconocidos: {", ".join(sorted(desconocidos))}')
+
+    def generar():
+        fila = db.session.query(*columnas).filter(recurso.clave == id).first()
+        if fila is None:
+            raise ErrorApi(f'No existe {nombre} con id {id}', 404)
+        return _fila_a_json(fila)
+
+    return _respuesta_condicional(recurso, generar)
@@ -1,1088 +1,1364 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, send_file, jsonify
-from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
-from werkzeug.utils import secure_filename
-from models import db, Usuario, Cliente, Proyecto, TipoPlano, Plano, Material, Inventario, Venta, DetalleVenta
-from config import config
-import os
-from datetime import datetime, date
-from fpdf import FPDF
-import io
-
-def create_app():
-    """Factory function para crear la aplicación Flask"""
-    app = Flask(__name__)
-    
-    # Configuración
-    app.config.from_object(config['development'])
-    
-    # Inicializar extensiones
-    db.init_app(app)
-    
-    # Configurar Flask-Login
-    login_manager = LoginManager()
-    login_manager.init_app(app)
-    login_manager.login_view = 'login'
-    login_manager.login_message = 'Por favor inicia sesión para acceder a esta página.'
-    
-    @login_manager.user_loader
-    def load_user(user_id):
-        return Usuario.query.get(int(user_id))
-    
-    # Crear tablas de la base de datos
-    with app.app_context():
-        db.create_all()
-        # Crear usuario administrador por defecto
-        if not Usuario.query.filter_by(email='admin@asplot.com').first():
-            admin = Usuario(
-                nombre_usuario='admin',
-                email='admin@asplot.com',
-                rol='administrador',
-                nombre_completo='Administrador del Sistema',
-                activo=True
-            )
-            admin.set_password('admin123')
-            db.session.add(admin)
-            
-            # Crear tipos de plano por defecto
-            tipos_plano = [
-                TipoPlano(nombre_tipo='Arquitectónico', descripcion='Planos arquitectónicos'),
-                TipoPlano(nombre_tipo='Estructural', descripcion='Planos estructurales'),
-                TipoPlano(nombre_tipo='Eléctrico', descripcion='Planos eléctricos'),
-                TipoPlano(nombre_tipo='Plomería', descripcion='Planos de plomería'),
-                TipoPlano(nombre_tipo='Mecánico', descripcion='Planos mecánicos'),
-                TipoPlano(nombre_tipo='HVAC', descripcion='Planos de climatización'),
-                TipoPlano(nombre_tipo='Topográfico', descripcion='Planos topográficos')
-            ]
-            
-            for tipo in tipos_plano:
-                db.session.add(tipo)
-            
-            # Crear cliente y proyecto de ejemplo para poder subir planos
-            cliente_ejemplo = Cliente(
-                nombre='Cliente',
-                apellido='Ejemplo',
-                email='ejemplo.sistema@asplot.com',
-                telefono='555-0000',
-                direccion='Dirección de ejemplo'
-            )
-            db.session.add(cliente_ejemplo)
-            db.session.flush()
-            
-            proyecto_ejemplo = Proyecto(
-                id_cliente=cliente_ejemplo.id_cliente,
-                nombre_proyecto='Proyecto de Prueba',
-                descripcion='Proyecto de ejemplo para subir planos de prueba',
-                fecha_inicio=datetime.now().date(),
-                fecha_fin=datetime.now().date(),
-                estado='activo'
-            )
-            db.session.add(proyecto_ejemplo)
-            
-            db.session.commit()
-    
-    # Rutas de autenticación
-    @app.route('/login', methods=['GET', 'POST'])
-    def login():
-        if request.method == 'POST':
-            email = request.form['email']
-            password = request.form['password']
-            user = Usuario.query.filter_by(email=email).first()
-            
-            if user and user.check_password(password):
-                login_user(user)
-                return redirect(url_for('dashboard'))
-            else:
-                flash('Credenciales inválidas', 'error')
-        
-        return render_template('login.html')
-    
-    @app.route('/logout')
-    @login_required
-    def logout():
-        logout_user()
-        return redirect(url_for('login'))
-    
-    # Dashboard
-    @app.route('/')
-    @app.route('/dashboard')
-    @login_required
-    def dashboard():
-        # Obtener estadísticas para las tarjetas KPI
-        total_clientes = Cliente.query.count()
-        total_proyectos = Proyecto.query.count()
-        total_planos = Plano.query.count()
-        total_ventas = Venta.query.count()
-        
-        # Calcular existencia total
-        existencia_total = db.session.query(db.func.sum(Inventario.cantidad)).scalar() or 0
-        
-        # Calcular importe vendido
-        importe_vendido = db.session.query(db.func.sum(Venta.total)).scalar() or 0
-        
-        # Obtener proyectos recientes
-        proyectos_recientes = Proyecto.query.order_by(Proyecto.fecha_inicio.desc()).limit(5).all()
-        
-        # Obtener ventas recientes
-        ventas_recientes = Venta.query.order_by(Venta.fecha_venta.desc()).limit(5).all()
-        
-        return render_template('dashboard.html',
-                             total_clientes=total_clientes,
-                             total_proyectos=total_proyectos,
-                             total_planos=total_planos,
-                             total_ventas=total_ventas,
-                             existencia_total=existencia_total,
-                             importe_vendido=importe_vendido,
-                             proyectos_recientes=proyectos_recientes,
-                             ventas_recientes=ventas_recientes)
-    
-    # Gestión de Clientes
-    @app.route('/clientes')
-    @login_required
-    def clientes():
-        search = request.args.get('search', '')
-        if search:
-            clientes = Cliente.query.filter(
-                db.or_(
-                    Cliente.nombre.contains(search),
-                    Cliente.apellido.contains(search),
-                    Cliente.email.contains(search)
-                )
-            ).all()
-        else:
-            clientes = Cliente.query.all()
-        
-        return render_template('clientes.html', clientes=clientes, search=search)
-    
-    @app.route('/clientes/crear', methods=['GET', 'POST'])
-    @login_required
-    def crear_cliente():
-        if request.method == 'POST':
-            cliente = Cliente(
-                nombre=request.form['nombre'],
-                apellido=request.form['apellido'],
-                email=request.form['email'],
-                telefono=request.form['telefono'],
-                direccion=request.form['direccion']
-            )
-            db.session.add(cliente)
-            db.session.commit()
-            flash('Cliente creado exitosamente', 'success')
-            return redirect(url_for('clientes'))
-        
-        return render_template('crear_cliente.html')
-    
-    @app.route('/clientes/editar/<int:id>', methods=['GET', 'POST'])
-    @login_required
-    def editar_cliente(id):
-        cliente = Cliente.query.get_or_404(id)
-        
-        if request.method == 'POST':
-            cliente.nombre = request.form['nombre']
-            cliente.apellido = request.form['apellido']
-            cliente.email = request.form['email']
-            cliente.telefono = request.form['telefono']
-            cliente.direccion = request.form['direccion']
-            db.session.commit()
-            flash('Cliente actualizado exitosamente', 'success')
-            return redirect(url_for('clientes'))
-        
-        return render_template('editar_cliente.html', cliente=cliente)
-    
-    @app.route('/clientes/eliminar/<int:id>')
-    @login_required
-    def eliminar_cliente(id):
-        cliente = Cliente.query.get_or_404(id)
-        db.session.delete(cliente)
-        db.session.commit()
-        flash('Cliente eliminado exitosamente', 'success')
-        return redirect(url_for('clientes'))
-    
-    # Gestión de Proyectos
-    @app.route('/proyectos')
-    @login_required
-    def proyectos():
-        search = request.args.get('search', '')
-        estado = request.args.get('estado', '')
-        
-        query = Proyecto.query
-        
-        if search:
-            query = query.filter(Proyecto.nombre_proyecto.contains(search))
-        
-        if estado:
-            query = query.filter(Proyecto.estado == estado)
-        
-        proyectos = query.all()
-        
-        return render_template('proyectos.html', proyectos=proyectos, search=search, estado=estado)
-    
-    @app.route('/proyectos/crear', methods=['GET', 'POST'])
-    @login_required
-    def crear_proyecto():
-        if request.method == 'POST':
-            proyecto = Proyecto(
-                id_cliente=request.form['id_cliente'],
-                nombre_proyecto=request.form['nombre_proyecto'],
-                descripcion=request.form['descripcion'],
-                fecha_inicio=datetime.strptime(request.form['fecha_inicio'], '%Y-%m-%d').date(),
-                fecha_fin=datetime.strptime(request.form['fecha_fin'], '%Y-%m-%d').date(),
-                estado=request.form['estado']
-            )
-            db.session.add(proyecto)
-            db.session.commit()
-            flash('Proyecto creado exitosamente', 'success')
-            return redirect(url_for('proyectos'))
-        
-        clientes = Cliente.query.all()
-        return render_template('crear_proyecto.html', clientes=clientes)
-    
-    @app.route('/proyectos/editar/<int:id>', methods=['GET', 'POST'])
-    @login_required
-    def editar_proyecto(id):
-        proyecto = Proyecto.query.get_or_404(id)
-        
-        if request.method == 'POST':
-            proyecto.id_cliente = request.form['id_cliente']
-            proyecto.nombre_proyecto = request.form['nombre_proyecto']
-            proyecto.descripcion = request.form['descripcion']
-            proyecto.fecha_inicio = datetime.strptime(request.form['fecha_inicio'], '%Y-%m-%d').date()
-            proyecto.fecha_fin = datetime.strptime(request.form['fecha_fin'], '%Y-%m-%d').date()
-            proyecto.estado = request.form['estado']
-            db.session.commit()
-            flash('Proyecto actualizado exitosamente', 'success')
-            return redirect(url_for('proyectos'))
-        
-        clientes = Cliente.query.all()
-        return render_template('editar_proyecto.html', proyecto=proyecto, clientes=clientes)
-    
-    @app.route('/proyectos/eliminar/<int:id>')
-    @login_required
-    def eliminar_proyecto(id):
-        proyecto = Proyecto.query.get_or_404(id)
-        db.session.delete(proyecto)
-        db.session.commit()
-        flash('Proyecto eliminado exitosamente', 'success')
-        return redirect(url_for('proyectos'))
-    
-    # Gestión de Planos
-    @app.route('/planos')
-    @login_required
-    def planos():
-        search = request.args.get('search', '')
-        tipo = request.args.get('tipo', '')
-        
-        query = Plano.query.join(Proyecto).join(Cliente)
-        
-        if search:
-            query = query.filter(
-                db.or_(
-                    Plano.nombre_plano.contains(search),
-                    Proyecto.nombre_proyecto.contains(search),
-                    Cliente.nombre.contains(search)
-                )
-            )
-        
-        if tipo:
-            query = query.join(TipoPlano).filter(TipoPlano.id_tipo_plano == tipo)
-        
-        planos = query.all()
-        tipos_plano = TipoPlano.query.all()
-        
-        return render_template('planos.html', planos=planos, tipos_plano=tipos_plano, search=search, tipo=tipo)
-    
-    @app.route('/planos/subir', methods=['GET', 'POST'])
-    @login_required
-    def subir_plano():
-        if request.method == 'POST':
-            try:
-                # Validar que se haya enviado un archivo
-                if 'archivo' not in request.files:
-                    flash('No se seleccionó ningún archivo', 'error')
-                    proyectos = Proyecto.query.all()
-                    tipos_plano = TipoPlano.query.all()
-                    return render_template('subir_plano.html', proyectos=proyectos, tipos_plano=tipos_plano)
-                
-                archivo = request.files['archivo']
-                if archivo.filename == '':
-                    flash('No se seleccionó ningún archivo', 'error')
-                    proyectos = Proyecto.query.all()
-                    tipos_plano = TipoPlano.query.all()
-                    return render_template('subir_plano.html', proyectos=proyectos, tipos_plano=tipos_plano)
-                
-                # Validar tipo de archivo
-                if archivo and allowed_file(archivo.filename):
-                    filename = secure_filename(archivo.filename)
-                    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_')
-                    filename = timestamp + filename
-                    
-                    # Crear directorio si no existe (usar ruta absoluta)
-                    upload_path = os.path.abspath(app.config['UPLOAD_FOLDER'])
-                    os.makedirs(upload_path, exist_ok=True)
-                    
-                    # Guardar archivo
-                    file_path = os.path.join(upload_path, filename)
-                    archivo.save(file_path)
-                    
-                    # Crear registro en base de datos
-                    plano = Plano(
-                        id_proyecto=int(request.form['id_proyecto']),
-                        id_tipo_plano=int(request.form['id_tipo_plano']),
-                        id_usuario=current_user.id_usuario,
-                        nombre_plano=request.form['nombre_plano'],
-                        archivo=filename
-                    )
-                    db.session.add(plano)
-                    db.session.commit()
-                    
-                    flash('Plano subido exitosamente', 'success')
-                    return redirect(url_for('planos'))
-                else:
-                    flash('Tipo de archivo no permitido. Formatos válidos: PDF, DWG, DXF, JPG, PNG', 'error')
-                    proyectos = Proyecto.query.all()
-                    tipos_plano = TipoPlano.query.all()
-                    return render_template('subir_plano.html', proyectos=proyectos, tipos_plano=tipos_plano)
-                    
-            except Exception as e:
-                db.session.rollback()
-                flash(f'Error al subir el plano: {str(e)}', 'error')
-                proyectos = Proyecto.query.all()
-                tipos_plano = TipoPlano.query.all()
-                return render_template('subir_plano.html', proyectos=proyectos, tipos_plano=tipos_plano)
-        
-        proyectos = Proyecto.query.all()
-        tipos_plano = TipoPlano.query.all()
-        return render_template('subir_plano.html', proyectos=proyectos, tipos_plano=tipos_plano)
-    
-    @app.route('/planos/ver/<int:id>')
-    @login_required
-    def ver_plano(id):
-        plano = Plano.query.get_or_404(id)
-        archivo_path = os.path.abspath(os.path.join(app.config['UPLOAD_FOLDER'], plano.archivo))
-        
-        if os.path.exists(archivo_path):
-            return send_file(archivo_path, as_attachment=False)
-        else:
-            flash('Archivo no encontrado', 'error')
-            return redirect(url_for('planos'))
-    
-    @app.route('/planos/descargar/<int:id>')
-    @login_required
-    def descargar_plano(id):
-        plano = Plano.query.get_or_404(id)
-        archivo_path = os.path.abspath(os.path.join(app.config['UPLOAD_FOLDER'], plano.archivo))
-        
-        if os.path.exists(archivo_path):
-            return send_file(archivo_path, as_attachment=True, download_name=plano.nombre_plano)
-        else:
-            flash('Archivo no encontrado', 'error')
-            return redirect(url_for('planos'))
-    
-    @app.route('/planos/eliminar/<int:id>')
-    @login_required
-    def eliminar_plano(id):
-        plano = Plano.query.get_or_404(id)
-        archivo_path = os.path.abspath(os.path.join(app.config['UPLOAD_FOLDER'], plano.archivo))
-        
-        # Eliminar archivo físico
-        if os.path.exists(archivo_path):
-            os.remove(archivo_path)
-        
-        # Eliminar registro de la base de datos
-        db.session.delete(plano)
-        db.session.commit()
-        flash('Plano eliminado exitosamente', 'success')
-        return redirect(url_for('planos'))
-    
-    @app.route('/planos/detalle/<int:id>')
-    @login_required
-    def detalle_plano(id):
-        plano = Plano.query.get_or_404(id)
-        return render_template('detalle_plano.html', plano=plano)
-    
-    @app.route('/planos/buscar')
-    @login_required
-    def buscar_planos():
-        # Búsqueda avanzada
-        nombre = request.args.get('nombre', '')
-        proyecto = request.args.get('proyecto', '')
-        tipo = request.args.get('tipo', '')
-        fecha_desde = request.args.get('fecha_desde', '')
-        fecha_hasta = request.args.get('fecha_hasta', '')
-        
-        query = Plano.query.join(Proyecto).join(Cliente)
-        
-        if nombre:
-            query = query.filter(Plano.nombre_plano.contains(nombre))
-        
-        if proyecto:
-            query = query.filter(Proyecto.nombre_proyecto.contains(proyecto))
-        
-        if tipo:
-            query = query.join(TipoPlano).filter(TipoPlano.id_tipo_plano == tipo)
-        
-        if fecha_desde:
-            fecha_desde_obj = datetime.strptime(fecha_desde, '%Y-%m-%d')
-            query = query.filter(Plano.fecha_subida >= fecha_desde_obj)
-        
-        if fecha_hasta:
-            fecha_hasta_obj = datetime.strptime(fecha_hasta, '%Y-%m-%d')
-            query = query.filter(Plano.fecha_subida <= fecha_hasta_obj)
-        
-        planos = query.all()
-        tipos_plano = TipoPlano.query.all()
-        
-        return render_template('buscar_planos.html', 
-                             planos=planos, 
-                             tipos_plano=tipos_plano,
-                             nombre=nombre,
-                             proyecto=proyecto,
-                             tipo=tipo,
-                             fecha_desde=fecha_desde,
-                             fecha_hasta=fecha_hasta)
-    
-    # Gestión de Inventario
-    @app.route('/inventario')
-    @login_required
-    def inventario():
-        search = request.args.get('search', '')
-        categoria = request.args.get('categoria', '')
-        
-        query = Inventario.query.join(Material)
-        
-        if search:
-            query = query.filter(
-                db.or_(
-                    Material.nombre_material.contains(search),
-                    Material.descripcion.contains(search)
-                )
-            )
-        
-        if categoria:
-            query = query.filter(Material.categoria == categoria)
-        
-        inventarios = query.all()
-        
-        # Obtener materiales con stock bajo
-        materiales_bajo_stock = Inventario.query.join(Material).filter(
-            Inventario.cantidad <= Material.stock_minimo
-        ).all()
-        
-        return render_template('inventario.html', 
-                             inventarios=inventarios, 
-                             materiales_bajo_stock=materiales_bajo_stock,
-                             search=search,
-                             categoria=categoria)
-    
-    @app.route('/inventario/materiales')
-    @login_required
-    def materiales():
-        search = request.args.get('search', '')
-        categoria = request.args.get('categoria', '')
-        
-        query = Material.query
-        
-        if search:
-            query = query.filter(
-                db.or_(
-                    Material.nombre_material.contains(search),
-                    Material.descripcion.contains(search)
-                )
-            )
-        
-        if categoria:
-            query = query.filter(Material.categoria == categoria)
-        
-        materiales = query.filter(Material.activo == True).all()
-        
-        return render_template('materiales.html', materiales=materiales, search=search, categoria=categoria)
-    
-    @app.route('/inventario/materiales/crear', methods=['GET', 'POST'])
-    @login_required
-    def crear_material():
-        if request.method == 'POST':
-            material = Material(
-                nombre_material=request.form['nombre_material'],
-                descripcion=request.form['descripcion'],
-                categoria=request.form['categoria'],
-                subcategoria=request.form.get('subcategoria', ''),
-                precio_unitario=float(request.form['precio_unitario']),
-                precio_compra=float(request.form.get('precio_compra', 0)),
-                unidad_medida=request.form['unidad_medida'],
-                stock_minimo=int(request.form['stock_minimo'])
-            )
-            db.session.add(material)
-            db.session.flush()
-            
-            # Crear registro de inventario inicial
-            inventario = Inventario(
-                id_material=material.id_material,
-                cantidad=int(request.form.get('cantidad_inicial', 0)),
-                ubicacion=request.form.get('ubicacion', '')
-            )
-            db.session.add(inventario)
-            db.session.commit()
-            
-            flash('Material creado exitosamente', 'success')
-            return redirect(url_for('materiales'))
-        
-        return render_template('crear_material.html')
-    
-    @app.route('/inventario/materiales/editar/<int:id>', methods=['GET', 'POST'])
-    @login_required
-    def editar_material(id):
-        material = Material.query.get_or_404(id)
-        
-        if request.method == 'POST':
-            material.nombre_material = request.form['nombre_material']
-            material.descripcion = request.form['descripcion']
-            material.categoria = request.form['categoria']
-            material.subcategoria = request.form.get('subcategoria', '')
-            material.precio_unitario = float(request.form['precio_unitario'])
-            material.precio_compra = float(request.form.get('precio_compra', 0))
-            material.unidad_medida = request.form['unidad_medida']
-            material.stock_minimo = int(request.form['stock_minimo'])
-            db.session.commit()
-            
-            flash('Material actualizado exitosamente', 'success')
-            return redirect(url_for('materiales'))
-        
-        return render_template('editar_material.html', material=material)
-    
-    @app.route('/inventario/materiales/eliminar/<int:id>')
-    @login_required
-    def eliminar_material(id):
-        material = Material.query.get_or_404(id)
-        material.activo = False
-        db.session.commit()
-        flash('Material desactivado exitosamente', 'success')
-        return redirect(url_for('materiales'))
-    
-    @app.route('/inventario/ajustar/<int:id>', methods=['GET', 'POST'])
-    @login_required
-    def ajustar_inventario(id):
-        inventario = Inventario.query.get_or_404(id)
-        
-        if request.method == 'POST':
-            tipo_ajuste = request.form['tipo_ajuste']
-            cantidad = int(request.form['cantidad'])
-            
-            if tipo_ajuste == 'entrada':
-                inventario.cantidad += cantidad
-            elif tipo_ajuste == 'salida':
-                if inventario.cantidad >= cantidad:
-                    inventario.cantidad -= cantidad
-                else:
-                    flash('No hay suficiente stock para realizar la salida', 'error')
-                    return redirect(url_for('inventario'))
-            elif tipo_ajuste == 'ajuste':
-                inventario.cantidad = cantidad
-            
-            inventario.ubicacion = request.form.get('ubicacion', inventario.ubicacion)
-            inventario.fecha_actualizacion = datetime.utcnow()
-            db.session.commit()
-            
-            flash('Inventario ajustado exitosamente', 'success')
-            return redirect(url_for('inventario'))
-        
-        return render_template('ajustar_inventario.html', inventario=inventario)
-    
-    # Gestión de Ventas
-    @app.route('/ventas')
-    @login_required
-    def ventas():
-        search = request.args.get('search', '')
-        estado = request.args.get('estado', '')
-        
-        query = Venta.query.join(Cliente)
-        
-        if search:
-            query = query.filter(
-                db.or_(
-                    Cliente.nombre.contains(search),
-                    Cliente.apellido.contains(search)
-                )
-            )
-        
-        if estado:
-            query = query.filter(Venta.estado == estado)
-        
-        ventas = query.order_by(Venta.fecha_venta.desc()).all()
-        
-        return render_template('ventas.html', ventas=ventas, search=search, estado=estado)
-    
-    @app.route('/ventas/crear', methods=['GET', 'POST'])
-    @login_required
-    def crear_venta():
-        if request.method == 'POST':
-            # Crear venta
-            venta = Venta(
-                id_cliente=request.form['id_cliente'],
-                id_usuario=current_user.id_usuario,
-                metodo_pago=request.form.get('metodo_pago', 'efectivo'),
-                notas=request.form.get('notas', ''),
-                impuesto=float(request.form.get('impuesto', 0)),
-                descuento=float(request.form.get('descuento', 0)),
-                total=0
-            )
-            db.session.add(venta)
-            db.session.flush()
-            
-            # Procesar detalles de venta (servicios: planos y renderizados)
-            descripciones = request.form.getlist('descripcion[]')
-            cantidades = request.form.getlist('cantidad[]')
-            precios = request.form.getlist('precio[]')
-            
-            for i in range(len(descripciones)):
-                if descripciones[i] and cantidades[i] and precios[i]:
-                    cantidad = int(cantidades[i])
-                    precio = float(precios[i])
-                    
-                    # Crear detalle de venta (sin verificar inventario, son servicios)
-                    detalle = DetalleVenta(
-                        id_venta=venta.id_venta,
-                        id_material=None,  # No hay material asociado
-                        descripcion=descripciones[i],
-                        cantidad=cantidad,
-                        precio_unitario=precio
-                    )
-                    db.session.add(detalle)
-            
-            # Calcular total
-            venta.calcular_total()
-            db.session.commit()
-            
-            flash('Venta registrada exitosamente', 'success')
-            return redirect(url_for('ventas'))
-        
-        clientes = Cliente.query.all()
-        tipos_plano = TipoPlano.query.all()
-        return render_template('crear_venta.html', clientes=clientes, tipos_plano=tipos_plano)
-    
-    @app.route('/ventas/ver/<int:id>')
-    @login_required
-    def ver_venta(id):
-        venta = Venta.query.get_or_404(id)
-        return render_template('ver_venta.html', venta=venta)
-    
-    @app.route('/ventas/eliminar/<int:id>')
-    @login_required
-    def eliminar_venta(id):
-        venta = Venta.query.get_or_404(id)
-        
-        # Cancelar venta (ya no hay inventario que devolver, son servicios)
-        venta.estado = 'cancelada'
-        db.session.commit()
-        flash('Venta cancelada exitosamente', 'success')
-        return redirect(url_for('ventas'))
-    
-    @app.route('/ventas/imprimir/<int:id>')
-    @login_required
-    def imprimir_venta(id):
-        venta = Venta.query.get_or_404(id)
-        
-        # Crear PDF de factura
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font('Arial', 'B', 16)
-        
-        # Encabezado
-        pdf.cell(0, 10, 'ASPLOT CENTER', 0, 1, 'C')
-        pdf.set_font('Arial', '', 10)
-        pdf.cell(0, 5, 'Factura de Venta', 0, 1, 'C')
-        pdf.ln(5)
-        
-        # Información de la venta
-        pdf.set_font('Arial', 'B', 10)
-        pdf.cell(40, 6, 'Factura No:', 0, 0)
-        pdf.set_font('Arial', '', 10)
-        pdf.cell(60, 6, f'{venta.id_venta:06d}', 0, 0)
-        pdf.set_font('Arial', 'B', 10)
-        pdf.cell(30, 6, 'Fecha:', 0, 0)
-        pdf.set_font('Arial', '', 10)
-        pdf.cell(0, 6, venta.fecha_venta.strftime('%Y-%m-%d %H:%M'), 0, 1)
-        
-        pdf.set_font('Arial', 'B', 10)
-        pdf.cell(40, 6, 'Cliente:', 0, 0)
-        pdf.set_font('Arial', '', 10)
-        pdf.cell(0, 6, venta.cliente.nombre_completo, 0, 1)
-        
-        pdf.set_font('Arial', 'B', 10)
-        pdf.cell(40, 6, 'Atendido por:', 0, 0)
-        pdf.set_font('Arial', '', 10)
-        pdf.cell(0, 6, venta.usuario.nombre_usuario, 0, 1)
-        pdf.ln(5)
-        
-        # Tabla de detalles
-        pdf.set_font('Arial', 'B', 10)
-        pdf.cell(80, 8, 'Descripcion', 1, 0, 'C')
-        pdf.cell(30, 8, 'Cantidad', 1, 0, 'C')
-        pdf.cell(30, 8, 'Precio Unit.', 1, 0, 'C')
-        pdf.cell(30, 8, 'Subtotal', 1, 1, 'C')
-        
-        pdf.set_font('Arial', '', 9)
-        for detalle in venta.detalle_ventas:
-            pdf.cell(80, 6, detalle.descripcion[:40], 1, 0)
-            pdf.cell(30, 6, str(detalle.cantidad), 1, 0, 'C')
-            pdf.cell(30, 6, f'${detalle.precio_unitario:.2f}', 1, 0, 'R')
-            pdf.cell(30, 6, f'${detalle.subtotal:.2f}', 1, 1, 'R')
-        
-        # Totales
-        pdf.ln(3)
-        pdf.set_font('Arial', 'B', 10)
-        pdf.cell(140, 6, 'Subtotal:', 0, 0, 'R')
-        pdf.cell(30, 6, f'${venta.subtotal:.2f}', 0, 1, 'R')
-        
-        if venta.impuesto > 0:
-            pdf.cell(140, 6, 'Impuesto:', 0, 0, 'R')
-            pdf.cell(30, 6, f'${venta.impuesto:.2f}', 0, 1, 'R')
-        
-        if venta.descuento > 0:
-            pdf.cell(140, 6, 'Descuento:', 0, 0, 'R')
-            pdf.cell(30, 6, f'-${venta.descuento:.2f}', 0, 1, 'R')
-        
-        pdf.set_font('Arial', 'B', 12)
-        pdf.cell(140, 8, 'TOTAL:', 0, 0, 'R')
-        pdf.cell(30, 8, f'${venta.total:.2f}', 0, 1, 'R')
-        
-        # Generar respuesta
-        output = io.BytesIO()
-        pdf.output(output)
-        output.seek(0)
-        
-        return send_file(
-            output,
-            as_attachment=True,
-            download_name=f'factura_{venta.id_venta:06d}.pdf',
-            mimetype='application/pdf'
-        )
-    
-    # Gestión de Reportes
-    @app.route('/reportes')
-    @login_required
-    def reportes():
-        return render_template('reportes.html')
-    
-    @app.route('/reportes/generar', methods=['POST'])
-    @login_required
-    def generar_reporte():
-        tipo_reporte = request.form['tipo_reporte']
-        periodo = request.form['periodo']
-        
-        # Crear PDF
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font('Arial', 'B', 16)
-        
-        if tipo_reporte == 'clientes':
-            pdf.cell(0, 10, 'Reporte de Clientes', 0, 1, 'C')
-            pdf.ln(10)
-            
-            pdf.set_font('Arial', 'B', 12)
-            pdf.cell(40, 10, 'Nombre', 1, 0, 'C')
-            pdf.cell(60, 10, 'Email', 1, 0, 'C')
-            pdf.cell(40, 10, 'Teléfono', 1, 0, 'C')
-            pdf.cell(50, 10, 'Dirección', 1, 1, 'C')
-            
-            pdf.set_font('Arial', '', 10)
-            clientes = Cliente.query.all()
-            for cliente in clientes:
-                pdf.cell(40, 10, cliente.nombre_completo, 1, 0)
-                pdf.cell(60, 10, cliente.email, 1, 0)
-                pdf.cell(40, 10, cliente.telefono, 1, 0)
-                pdf.cell(50, 10, cliente.direccion[:45], 1, 1)
-        
-        elif tipo_reporte == 'proyectos':
-            pdf.cell(0, 10, 'Reporte de Proyectos', 0, 1, 'C')
-            pdf.ln(10)
-            
-            pdf.set_font('Arial', 'B', 12)
-            pdf.cell(50, 10, 'Proyecto', 1, 0, 'C')
-            pdf.cell(40, 10, 'Cliente', 1, 0, 'C')
-            pdf.cell(30, 10, 'Estado', 1, 0, 'C')
-            pdf.cell(30, 10, 'Inicio', 1, 0, 'C')
-            pdf.cell(30, 10, 'Fin', 1, 1, 'C')
-            
-            pdf.set_font('Arial', '', 10)
-            proyectos = Proyecto.query.join(Cliente).all()
-            for proyecto in proyectos:
-                pdf.cell(50, 10, proyecto.nombre_proyecto[:25], 1, 0)
-                pdf.cell(40, 10, proyecto.cliente.nombre_completo[:20], 1, 0)
-                pdf.cell(30, 10, proyecto.estado, 1, 0)
-                pdf.cell(30, 10, str(proyecto.fecha_inicio), 1, 0)
-                pdf.cell(30, 10, str(proyecto.fecha_fin), 1, 1)
-        
-        elif tipo_reporte == 'ventas':
-            pdf.cell(0, 10, 'Reporte de Ventas', 0, 1, 'C')
-            pdf.ln(10)
-            
-            pdf.set_font('Arial', 'B', 12)
-            pdf.cell(30, 10, 'ID Venta', 1, 0, 'C')
-            pdf.cell(50, 10, 'Cliente', 1, 0, 'C')
-            pdf.cell(40, 10, 'Fecha', 1, 0, 'C')
-            pdf.cell(30, 10, 'Total', 1, 1, 'C')
-            
-            pdf.set_font('Arial', '', 10)
-            ventas = Venta.query.join(Cliente).all()
-            for venta in ventas:
-                pdf.cell(30, 10, str(venta.id_venta), 1, 0)
-                pdf.cell(50, 10, venta.cliente.nombre_completo[:25], 1, 0)
-                pdf.cell(40, 10, str(venta.fecha_venta.date()), 1, 0)
-                pdf.cell(30, 10, f"${venta.total}", 1, 1)
-        
-        elif tipo_reporte == 'inventario':
-            pdf.cell(0, 10, 'Reporte de Inventario', 0, 1, 'C')
-            pdf.ln(10)
-            
-            pdf.set_font('Arial', 'B', 12)
-            pdf.cell(60, 10, 'Material', 1, 0, 'C')
-            pdf.cell(40, 10, 'Categoría', 1, 0, 'C')
-            pdf.cell(30, 10, 'Cantidad', 1, 0, 'C')
-            pdf.cell(30, 10, 'Precio Unit.', 1, 1, 'C')
-            
-            pdf.set_font('Arial', '', 10)
-            inventarios = Inventario.query.join(Material).filter(Material.activo == True).all()
-            for inventario in inventarios:
-                pdf.cell(60, 10, inventario.material.nombre_material[:30], 1, 0)
-                pdf.cell(40, 10, inventario.material.categoria[:20], 1, 0)
-                pdf.cell(30, 10, str(inventario.cantidad), 1, 0, 'C')
-                pdf.cell(30, 10, f"${inventario.material.precio_unitario:.2f}", 1, 1, 'R')
-        
-        elif tipo_reporte == 'planos':
-            pdf.cell(0, 10, 'Reporte de Planos', 0, 1, 'C')
-            pdf.ln(10)
-            
-            pdf.set_font('Arial', 'B', 10)
-            pdf.cell(50, 8, 'Nombre Plano', 1, 0, 'C')
-            pdf.cell(40, 8, 'Proyecto', 1, 0, 'C')
-            pdf.cell(30, 8, 'Tipo', 1, 0, 'C')
-            pdf.cell(35, 8, 'Cliente', 1, 0, 'C')
-            pdf.cell(35, 8, 'Fecha', 1, 1, 'C')
-            
-            pdf.set_font('Arial', '', 8)
-            planos = Plano.query.join(Proyecto).join(Cliente).join(TipoPlano).all()
-            for plano in planos:
-                pdf.cell(50, 6, plano.nombre_plano[:25], 1, 0)
-                pdf.cell(40, 6, plano.proyecto.nombre_proyecto[:20], 1, 0)
-                pdf.cell(30, 6, plano.tipo_plano.nombre_tipo[:15], 1, 0)
-                pdf.cell(35, 6, plano.proyecto.cliente.nombre_completo[:18], 1, 0)
-                pdf.cell(35, 6, plano.fecha_subida.strftime('%Y-%m-%d'), 1, 1, 'C')
-        
-        elif tipo_reporte == 'planos_proyecto':
-            id_proyecto = request.form.get('id_proyecto')
-            proyecto = Proyecto.query.get(id_proyecto)
-            
-            pdf.cell(0, 10, f'Reporte de Planos - {proyecto.nombre_proyecto}', 0, 1, 'C')
-            pdf.ln(5)
-            
-            pdf.set_font('Arial', 'B', 10)
-            pdf.cell(40, 6, 'Cliente:', 0, 0)
-            pdf.set_font('Arial', '', 10)
-            pdf.cell(0, 6, proyecto.cliente.nombre_completo, 0, 1)
-            pdf.set_font('Arial', 'B', 10)
-            pdf.cell(40, 6, 'Estado:', 0, 0)
-            pdf.set_font('Arial', '', 10)
-            pdf.cell(0, 6, proyecto.estado.title(), 0, 1)
-            pdf.ln(5)
-            
-            pdf.set_font('Arial', 'B', 10)
-            pdf.cell(70, 8, 'Nombre Plano', 1, 0, 'C')
-            pdf.cell(40, 8, 'Tipo', 1, 0, 'C')
-            pdf.cell(40, 8, 'Usuario', 1, 0, 'C')
-            pdf.cell(40, 8, 'Fecha Subida', 1, 1, 'C')
-            
-            pdf.set_font('Arial', '', 9)
-            planos = Plano.query.filter_by(id_proyecto=id_proyecto).all()
-            for plano in planos:
-                pdf.cell(70, 6, plano.nombre_plano[:35], 1, 0)
-                pdf.cell(40, 6, plano.tipo_plano.nombre_tipo, 1, 0)
-                pdf.cell(40, 6, plano.usuario.nombre_usuario, 1, 0)
-                pdf.cell(40, 6, plano.fecha_subida.strftime('%Y-%m-%d'), 1, 1, 'C')
-            
-            pdf.ln(5)
-            pdf.set_font('Arial', 'B', 10)
-            pdf.cell(0, 6, f'Total de planos: {len(planos)}', 0, 1)
-        
-        elif tipo_reporte == 'stock_bajo':
-            pdf.cell(0, 10, 'Reporte de Stock Bajo', 0, 1, 'C')
-            pdf.ln(10)
-            
-            pdf.set_font('Arial', 'B', 10)
-            pdf.cell(60, 8, 'Material', 1, 0, 'C')
-            pdf.cell(30, 8, 'Cantidad', 1, 0, 'C')
-            pdf.cell(30, 8, 'Stock Min.', 1, 0, 'C')
-            pdf.cell(40, 8, 'Ubicación', 1, 1, 'C')
-            
-            pdf.set_font('Arial', '', 9)
-            inventarios = Inventario.query.join(Material).filter(
-                Material.activo == True,
-                Inventario.cantidad <= Material.stock_minimo
-            ).all()
-            
-            for inventario in inventarios:
-                pdf.cell(60, 6, inventario.material.nombre_material[:30], 1, 0)
-                pdf.cell(30, 6, str(inventario.cantidad), 1, 0, 'C')
-                pdf.cell(30, 6, str(inventario.material.stock_minimo), 1, 0, 'C')
-                pdf.cell(40, 6, (inventario.ubicacion or 'N/A')[:20], 1, 1)
-        
-        # Generar respuesta
-        output = io.BytesIO()
-        pdf.output(output)
-        output.seek(0)
-        
-        return send_file(
-            output,
-            as_attachment=True,
-            download_name=f'reporte_{tipo_reporte}_{datetime.now().strftime("%Y%m%d")}.pdf',
-            mimetype='application/pdf'
-        )
-    
-    # Gestión de Usuarios
-    @app.route('/usuarios')
-    @login_required
-    def usuarios():
-        if not current_user.es_administrador:
-            flash('No tienes permisos para acceder a esta sección', 'error')
-            return redirect(url_for('dashboard'))
-        
-        search = request.args.get('search', '')
-        rol = request.args.get('rol', '')
-        
-        query = Usuario.query.filter(Usuario.activo == True)
-        
-        if search:
-            query = query.filter(
-                db.or_(
-                    Usuario.nombre_usuario.contains(search),
-                    Usuario.email.contains(search),
-                    Usuario.nombre_completo.contains(search)
-                )
-            )
-        
-        if rol:
-            query = query.filter(Usuario.rol == rol)
-        
-        usuarios = query.all()
-        
-        return render_template('usuarios.html', usuarios=usuarios, search=search, rol=rol)
-    
-    @app.route('/usuarios/crear', methods=['GET', 'POST'])
-    @login_required
-    def crear_usuario():
-        if not current_user.es_administrador:
-            flash('No tienes permisos para acceder a esta sección', 'error')
-            return redirect(url_for('dashboard'))
-        
-        if request.method == 'POST':
-            # Verificar si el usuario ya existe
-            if Usuario.query.filter_by(email=request.form['email']).first():
-                flash('El email ya está registrado', 'error')
-                return redirect(url_for('crear_usuario'))
-            
-            if Usuario.query.filter_by(nombre_usuario=request.form['nombre_usuario']).first():
-                flash('El nombre de usuario ya está en uso', 'error')
-                return redirect(url_for('crear_usuario'))
-            
-            usuario = Usuario(
-                nombre_usuario=request.form['nombre_usuario'],
-                email=request.form['email'],
-                rol=request.form['rol'],
-                nombre_completo=request.form.get('nombre_completo', ''),
-                telefono=request.form.get('telefono', ''),
-                direccion=request.form.get('direccion', ''),
-                activo=True
-            )
-            usuario.set_password(request.form['password'])
-            db.session.add(usuario)
-            db.session.commit()
-            
-            flash('Usuario creado exitosamente', 'success')
-            return redirect(url_for('usuarios'))
-        
-        return render_template('crear_usuario.html')
-    
-    @app.route('/usuarios/editar/<int:id>', methods=['GET', 'POST'])
-    @login_required
-    def editar_usuario(id):
-        if not current_user.es_administrador:
-            flash('No tienes permisos para acceder a esta sección', 'error')
-            return redirect(url_for('dashboard'))
-        
-        usuario = Usuario.query.get_or_404(id)
-        
-        if request.method == 'POST':
-            # Verificar email único
-            email_existente = Usuario.query.filter(
-                Usuario.email == request.form['email'],
-                Usuario.id_usuario != id
-            ).first()
-            if email_existente:
-                flash('El email ya está registrado', 'error')
-                return redirect(url_for('editar_usuario', id=id))
-            
-            usuario.nombre_usuario = request.form['nombre_usuario']
-            usuario.email = request.form['email']
-            usuario.rol = request.form['rol']
-            usuario.nombre_completo = request.form.get('nombre_completo', '')
-            usuario.telefono = request.form.get('telefono', '')
-            usuario.direccion = request.form.get('direccion', '')
-            
-            if request.form.get('password'):
-                usuario.set_password(request.form['password'])
-            
-            db.session.commit()
-            flash('Usuario actualizado exitosamente', 'success')
-            return redirect(url_for('usuarios'))
-        
-        return render_template('editar_usuario.html', usuario=usuario)
-    
-    @app.route('/usuarios/eliminar/<int:id>')
-    @login_required
-    def eliminar_usuario(id):
-        if not current_user.es_administrador:
-            flash('No tienes permisos para acceder a esta sección', 'error')
-            return redirect(url_for('dashboard'))
-        
-        if id == current_user.id_usuario:
-            flash('No puedes eliminar tu propio usuario', 'error')
-            return redirect(url_for('usuarios'))
-        
-        usuario = Usuario.query.get_or_404(id)
-        usuario.activo = False
-        db.session.commit()
-        flash('Usuario desactivado exitosamente', 'success')
-        return redirect(url_for('usuarios'))
-    
-    # Configuración
-    @app.route('/configuracion')
-    @login_required
-    def configuracion():
-        return render_template('configuracion.html', usuario=current_user)
-    
-    @app.route('/configuracion/actualizar', methods=['POST'])
-    @login_required
-    def actualizar_configuracion():
-        usuario = current_user
-        usuario.nombre_usuario = request.form['nombre_usuario']
-        usuario.email = request.form['email']
-        usuario.nombre_completo = request.form.get('nombre_completo', '')
-        usuario.telefono = request.form.get('telefono', '')
-        usuario.direccion = request.form.get('direccion', '')
-        
-        if request.form.get('password'):
-            usuario.set_password(request.form['password'])
-        
-        db.session.commit()
-        flash('Configuración actualizada exitosamente', 'success')
-        return redirect(url_for('configuracion'))
-    
-    # Funciones auxiliares
-    def allowed_file(filename):
-        return '.' in filename and \
-               filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
-    
-    return app
-
-if __name__ == '__main__':
-    app = create_app()
-    app.run(debug=True)
-
+from flask import (Flask, Request, render_template, request, redirect, url_for, flash, session, send_file,
+                   jsonify, abort, current_app, stream_with_context)
+from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
+from werkzeug.utils import secure_filename
+from models import (db, Usuario, Cliente, Proyecto, TipoPlano, Plano, Material, Inventario,
+                    MovimientoInventario, Venta)
+from config import config
+from base_datos import configurar_base_datos
+from paginacion import paginar, filas_acotadas, total_acotado, contar_acotado
+from consultas import presupuesto_consultas, init_presupuesto_consultas
+from metricas import init_metricas, formato_prometheus
+from busqueda import init_busqueda, filtro_busqueda, buscar_ordenado, cargar_en_orden
+from estadisticas import init_estadisticas, obtener_estadisticas
+from versiones import init_versiones
+from migraciones import init_migraciones
+from arranque import init_arranque
+from datos_sinteticos import init_datos_sinteticos
+from rendimiento import init_rendimiento
+from almacen import init_almacen, guardar_archivo, enviar_plano
+from facturas import (init_facturas, cargar_venta_factura, factura_en_cache, ids_ventas_periodo,
+                      facturas_en_paralelo, FORMATOS_LOTE_FACTURAS)
+from api import ErrorApi, requiere_sesion_api, indice_api, listado_api, detalle_api
+from ventas import VentaInvalida, validar_venta, registrar_venta, venta_a_json
+from intercambio_csv import ENTIDADES_CSV, ErrorImportacion, exportar_csv, importar_csv
+from contrasenas import (init_contrasenas, VerificacionesSaturadas, verificar_contrasena,
+                         necesita_rehash)
+from cache_usuarios import init_cache_usuarios, usuario_en_cache, invalidar_usuarios
+from eventos_sse import init_eventos_sse, responder_flujo
+from stock_bajo import init_stock_bajo, contar_stock_bajo
+from dashboard_vivo import init_dashboard_vivo, datos_dashboard
+from movimientos import (init_movimientos, registrar_movimiento, crear_inventarios,
+                         existencias_en_fecha, StockInsuficiente)
+from subidas import (ErrorSubida, crear_subida, obtener_subida, escribir_bloque,
+                     completar_subida, descartar_subida, desplazamiento)
+from vistas_previas import solicitar_vista_previa, resumen_vista_previa, ruta_tesela
+from reportes import (TABLAS_REPORTE, solicitar_reporte, estado_reporte, error_reporte,
+                      ruta_reporte, tipo_de_clave, resolver_periodo, PeriodoInvalido, PERIODOS)
+import hmac
+import json
+import os
+import re
+from decimal import Decimal
+from datetime import datetime, date
+
+class Peticion(Request):
+    """Petición con un límite de tamaño propio para la importación CSV"""
+    
+    @property
+    def max_content_length(self):
+        # El archivo se lee desde un temporal en disco, sin cargarlo en memoria
+        if self.endpoint == 'importar_datos':
+            return current_app.config['CSV_TAMANO_MAXIMO']
+        return super().max_content_length
+
+def create_app(nombre_config=None):
+    """Factory function para crear la aplicación Flask.
+
+    La configuración sale de `nombre_config` o de FLASK_CONFIG
+    ('development' por defecto; wsgi.py usa 'production').
+    """
+    app = Flask(__name__)
+    app.request_class = Peticion
+    
+    # Configuración
+    nombre_config = nombre_config or os.environ.get('FLASK_CONFIG', 'default')
+    app.config.from_object(config[nombre_config])
+    config[nombre_config].init_app(app)
+    
+    # Inicializar extensiones
+    configurar_base_datos(app)
+    db.init_app(app)
+    init_presupuesto_consultas(app)
+    init_metricas(app)
+    init_busqueda(app)
+    init_estadisticas(app)
+    init_versiones(app)
+    init_almacen(app)
+    init_movimientos(app)
+    init_eventos_sse(app)
+    init_stock_bajo(app)
+    init_dashboard_vivo(app)
+    init_facturas(app)
+    init_cache_usuarios(app)
+    init_contrasenas(app)
+    init_migraciones(app)
+    # Tablas, migraciones y datos iniciales: `flask inicializar-bd`, nunca al arrancar
+    init_arranque(app)
+    init_datos_sinteticos(app)
+    init_rendimiento(app)
+    
+    # Configurar Flask-Login
+    login_manager = LoginManager()
+    login_manager.init_app(app)
+    login_manager.login_view = 'login'
+    login_manager.login_message = 'Por favor inicia sesión para acceder a esta página.'
+    
+    @login_manager.user_loader
+    def load_user(user_id):
+        # Sin consulta en cada petición: identidad y rol salen de la caché del proceso
+        return usuario_en_cache(int(user_id))
+    
+    # Rutas de autenticación
+    @app.route('/login', methods=['GET', 'POST'])
+    def login():
+        if request.method == 'POST':
+            email = request.form['email']
+            password = request.form['password']
+            user = Usuario.query.filter_by(email=email).first()
+            
+            # El hash se verifica en hilos acotados, no en el de la petición
+            try:
+                valida = verificar_contrasena(user.contraseña if user else None, password)
+            except VerificacionesSaturadas:
+                flash('Hay muchos inicios de sesión en curso; inténtalo de nuevo en unos segundos', 'error')
+                return render_template('login.html'), 503
+            
+            if valida:
+                # Actualizar el hash si se generó con otro método o coste que el configurado
+                if necesita_rehash(user.contraseña):
+                    user.set_password(password)
+                    db.session.commit()
+                login_user(user)
+                return redirect(url_for('dashboard'))
+            else:
+                flash('Credenciales inválidas', 'error')
+        
+        return render_template('login.html')
+    
+    @app.route('/logout')
+    @login_required
+    def logout():
+        logout_user()
+        return redirect(url_for('login'))
+    
+    # Dashboard
+    @app.route('/')
+    @app.route('/dashboard')
+    @login_required
+    @presupuesto_consultas(4)
+    def dashboard():
+        # Una consulta: la fila de totales por clave primaria y la versión de las listas
+        # recientes, que se releen solo si cambió (3 en ese caso)
+        estadisticas, listas = datos_dashboard()
+        
+        return render_template('dashboard.html',
+                             total_clientes=estadisticas.total_clientes,
+                             total_proyectos=estadisticas.total_proyectos,
+                             total_planos=estadisticas.total_planos,
+                             total_ventas=estadisticas.total_ventas,
+                             existencia_total=estadisticas.existencia_total,
+                             importe_vendido=estadisticas.importe_vendido,
+                             proyectos_recientes=listas['proyectos']['proyectos'],
+                             ventas_recientes=listas['ventas']['ventas'])
+    
+    @app.route('/dashboard/eventos')
+    @login_required
+    @presupuesto_consultas(3)
+    def eventos_dashboard():
+        # Flujo SSE del dashboard con los avisos de stock: una sola conexión por página.
+        # El punto de partida de los canales lo toma el hilo lector, fuera de la petición
+        return responder_flujo('dashboard', 'stock')
+    
+    # Gestión de Clientes
+    @app.route('/clientes')
+    @login_required
+    @presupuesto_consultas(3)
+    def clientes():
+        search = request.args.get('search', '')
+        if search:
+            query = Cliente.query.filter(
+                filtro_busqueda(Cliente.id_cliente, 'clientes_fts', search,
+                                (Cliente.nombre, Cliente.apellido, Cliente.email))
+            )
+        else:
+            query = Cliente.query
+        
+        query = query.options(db.selectinload(Cliente.proyectos))
+        clientes = paginar_consulta(query, [(Cliente.id_cliente, False)])
+        
+        return render_template('clientes.html', clientes=clientes, search=search)
+    
+    @app.route('/clientes/crear', methods=['GET', 'POST'])
+    @login_required
+    def crear_cliente():
+        if request.method == 'POST':
+            cliente = Cliente(
+                nombre=request.form['nombre'],
+                apellido=request.form['apellido'],
+                email=request.form['email'],
+                telefono=request.form['telefono'],
+                direccion=request.form['direccion']
+            )
+            db.session.add(cliente)
+            db.session.commit()
+            flash('Cliente creado exitosamente', 'success')
+            return redirect(url_for('clientes'))
+        
+        return render_template('crear_cliente.html')
+    
+    @app.route('/clientes/editar/<int:id>', methods=['GET', 'POST'])
+    @login_required
+    def editar_cliente(id):
+        cliente = Cliente.query.get_or_404(id)
+        
+        if request.method == 'POST':
+            cliente.nombre = request.form['nombre']
+            cliente.apellido = request.form['apellido']
+            cliente.email = request.form['email']
+            cliente.telefono = request.form['telefono']
+            cliente.direccion = request.form['direccion']
+            db.session.commit()
+            flash('Cliente actualizado exitosamente', 'success')
+            return redirect(url_for('clientes'))
+        
+        return render_template('editar_cliente.html', cliente=cliente)
+    
+    @app.route('/clientes/eliminar/<int:id>')
+    @login_required
+    def eliminar_cliente(id):
+        cliente = Cliente.query.get_or_404(id)
+        db.session.delete(cliente)
+        db.session.commit()
+        flash('Cliente eliminado exitosamente', 'success')
+        return redirect(url_for('clientes'))
+    
+    # Gestión de Proyectos
+    @app.route('/proyectos')
+    @login_required
+    @presupuesto_consultas(3)
+    def proyectos():
+        search = request.args.get('search', '')
+        estado = request.args.get('estado', '')
+        
+        query = Proyecto.query.options(
+            db.joinedload(Proyecto.cliente),
+            db.selectinload(Proyecto.planos)
+        )
+        
+        if search:
+            query = query.filter(
+                filtro_busqueda(Proyecto.id_proyecto, 'proyectos_fts', search,
+                                (Proyecto.nombre_proyecto,), columna_fts='nombre_proyecto')
+            )
+        
+        if estado:
+            query = query.filter(Proyecto.estado == estado)
+        
+        proyectos = paginar_consulta(query, [(Proyecto.id_proyecto, False)])
+        
+        return render_template('proyectos.html', proyectos=proyectos, search=search, estado=estado)
+    
+    @app.route('/proyectos/crear', methods=['GET', 'POST'])
+    @login_required
+    def crear_proyecto():
+        if request.method == 'POST':
+            proyecto = Proyecto(
+                id_cliente=request.form['id_cliente'],
+                nombre_proyecto=request.form['nombre_proyecto'],
+                descripcion=request.form['descripcion'],
+                fecha_inicio=datetime.strptime(request.form['fecha_inicio'], '%Y-%m-%d').date(),
+                fecha_fin=datetime.strptime(request.form['fecha_fin'], '%Y-%m-%d').date(),
+                estado=request.form['estado']
+            )
+            db.session.add(proyecto)
+            db.session.commit()
+            flash('Proyecto creado exitosamente', 'success')
+            return redirect(url_for('proyectos'))
+        
+        clientes = Cliente.query.all()
+        return render_template('crear_proyecto.html', clientes=clientes)
+    
+    @app.route('/proyectos/editar/<int:id>', methods=['GET', 'POST'])
+    @login_required
+    def editar_proyecto(id):
+        proyecto = Proyecto.query.get_or_404(id)
+        
+        if request.method == 'POST':
+            proyecto.id_cliente = request.form['id_cliente']
+            proyecto.nombre_proyecto = request.form['nombre_proyecto']
+            proyecto.descripcion = request.form['descripcion']
+            proyecto.fecha_inicio = datetime.strptime(request.form['fecha_inicio'], '%Y-%m-%d').date()
+            proyecto.fecha_fin = datetime.strptime(request.form['fecha_fin'], '%Y-%m-%d').date()
+            proyecto.estado = request.form['estado']
+            db.session.commit()
+            flash('Proyecto actualizado exitosamente', 'success')
+            return redirect(url_for('proyectos'))
+        
+        clientes = Cliente.query.all()
+        return render_template('editar_proyecto.html', proyecto=proyecto, clientes=clientes)
+    
+    @app.route('/proyectos/eliminar/<int:id>')
+    @login_required
+    def eliminar_proyecto(id):
+        proyecto = Proyecto.query.get_or_404(id)
+        db.session.delete(proyecto)
+        db.session.commit()
+        flash('Proyecto eliminado exitosamente', 'success')
+        return redirect(url_for('proyectos'))
+    
+    # Gestión de Planos
+    @app.route('/planos')
+    @login_required
+    @presupuesto_consultas(3)
+    def planos():
+        search = request.args.get('search', '')
+        tipo = request.args.get('tipo', '')
+        
+        query = Plano.query.join(Proyecto).join(Cliente).options(
+            db.contains_eager(Plano.proyecto).contains_eager(Proyecto.cliente),
+            db.joinedload(Plano.tipo_plano)
+        )
+        
+        if search:
+            query = query.filter(
+                filtro_busqueda(Plano.id_plano, 'planos_fts', search,
+                                (Plano.nombre_plano, Proyecto.nombre_proyecto, Cliente.nombre))
+            )
+        
+        if tipo:
+            query = query.join(TipoPlano).filter(TipoPlano.id_tipo_plano == tipo)
+        
+        planos = paginar_consulta(query, [(Plano.id_plano, False)])
+        tipos_plano = TipoPlano.query.all()
+        
+        return render_template('planos.html', planos=planos, tipos_plano=tipos_plano, search=search, tipo=tipo)
+    
+    @app.route('/planos/subir', methods=['GET', 'POST'])
+    @login_required
+    def subir_plano():
+        if request.method == 'POST':
+            try:
+                # Validar que se haya enviado un archivo
+                if 'archivo' not in request.files:
+                    flash('No se seleccionó ningún archivo', 'error')
+                    proyectos = Proyecto.query.options(db.joinedload(Proyecto.cliente)).all()
+                    tipos_plano = TipoPlano.query.all()
+                    return render_template('subir_plano.html', proyectos=proyectos, tipos_plano=tipos_plano)
+                
+                archivo = request.files['archivo']
+                if archivo.filename == '':
+                    flash('No se seleccionó ningún archivo', 'error')
+                    proyectos = Proyecto.query.options(db.joinedload(Proyecto.cliente)).all()
+                    tipos_plano = TipoPlano.query.all()
+                    return render_template('subir_plano.html', proyectos=proyectos, tipos_plano=tipos_plano)
+                
+                # Validar tipo de archivo
+                if archivo and allowed_file(archivo.filename):
+                    # Guardar por contenido: un archivo idéntico ya subido se reutiliza
+                    filename = guardar_archivo(archivo.stream, secure_filename(archivo.filename))
+                    
+                    # Crear registro en base de datos
+                    plano = Plano(
+                        id_proyecto=int(request.form['id_proyecto']),
+                        id_tipo_plano=int(request.form['id_tipo_plano']),
+                        id_usuario=current_user.id_usuario,
+                        nombre_plano=request.form['nombre_plano'],
+                        archivo=filename
+                    )
+                    db.session.add(plano)
+                    db.session.commit()
+                    
+                    # La pirámide de teselas para el visor se genera en segundo plano
+                    pedir_vista_previa(plano)
+                    
+                    flash('Plano subido exitosamente', 'success')
+                    return redirect(url_for('planos'))
+                else:
+                    flash('Tipo de archivo no permitido. Formatos válidos: PDF, DWG, DXF, JPG, PNG', 'error')
+                    proyectos = Proyecto.query.options(db.joinedload(Proyecto.cliente)).all()
+                    tipos_plano = TipoPlano.query.all()
+                    return render_template('subir_plano.html', proyectos=proyectos, tipos_plano=tipos_plano)
+                    
+            except Exception as e:
+                db.session.rollback()
+                flash(f'Error al subir el plano: {str(e)}', 'error')
+                proyectos = Proyecto.query.options(db.joinedload(Proyecto.cliente)).all()
+                tipos_plano = TipoPlano.query.all()
+                return render_template('subir_plano.html', proyectos=proyectos, tipos_plano=tipos_plano)
+        
+        proyectos = Proyecto.query.options(db.joinedload(Proyecto.cliente)).all()
+        tipos_plano = TipoPlano.query.all()
+        return render_template('subir_plano.html', proyectos=proyectos, tipos_plano=tipos_plano)
+    
+    # Subida por bloques reanudable para planos grandes (ver static/js/main.js)
+    @app.errorhandler(ErrorSubida)
+    def error_subida(e):
+        respuesta = {'error': str(e)}
+        if e.desplazamiento is not None:
+            respuesta['desplazamiento'] = e.desplazamiento
+        return jsonify(respuesta), e.estado
+    
+    def datos_subida(subida):
+        return {
+            'id': subida['id'],
+            'desplazamiento': desplazamiento(app, subida),
+            'tamano': subida['tamano'],
+            'tamano_bloque': app.config['TAMANO_BLOQUE_SUBIDA'],
+            'url': url_for('subida_plano', id_subida=subida['id']),
+        }
+    
+    @app.route('/planos/subidas', methods=['POST'])
+    @login_required
+    def iniciar_subida_plano():
+        datos = request.get_json(silent=True) or {}
+        nombre_archivo = secure_filename(str(datos.get('nombre_archivo', '')))
+        if not allowed_file(nombre_archivo):
+            raise ErrorSubida('Tipo de archivo no permitido. Formatos válidos: PDF, DWG, DXF, JPG, PNG')
+        try:
+            tamano = int(datos.get('tamano'))
+        except (TypeError, ValueError):
+            raise ErrorSubida('Tamaño de archivo no válido')
+        
+        subida = crear_subida(app, current_user.id_usuario, nombre_archivo, tamano,
+                              datos.get('sha256') or None)
+        return jsonify(datos_subida(subida)), 201
+    
+    @app.route('/planos/subidas/<id_subida>', methods=['GET', 'PUT', 'DELETE'])
+    @login_required
+    def subida_plano(id_subida):
+        subida = obtener_subida(app, id_subida, current_user.id_usuario)
+        if subida is None:
+            return jsonify({'error': 'La subida no existe o ha caducado'}), 404
+        
+        if request.method == 'DELETE':
+            descartar_subida(app, subida)
+            return '', 204
+        
+        if request.method == 'PUT':
+            # Content-Range: bytes <inicio>-<fin>/<total>
+            rango = request.headers.get('Content-Range', '')
+            coincidencia = re.fullmatch(r'bytes (\d+)-(\d+)/(\d+)', rango)
+            if not coincidencia or int(coincidencia.group(3)) != subida['tamano']:
+                raise ErrorSubida('Cabecera Content-Range no válida')
+            inicio, fin = int(coincidencia.group(1)), int(coincidencia.group(2))
+            if request.content_length != fin - inicio + 1:
+                raise ErrorSubida('Content-Range no coincide con Content-Length')
+            escribir_bloque(app, subida, inicio, request.stream, request.content_length,
+                            request.headers.get('X-Checksum-SHA256'))
+        
+        return jsonify(datos_subida(subida))
+    
+    @app.route('/planos/subidas/<id_subida>/completar', methods=['POST'])
+    @login_required
+    def completar_subida_plano(id_subida):
+        subida = obtener_subida(app, id_subida, current_user.id_usuario)
+        if subida is None:
+            return jsonify({'error': 'La subida no existe o ha caducado'}), 404
+        try:
+            id_proyecto = int(request.form['id_proyecto'])
+            id_tipo_plano = int(request.form['id_tipo_plano'])
+            nombre_plano = request.form['nombre_plano']
+        except (KeyError, ValueError):
+            raise ErrorSubida('Faltan datos del plano')
+        
+        # El plano solo se registra cuando el archivo completo está verificado
+        archivo = completar_subida(app, subida)
+        plano = Plano(
+            id_proyecto=id_proyecto,
+            id_tipo_plano=id_tipo_plano,
+            id_usuario=current_user.id_usuario,
+            nombre_plano=nombre_plano,
+            archivo=archivo
+        )
+        db.session.add(plano)
+        try:
+            db.session.commit()
+        except Exception:
+            # El rollback retira del almacén el archivo recién publicado
+            db.session.rollback()
+            raise
+        pedir_vista_previa(plano)
+        
+        flash('Plano subido exitosamente', 'success')
+        return jsonify({'id_plano': plano.id_plano, 'url': url_for('planos')}), 201
+    
+    @app.route('/planos/ver/<int:id>')
+    @login_required
+    def ver_plano(id):
+        plano = Plano.query.get_or_404(id)
+        respuesta = enviar_plano(plano)
+        
+        if respuesta is not None:
+            return respuesta
+        else:
+            flash('Archivo no encontrado', 'error')
+            return redirect(url_for('planos'))
+    
+    @app.route('/planos/descargar/<int:id>')
+    @login_required
+    def descargar_plano(id):
+        plano = Plano.query.get_or_404(id)
+        respuesta = enviar_plano(plano, como_adjunto=True)
+        
+        if respuesta is not None:
+            return respuesta
+        else:
+            flash('Archivo no encontrado', 'error')
+            return redirect(url_for('planos'))
+    
+    @app.route('/planos/eliminar/<int:id>')
+    @login_required
+    def eliminar_plano(id):
+        plano = Plano.query.get_or_404(id)
+        
+        # El archivo físico se borra tras el commit si ningún otro plano lo usa
+        db.session.delete(plano)
+        db.session.commit()
+        flash('Plano eliminado exitosamente', 'success')
+        return redirect(url_for('planos'))
+    
+    @app.route('/planos/detalle/<int:id>')
+    @login_required
+    @presupuesto_consultas(2)
+    def detalle_plano(id):
+        plano = Plano.query.options(
+            db.joinedload(Plano.proyecto).joinedload(Proyecto.cliente),
+            db.joinedload(Plano.tipo_plano),
+            db.joinedload(Plano.usuario)
+        ).filter_by(id_plano=id).first_or_404()
+        vista_previa = resumen_vista_previa(app, plano.archivo)
+        return render_template('detalle_plano.html', plano=plano, vista_previa=vista_previa)
+    
+    @app.route('/planos/detalle/<int:id>/vista-previa')
+    @login_required
+    @presupuesto_consultas(2)
+    def vista_previa_plano(id):
+        plano = Plano.query.get_or_404(id)
+        return jsonify(resumen_vista_previa(app, plano.archivo))
+    
+    @app.route('/planos/teselas/<codigo>/<int:nivel>/<int:columna>_<int:fila>.jpg')
+    @login_required
+    def tesela_plano(codigo, nivel, columna, fila):
+        # El hash identifica el contenido: una tesela nunca cambia para la misma URL
+        if not re.fullmatch(r'[0-9a-f]{64}', codigo):
+            abort(404)
+        ruta = ruta_tesela(app, codigo, nivel, columna, fila)
+        if not os.path.exists(ruta):
+            abort(404)
+        
+        respuesta = send_file(ruta, mimetype='image/jpeg', max_age=365 * 24 * 3600,
+                              etag=f'{codigo}-{nivel}-{columna}-{fila}')
+        respuesta.cache_control.public = None
+        respuesta.cache_control.private = True
+        respuesta.cache_control.immutable = True
+        return respuesta
+    
+    @app.route('/planos/buscar')
+    @login_required
+    @presupuesto_consultas(5)
+    def buscar_planos():
+        # Búsqueda avanzada
+        q = request.args.get('q', '')
+        nombre = request.args.get('nombre', '')
+        proyecto = request.args.get('proyecto', '')
+        tipo = request.args.get('tipo', '')
+        fecha_desde = request.args.get('fecha_desde', '')
+        fecha_hasta = request.args.get('fecha_hasta', '')
+        
+        query = Plano.query.join(Proyecto).join(Cliente).options(
+            db.contains_eager(Plano.proyecto).contains_eager(Proyecto.cliente),
+            db.joinedload(Plano.tipo_plano)
+        )
+        
+        if q:
+            query = query.filter(
+                filtro_busqueda(Plano.id_plano, 'planos_fts', q,
+                                (Plano.nombre_plano, Proyecto.nombre_proyecto, Cliente.nombre))
+            )
+        
+        if nombre:
+            query = query.filter(
+                filtro_busqueda(Plano.id_plano, 'planos_fts', nombre,
+                                (Plano.nombre_plano,), columna_fts='nombre_plano')
+            )
+        
+        if proyecto.isdigit():
+            query = query.filter(Plano.id_proyecto == int(proyecto))
+        elif proyecto:
+            query = query.filter(
+                filtro_busqueda(Plano.id_plano, 'planos_fts', proyecto,
+                                (Proyecto.nombre_proyecto,), columna_fts='nombre_proyecto')
+            )
+        
+        if tipo:
+            query = query.join(TipoPlano).filter(TipoPlano.id_tipo_plano == tipo)
+        
+        if fecha_desde:
+            fecha_desde_obj = datetime.strptime(fecha_desde, '%Y-%m-%d')
+            query = query.filter(Plano.fecha_subida >= fecha_desde_obj)
+        
+        if fecha_hasta:
+            fecha_hasta_obj = datetime.strptime(fecha_hasta, '%Y-%m-%d')
+            query = query.filter(Plano.fecha_subida <= fecha_hasta_obj)
+        
+        # Solo en la primera página, y acotado: el recuento no crece con la tabla
+        total_planos = None
+        if primera_pagina():
+            total_planos = contar_acotado(query, app.config['RESUMEN_MAX_FILAS'])
+        planos = paginar_consulta(query, [(Plano.id_plano, False)])
+        tipos_plano = TipoPlano.query.all()
+        proyectos = Proyecto.query.with_entities(Proyecto.id_proyecto, Proyecto.nombre_proyecto) \
+            .order_by(Proyecto.nombre_proyecto).all()
+        
+        return render_template('buscar_planos.html', 
+                             planos=planos, 
+                             total_planos=total_planos,
+                             tipos_plano=tipos_plano,
+                             proyectos=proyectos,
+                             query=q,
+                             nombre=nombre,
+                             proyecto=proyecto,
+                             tipo=tipo,
+                             fecha_desde=fecha_desde,
+                             fecha_hasta=fecha_hasta)
+    
+    @app.route('/buscar')
+    @login_required
+    @presupuesto_consultas(10)
+    def buscar():
+        # Búsqueda global ordenada por relevancia en todos los índices
+        search = request.args.get('search', '')
+        limite = app.config['RESULTADOS_BUSQUEDA']
+        resultados = {'clientes': [], 'proyectos': [], 'planos': [], 'materiales': []}
+        
+        if search:
+            resultados['clientes'] = cargar_en_orden(
+                Cliente, Cliente.id_cliente,
+                buscar_ordenado(Cliente.id_cliente, 'clientes_fts', search,
+                                (Cliente.nombre, Cliente.apellido, Cliente.email), limite))
+            resultados['proyectos'] = cargar_en_orden(
+                Proyecto, Proyecto.id_proyecto,
+                buscar_ordenado(Proyecto.id_proyecto, 'proyectos_fts', search,
+                                (Proyecto.nombre_proyecto, Proyecto.descripcion), limite),
+                db.joinedload(Proyecto.cliente))
+            resultados['planos'] = cargar_en_orden(
+                Plano, Plano.id_plano,
+                buscar_ordenado(Plano.id_plano, 'planos_fts', search,
+                                (Plano.nombre_plano, Proyecto.nombre_proyecto, Cliente.nombre), limite,
+                                uniones=(Plano.proyecto, Proyecto.cliente)),
+                db.joinedload(Plano.proyecto).joinedload(Proyecto.cliente),
+                db.joinedload(Plano.tipo_plano))
+            resultados['materiales'] = cargar_en_orden(
+                Material, Material.id_material,
+                buscar_ordenado(Material.id_material, 'materiales_fts', search,
+                                (Material.nombre_material, Material.descripcion), limite))
+        
+        return render_template('buscar.html', search=search, resultados=resultados)
+    
+    # Gestión de Inventario
+    @app.route('/inventario')
+    @login_required
+    @presupuesto_consultas(4)
+    def inventario():
+        search = request.args.get('search', '')
+        categoria = request.args.get('categoria', '')
+        
+        query = Inventario.query.join(Material).options(db.contains_eager(Inventario.material))
+        
+        if search:
+            query = query.filter(
+                filtro_busqueda(Material.id_material, 'materiales_fts', search,
+                                (Material.nombre_material, Material.descripcion))
+            )
+        
+        if categoria:
+            query = query.filter(Material.categoria == categoria)
+        
+        # Totales solo en la primera página, agregados sobre como mucho RESUMEN_MAX_FILAS
+        # filas del filtro; si hay más, el valor no se muestra
+        resumen = None
+        if primera_pagina():
+            maximo = app.config['RESUMEN_MAX_FILAS']
+            filas = filas_acotadas(query, maximo,
+                                   (Inventario.cantidad * Material.precio_unitario).label('valor'))
+            total_materiales, valor_inventario = db.session.query(
+                db.func.count(), db.func.sum(filas.c.valor)
+            ).one()
+            completo = total_materiales <= maximo
+            resumen = {
+                'total_materiales': total_acotado(total_materiales, maximo),
+                'valor_total': float(valor_inventario or 0) if completo else None
+            }
+        
+        inventarios = paginar_consulta(query, [(Inventario.id_inventario, False)])
+        
+        return render_template('inventario.html', 
+                             inventarios=inventarios, 
+                             total_stock_bajo=contar_stock_bajo(),
+                             resumen=resumen,
+                             search=search,
+                             categoria=categoria)
+    
+    @app.route('/inventario/alertas')
+    @login_required
+    @presupuesto_consultas(3)
+    def alertas_stock():
+        # Flujo SSE: el conjunto de stock bajo al conectar y después cada cambio
+        return responder_flujo('stock')
+    
+    @app.route('/inventario/materiales')
+    @login_required
+    @presupuesto_consultas(2)
+    def materiales():
+        search = request.args.get('search', '')
+        categoria = request.args.get('categoria', '')
+        
+        query = Material.query
+        
+        if search:
+            query = query.filter(
+                filtro_busqueda(Material.id_material, 'materiales_fts', search,
+                                (Material.nombre_material, Material.descripcion))
+            )
+        
+        if categoria:
+            query = query.filter(Material.categoria == categoria)
+        
+        materiales = paginar_consulta(query.filter(Material.activo == True),
+                                      [(Material.id_material, False)])
+        
+        return render_template('materiales.html', materiales=materiales, search=search, categoria=categoria)
+    
+    @app.route('/inventario/materiales/crear', methods=['GET', 'POST'])
+    @login_required
+    def crear_material():
+        if request.method == 'POST':
+            material = Material(
+                nombre_material=request.form['nombre_material'],
+                descripcion=request.form['descripcion'],
+                categoria=request.form['categoria'],
+                subcategoria=request.form.get('subcategoria', ''),
+                precio_unitario=float(request.form['precio_unitario']),
+                precio_compra=float(request.form.get('precio_compra', 0)),
+                unidad_medida=request.form['unidad_medida'],
+                stock_minimo=int(request.form['stock_minimo'])
+            )
+            db.session.add(material)
+            db.session.flush()
+            
+            # Inventario inicial con su movimiento en una sola escritura: el conjunto de stock
+            # bajo solo ve la existencia final, sin pasar por un inventario vacío
+            crear_inventarios([{
+                'id_material': material.id_material,
+                'cantidad': int(request.form.get('cantidad_inicial', 0)),
+                'ubicacion': request.form.get('ubicacion', '')
+            }], current_user.id_usuario)
+            db.session.commit()
+            
+            flash('Material creado exitosamente', 'success')
+            return redirect(url_for('materiales'))
+        
+        return render_template('crear_material.html')
+    
+    @app.route('/inventario/materiales/editar/<int:id>', methods=['GET', 'POST'])
+    @login_required
+    def editar_material(id):
+        material = Material.query.get_or_404(id)
+        
+        if request.method == 'POST':
+            material.nombre_material = request.form['nombre_material']
+            material.descripcion = request.form['descripcion']
+            material.categoria = request.form['categoria']
+            material.subcategoria = request.form.get('subcategoria', '')
+            material.precio_unitario = float(request.form['precio_unitario'])
+            material.precio_compra = float(request.form.get('precio_compra', 0))
+            material.unidad_medida = request.form['unidad_medida']
+            material.stock_minimo = int(request.form['stock_minimo'])
+            db.session.commit()
+            
+            flash('Material actualizado exitosamente', 'success')
+            return redirect(url_for('materiales'))
+        
+        return render_template('editar_material.html', material=material)
+    
+    @app.route('/inventario/materiales/eliminar/<int:id>')
+    @login_required
+    def eliminar_material(id):
+        material = Material.query.get_or_404(id)
+        material.activo = False
+        db.session.commit()
+        flash('Material desactivado exitosamente', 'success')
+        return redirect(url_for('materiales'))
+    
+    @app.route('/inventario/ajustar/<int:id>', methods=['GET', 'POST'])
+    @login_required
+    def ajustar_inventario(id):
+        inventario = Inventario.query.options(
+            db.joinedload(Inventario.material)
+        ).filter_by(id_inventario=id).first_or_404()
+        
+        if request.method == 'POST':
+            tipo_ajuste = request.form['tipo_ajuste']
+            cantidad = int(request.form['cantidad'])
+            if tipo_ajuste not in ('entrada', 'salida', 'ajuste') or cantidad < 0:
+                flash('Ajuste de inventario no válido', 'error')
+                return redirect(url_for('ajustar_inventario', id=id))
+            
+            # La cantidad se actualiza en SQL, no sobre el valor leído en esta petición
+            try:
+                registrar_movimiento(id, tipo_ajuste, cantidad, current_user.id_usuario)
+            except StockInsuficiente as e:
+                db.session.rollback()
+                flash(str(e), 'error')
+                return redirect(url_for('inventario'))
+            
+            inventario.ubicacion = request.form.get('ubicacion', inventario.ubicacion)
+            db.session.commit()
+            
+            flash('Inventario ajustado exitosamente', 'success')
+            return redirect(url_for('inventario'))
+        
+        return render_template('ajustar_inventario.html', inventario=inventario)
+    
+    @app.route('/inventario/<int:id>/movimientos')
+    @login_required
+    @presupuesto_consultas(4)
+    def historial_inventario(id):
+        inventario = Inventario.query.options(
+            db.joinedload(Inventario.material)
+        ).filter_by(id_inventario=id).first_or_404()
+        
+        # Existencia en una fecha pasada, desde la última instantánea anterior
+        fecha = request.args.get('fecha', '')
+        existencia_fecha = None
+        if fecha:
+            try:
+                limite = datetime.strptime(fecha, '%Y-%m-%d').replace(hour=23, minute=59, second=59)
+            except ValueError:
+                flash('Fecha no válida', 'error')
+                fecha = ''
+            else:
+                existencia_fecha = existencias_en_fecha(limite, [id]).get(id, 0)
+        
+        query = MovimientoInventario.query.options(
+            db.joinedload(MovimientoInventario.usuario)
+        ).filter(MovimientoInventario.id_inventario == id)
+        movimientos = paginar_consulta(query, [(MovimientoInventario.id_movimiento, True)])
+        
+        return render_template('historial_inventario.html', inventario=inventario,
+                               movimientos=movimientos, fecha=fecha,
+                               existencia_fecha=existencia_fecha)
+    
+    # Importación y exportación CSV
+    @app.route('/datos/<entidad>.csv')
+    @login_required
+    def exportar_datos(entidad):
+        if entidad not in ENTIDADES_CSV:
+            abort(404)
+        fecha = datetime.now().strftime('%Y%m%d')
+        return app.response_class(
+            stream_with_context(exportar_csv(entidad, app.config['CSV_TAMANO_LOTE'])),
+            mimetype='text/csv',
+            headers={'Content-Disposition': f'attachment; filename={entidad}_{fecha}.csv'}
+        )
+    
+    @app.route('/datos/importar', methods=['GET', 'POST'])
+    @login_required
+    def importar_datos():
+        entidad = request.values.get('entidad', 'clientes')
+        if entidad not in ENTIDADES_CSV:
+            abort(404)
+        
+        resultado = None
+        if request.method == 'POST':
+            archivo = request.files.get('archivo')
+            if not archivo or not archivo.filename:
+                flash('No se seleccionó ningún archivo', 'error')
+                return redirect(url_for('importar_datos', entidad=entidad))
+            try:
+                resultado = importar_csv(entidad, archivo.stream, current_user.id_usuario,
+                                         app.config['CSV_TAMANO_LOTE'],
+                                         app.config['CSV_MAX_ERRORES_MOSTRADOS'])
+            except ErrorImportacion as e:
+                flash(str(e), 'error')
+        
+        return render_template('importar_datos.html', entidades=ENTIDADES_CSV, entidad=entidad,
+                               resultado=resultado)
+    
+    # Gestión de Ventas
+    @app.route('/ventas')
+    @login_required
+    @presupuesto_consultas(3)
+    def ventas():
+        search = request.args.get('search', '')
+        estado = request.args.get('estado', '')
+        
+        query = Venta.query.join(Cliente).options(
+            db.contains_eager(Venta.cliente),
+            db.joinedload(Venta.usuario)
+        )
+        
+        if search:
+            query = query.filter(
+                filtro_busqueda(Venta.id_cliente, 'clientes_fts', search,
+                                (Cliente.nombre, Cliente.apellido), columna_fts='nombre apellido')
+            )
+        
+        if estado:
+            query = query.filter(Venta.estado == estado)
+        
+        # Totales solo en la primera página. Sin filtros, el total y el importe vendido salen
+        # de los contadores de estadísticas; el resto se agrega sobre como mucho
+        # RESUMEN_MAX_FILAS filas, y si hay más el importe no se muestra
+        resumen = None
+        if primera_pagina():
+            maximo = app.config['RESUMEN_MAX_FILAS']
+            if not search and not estado:
+                estadisticas = obtener_estadisticas()
+                resumen = {
+                    'total_ventas': estadisticas.total_ventas,
+                    'ventas_completadas': contar_acotado(query.filter(Venta.estado == 'completada'), maximo),
+                    'ingresos': float(estadisticas.importe_vendido)
+                }
+            else:
+                filas = filas_acotadas(query, maximo, Venta.estado, Venta.total)
+                vendida = db.or_(filas.c.estado.is_(None), filas.c.estado != 'cancelada')
+                total_ventas, ventas_completadas, ingresos = db.session.query(
+                    db.func.count(),
+                    db.func.sum(db.case((filas.c.estado == 'completada', 1), else_=0)),
+                    db.func.sum(db.case((vendida, filas.c.total), else_=0))
+                ).one()
+                completo = total_ventas <= maximo
+                resumen = {
+                    'total_ventas': total_acotado(total_ventas, maximo),
+                    'ventas_completadas': (ventas_completadas or 0) if completo else None,
+                    'ingresos': float(ingresos or 0) if completo else None
+                }
+        
+        ventas = paginar_consulta(query, [(Venta.fecha_venta, True), (Venta.id_venta, True)])
+        
+        return render_template('ventas.html', ventas=ventas, resumen=resumen, search=search, estado=estado)
+    
+    @app.route('/ventas/crear', methods=['GET', 'POST'])
+    @login_required
+    def crear_venta():
+        if request.method == 'POST':
+            # Líneas de servicio (planos y renderizados); se ignoran las incompletas
+            lineas = [
+                {'descripcion': descripcion, 'cantidad': cantidad, 'precio_unitario': precio}
+                for descripcion, cantidad, precio in zip(request.form.getlist('descripcion[]'),
+                                                         request.form.getlist('cantidad[]'),
+                                                         request.form.getlist('precio[]'))
+                if descripcion and cantidad and precio
+            ]
+            try:
+                datos = validar_venta({
+                    'id_cliente': request.form['id_cliente'],
+                    'metodo_pago': request.form.get('metodo_pago', 'efectivo'),
+                    'notas': request.form.get('notas', ''),
+                    'impuesto': request.form.get('impuesto') or '0',
+                    'descuento': request.form.get('descuento') or '0',
+                    'lineas': lineas,
+                }, app.config['VENTA_MAX_LINEAS'])
+            except VentaInvalida as e:
+                for error in e.errores:
+                    flash(error, 'error')
+                return redirect(url_for('crear_venta'))
+            
+            registrar_venta(datos, current_user.id_usuario)
+            db.session.commit()
+            
+            flash('Venta registrada exitosamente', 'success')
+            return redirect(url_for('ventas'))
+        
+        clientes = Cliente.query.all()
+        tipos_plano = TipoPlano.query.all()
+        return render_template('crear_venta.html', clientes=clientes, tipos_plano=tipos_plano)
+    
+    @app.errorhandler(VentaInvalida)
+    def error_venta(e):
+        return jsonify({'error': 'Venta no válida', 'errores': e.errores}), 400
+    
+    @app.route('/ventas/crear.json', methods=['POST'])
+    @login_required
+    def crear_venta_json():
+        """Registrar una venta completa en una petición; responde con la venta creada"""
+        try:
+            # Importes como Decimal desde el propio texto JSON, sin pasar por float
+            datos = json.loads(request.get_data(), parse_float=Decimal)
+        except ValueError:
+            return jsonify({'error': 'El cuerpo no es JSON válido'}), 400
+        
+        datos = validar_venta(datos, app.config['VENTA_MAX_LINEAS'])
+        venta, ids_detalle = registrar_venta(datos, current_user.id_usuario)
+        respuesta = venta_a_json(venta, datos, ids_detalle)
+        db.session.commit()
+        return jsonify(respuesta), 201, {'Location': url_for('ver_venta', id=respuesta['id_venta'])}
+    
+    @app.route('/ventas/ver/<int:id>')
+    @login_required
+    @presupuesto_consultas(3)
+    def ver_venta(id):
+        venta = Venta.query.options(
+            db.joinedload(Venta.cliente),
+            db.joinedload(Venta.usuario),
+            db.selectinload(Venta.detalle_ventas)
+        ).filter_by(id_venta=id).first_or_404()
+        return render_template('ver_venta.html', venta=venta)
+    
+    @app.route('/ventas/eliminar/<int:id>')
+    @login_required
+    def eliminar_venta(id):
+        venta = Venta.query.get_or_404(id)
+        
+        # Cancelar venta (ya no hay inventario que devolver, son servicios)
+        venta.estado = 'cancelada'
+        db.session.commit()
+        flash('Venta cancelada exitosamente', 'success')
+        return redirect(url_for('ventas'))
+    
+    @app.route('/ventas/imprimir/<int:id>')
+    @login_required
+    @presupuesto_consultas(3)
+    def imprimir_venta(id):
+        venta = cargar_venta_factura(id)
+        if venta is None:
+            abort(404)
+        
+        # La factura se genera una vez por versión de la venta; las reimpresiones leen el archivo
+        ruta, version = factura_en_cache(app, venta)
+        respuesta = send_file(
+            ruta,
+            as_attachment=True,
+            download_name=f'factura_{venta.id_venta:06d}.pdf',
+            mimetype='application/pdf',
+            etag=version,
+            conditional=True
+        )
+        respuesta.cache_control.private = True
+        return respuesta
+    
+    @app.route('/ventas/facturas')
+    @login_required
+    @presupuesto_consultas(2)
+    def exportar_facturas():
+        formato = request.args.get('formato', 'zip')
+        estado = request.args.get('estado', '')
+        try:
+            desde = datetime.strptime(request.args['desde'], '%Y-%m-%d').date()
+            hasta = datetime.strptime(request.args['hasta'], '%Y-%m-%d').date()
+        except (KeyError, ValueError):
+            flash('Indica un periodo válido para exportar las facturas', 'error')
+            return redirect(url_for('ventas'))
+        if formato not in FORMATOS_LOTE_FACTURAS or desde > hasta:
+            abort(400)
+        
+        ids_venta = ids_ventas_periodo(desde, hasta, estado)
+        if not ids_venta:
+            flash('No hay ventas en ese periodo', 'info')
+            return redirect(url_for('ventas', estado=estado))
+        if len(ids_venta) > app.config['FACTURAS_MAX_POR_EXPORTACION']:
+            flash(f'El periodo tiene {len(ids_venta)} ventas; el máximo por exportación es '
+                  f'{app.config["FACTURAS_MAX_POR_EXPORTACION"]}', 'error')
+            return redirect(url_for('ventas', estado=estado))
+        
+        # Los trabajadores generan (o leen de la caché) las facturas en paralelo
+        # y la respuesta se va enviando conforme terminan, en orden cronológico
+        mimetype, generar = FORMATOS_LOTE_FACTURAS[formato]
+        nombre = f'facturas_{desde:%Y%m%d}_{hasta:%Y%m%d}.{formato}'
+        return app.response_class(
+            generar(facturas_en_paralelo(app, ids_venta)),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename={nombre}'}
+        )
+    
+    # Gestión de Reportes
+    @app.route('/reportes')
+    @login_required
+    def reportes():
+        return render_template('reportes.html', periodos=PERIODOS)
+    
+    @app.route('/reportes/generar', methods=['POST'])
+    @login_required
+    def generar_reporte():
+        tipo_reporte = request.form['tipo_reporte']
+        id_proyecto = request.form.get('id_proyecto')
+        
+        if tipo_reporte not in TABLAS_REPORTE:
+            flash('Tipo de reporte no válido', 'error')
+            return redirect(url_for('reportes'))
+        
+        # El trabajador no debe recibir un reporte por proyecto que no puede construir
+        if tipo_reporte == 'planos_proyecto':
+            if not (id_proyecto or '').isdigit() or db.session.get(Proyecto, int(id_proyecto)) is None:
+                flash('Proyecto no válido', 'error')
+                return redirect(url_for('reportes'))
+            id_proyecto = int(id_proyecto)
+        
+        try:
+            periodo = resolver_periodo(request.form.get('periodo', 'todos'),
+                                       request.form.get('desde'), request.form.get('hasta'))
+        except PeriodoInvalido as e:
+            flash(str(e), 'error')
+            return redirect(url_for('reportes'))
+        
+        # El PDF se genera en el pool de procesos; si ya está en caché se descarga directamente
+        clave = solicitar_reporte(app, tipo_reporte, periodo, id_proyecto)
+        if estado_reporte(app, clave) == 'completado':
+            return redirect(url_for('descargar_reporte', clave=clave))
+        
+        return redirect(url_for('trabajo_reporte', clave=clave))
+    
+    @app.route('/reportes/trabajo/<clave>')
+    @login_required
+    def trabajo_reporte(clave):
+        if tipo_de_clave(clave) is None or estado_reporte(app, clave) is None:
+            abort(404)
+        return render_template('reporte_trabajo.html', clave=clave, tipo_reporte=tipo_de_clave(clave))
+    
+    @app.route('/reportes/trabajo/<clave>/estado')
+    @login_required
+    def estado_trabajo_reporte(clave):
+        estado = estado_reporte(app, clave) if tipo_de_clave(clave) else None
+        if estado is None:
+            return jsonify({'estado': 'desconocido'}), 404
+        
+        respuesta = {'estado': estado}
+        if estado == 'completado':
+            respuesta['url_descarga'] = url_for('descargar_reporte', clave=clave)
+        elif estado == 'error':
+            respuesta['error'] = error_reporte(app, clave)
+        return jsonify(respuesta)
+    
+    @app.route('/reportes/trabajo/<clave>/descargar')
+    @login_required
+    def descargar_reporte(clave):
+        tipo_reporte = tipo_de_clave(clave)
+        if tipo_reporte is None or estado_reporte(app, clave) != 'completado':
+            abort(404)
+        
+        return send_file(
+            ruta_reporte(app, clave),
+            as_attachment=True,
+            download_name=f'reporte_{tipo_reporte}_{datetime.now().strftime("%Y%m%d")}.pdf',
+            mimetype='application/pdf'
+        )
+    
+    # Gestión de Usuarios
+    @app.route('/usuarios')
+    @login_required
+    @presupuesto_consultas(3)
+    def usuarios():
+        if not current_user.es_administrador:
+            flash('No tienes permisos para acceder a esta sección', 'error')
+            return redirect(url_for('dashboard'))
+        
+        search = request.args.get('search', '')
+        rol = request.args.get('rol', '')
+        
+        query = Usuario.query.filter(Usuario.activo == True)
+        
+        if search:
+            query = query.filter(
+                db.or_(
+                    Usuario.nombre_usuario.contains(search),
+                    Usuario.email.contains(search),
+                    Usuario.nombre_completo.contains(search)
+                )
+            )
+        
+        if rol:
+            query = query.filter(Usuario.rol == rol)
+        
+        # Conteo por rol sobre todo el filtro, no solo la página
+        por_rol = dict(query.with_entities(Usuario.rol, db.func.count(Usuario.id_usuario))
+                       .group_by(Usuario.rol).all())
+        resumen = {
+            'total_usuarios': sum(por_rol.values()),
+            'administradores': por_rol.get('administrador', 0),
+            'laborales': por_rol.get('laboral', 0),
+            'clientes': por_rol.get('cliente', 0)
+        }
+        
+        usuarios = paginar_consulta(query, [(Usuario.id_usuario, False)])
+        
+        return render_template('usuarios.html', usuarios=usuarios, resumen=resumen, search=search, rol=rol)
+    
+    @app.route('/usuarios/crear', methods=['GET', 'POST'])
+    @login_required
+    def crear_usuario():
+        if not current_user.es_administrador:
+            flash('No tienes permisos para acceder a esta sección', 'error')
+            return redirect(url_for('dashboard'))
+        
+        if request.method == 'POST':
+            # Verificar si el usuario ya existe
+            if Usuario.query.filter_by(email=request.form['email']).first():
+                flash('El email ya está registrado', 'error')
+                return redirect(url_for('crear_usuario'))
+            
+            if Usuario.query.filter_by(nombre_usuario=request.form['nombre_usuario']).first():
+                flash('El nombre de usuario ya está en uso', 'error')
+                return redirect(url_for('crear_usuario'))
+            
+            usuario = Usuario(
+                nombre_usuario=request.form['nombre_usuario'],
+                email=request.form['email'],
+                rol=request.form['rol'],
+                nombre_completo=request.form.get('nombre_completo', ''),
+                telefono=request.form.get('telefono', ''),
+                direccion=request.form.get('direccion', ''),
+                activo=True
+            )
+            usuario.set_password(request.form['password'])
+            db.session.add(usuario)
+            db.session.commit()
+            
+            flash('Usuario creado exitosamente', 'success')
+            return redirect(url_for('usuarios'))
+        
+        return render_template('crear_usuario.html')
+    
+    @app.route('/usuarios/editar/<int:id>', methods=['GET', 'POST'])
+    @login_required
+    def editar_usuario(id):
+        if not current_user.es_administrador:
+            flash('No tienes permisos para acceder a esta sección', 'error')
+            return redirect(url_for('dashboard'))
+        
+        usuario = Usuario.query.get_or_404(id)
+        
+        if request.method == 'POST':
+            # Verificar email único
+            email_existente = Usuario.query.filter(
+                Usuario.email == request.form['email'],
+                Usuario.id_usuario != id
+            ).first()
+            if email_existente:
+                flash('El email ya está registrado', 'error')
+                return redirect(url_for('editar_usuario', id=id))
+            
+            usuario.nombre_usuario = request.form['nombre_usuario']
+            usuario.email = request.form['email']
+            usuario.rol = request.form['rol']
+            usuario.nombre_completo = request.form.get('nombre_completo', '')
+            usuario.telefono = request.form.get('telefono', '')
+            usuario.direccion = request.form.get('direccion', '')
+            
+            if request.form.get('password'):
+                usuario.set_password(request.form['password'])
+            
+            db.session.commit()
+            invalidar_usuarios()
+            flash('Usuario actualizado exitosamente', 'success')
+            return redirect(url_for('usuarios'))
+        
+        return render_template('editar_usuario.html', usuario=usuario)
+    
+    @app.route('/usuarios/eliminar/<int:id>')
+    @login_required
+    def eliminar_usuario(id):
+        if not current_user.es_administrador:
+            flash('No tienes permisos para acceder a esta sección', 'error')
+            return redirect(url_for('dashboard'))
+        
+        if id == current_user.id_usuario:
+            flash('No puedes eliminar tu propio usuario', 'error')
+            return redirect(url_for('usuarios'))
+        
+        usuario = Usuario.query.get_or_404(id)
+        usuario.activo = False
+        db.session.commit()
+        invalidar_usuarios()
+        flash('Usuario desactivado exitosamente', 'success')
+        return redirect(url_for('usuarios'))
+    
+    # Configuración
+    @app.route('/configuracion')
+    @login_required
+    def configuracion():
+        usuario = db.session.get(Usuario, current_user.id_usuario)
+        return render_template('configuracion.html', usuario=usuario)
+    
+    @app.route('/configuracion/actualizar', methods=['POST'])
+    @login_required
+    def actualizar_configuracion():
+        usuario = db.session.get(Usuario, current_user.id_usuario)
+        usuario.nombre_usuario = request.form['nombre_usuario']
+        usuario.email = request.form['email']
+        usuario.nombre_completo = request.form.get('nombre_completo', '')
+        usuario.telefono = request.form.get('telefono', '')
+        usuario.direccion = request.form.get('direccion', '')
+        
+        if request.form.get('password'):
+            usuario.set_password(request.form['password'])
+        
+        db.session.commit()
+        invalidar_usuarios()
+        flash('Configuración actualizada exitosamente', 'success')
+        return redirect(url_for('configuracion'))
+    
+    # Métricas por ruta en formato Prometheus
+    @app.route('/metricas')
+    def metricas():
+        # Prometheus se identifica con METRICAS_TOKEN; una persona, con su sesión de administrador
+        token = app.config['METRICAS_TOKEN']
+        if not (token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')):
+            if not current_user.is_authenticated:
+                return login_manager.unauthorized()
+            if not current_user.es_administrador:
+                abort(403)
+        return app.response_class(
+            formato_prometheus(app.extensions['metricas'].totales()),
+            mimetype='text/plain; version=0.0.4; charset=utf-8'
+        )
+    
+    # API JSON de solo lectura con GET condicional (ver api.py)
+    @app.errorhandler(ErrorApi)
+    def error_api(e):
+        return e.respuesta()
+    
+    @app.route('/api/v1')
+    @requiere_sesion_api
+    @presupuesto_consultas(1)
+    def api_indice():
+        return indice_api()
+    
+    @app.route('/api/v1/<recurso>')
+    @requiere_sesion_api
+    @presupuesto_consultas(3)
+    def api_listado(recurso):
+        return listado_api(recurso)
+    
+    @app.route('/api/v1/<recurso>/<int:id>')
+    @requiere_sesion_api
+    @presupuesto_consultas(3)
+    def api_detalle(recurso, id):
+        return detalle_api(recurso, id)
+    
+    # Funciones auxiliares
+    def allowed_file(filename):
+        return '.' in filename and \
+               filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
+    
+    def paginar_consulta(query, orden):
+        """Paginar una consulta de listado con los cursores de la petición actual"""
+        return paginar(query, orden,
+                       despues=request.args.get('despues'),
+                       antes=request.args.get('antes'),
+                       por_pagina=app.config['ITEMS_POR_PAGINA'])
+    
+    def pedir_vista_previa(plano):
+        """Encolar la vista previa de un plano recién guardado sin que un fallo anule la subida.
+
+        El visor la vuelve a pedir al abrir el plano.
+        """
+        try:
+            solicitar_vista_previa(app, plano.archivo)
+        except Exception:
+            app.logger.exception('No se pudo encolar la vista previa del plano %s', plano.id_plano)
+    
+    def primera_pagina():
+        """Sin cursor en la petición: los totales de un listado se calculan solo aquí"""
+        return not request.args.get('despues') and not request.args.get('antes')
+    
+    return app
+
+if __name__ == '__main__':
+    from arranque import inicializar_base_datos
+    app = create_app()
+    with app.app_context():
+        inicializar_base_datos()
+    app.run(debug=True)
+
@@ -0,0 +1,158 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+
+import click
+
+from models import db, Usuario, Cliente, Proyecto, TipoPlano
+from busqueda import crear_indices_busqueda
+from estadisticas import asegurar_estadisticas
+from versiones import asegurar_versiones
+from migraciones import aplicar_migraciones
+
+
+# create_app() no toca la base de datos ni carga estos módulos: cualquier
+# proceso (trabajadores web, pool de trabajos, comandos) arranca sin esperar
+# bloqueos ni pagar la importación de lo que quizá nunca use
+MODULOS_PESADOS = ('fpdf', 'PIL', 'pypdf')
+
+# Se ejecuta en un intérprete nuevo para medir el arranque en frío
+_PROGRAMA_MEDICION = '''
+import json, sys, time
+inicio = time.perf_counter()
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+sentencias = []
+event.listen(Engine, 'before_cursor_execute', lambda *args: sentencias.append(args[2]))
+from app import create_app
+create_app()
+print(json.dumps({
+    'milisegundos': (time.perf_counter() - inicio) * 1000,
+    'sentencias': sentencias,
+    'modulos_pesados': [m for m in %r if m in sys.modules],
+}))
+''' % (MODULOS_PESADOS,)
+
+
+def crear_datos_iniciales():
+    """Crear el administrador, los tipos de plano y el proyecto de ejemplo si no existen"""
+    if Usuario.query.filter_by(email='admin@asplot.com').first():
+        return False
+
+    admin = Usuario(
+        nombre_usuario='admin',
+        email='admin@asplot.com',
+        rol='administrador',
+        nombre_completo='Administrador del Sistema',
+        activo=True
+    )
+    admin.set_password('admin123')
+    db.session.add(admin)
+
+    # Crear tipos de plano por defecto
+    tipos_plano = [
+        TipoPlano(nombre_tipo='Arquitectónico', descripcion='Planos arquitectónicos'),
+        TipoPlano(nombre_tipo='Estructural', descripcion='Planos estructurales'),
+        TipoPlano(nombre_tipo='Eléctrico', descripcion='Planos eléctricos'),
+        TipoPlano(nombre_tipo='Plomería', descripcion='Planos de plomería'),
+        TipoPlano(nombre_tipo='Mecánico', descripcion='Planos mecánicos'),
+        TipoPlano(nombre_tipo='HVAC', descripcion='Planos de climatización'),
+        TipoPlano(nombre_tipo='Topográfico', descripcion='Planos topográficos')
+    ]
+    for tipo in tipos_plano:
+        db.session.add(tipo)
+
+    # Crear cliente y proyecto de ejemplo para poder subir planos
+    cliente_ejemplo = Cliente(
+        nombre='Cliente',
+        apellido='Ejemplo',
+        email='ejemplo.sistema@asplot.com',
+        telefono='555-0000',
+        direccion='Dirección de ejemplo'
+    )
+    db.session.add(cliente_ejemplo)
+    db.session.flush()
+
+    proyecto_ejemplo = Proyecto(
+        id_cliente=cliente_ejemplo.id_cliente,
+        nombre_proyecto='Proyecto de Prueba',
+        descripcion='Proyecto de ejemplo para subir planos de prueba',
+        fecha_inicio=datetime.now().date(),
+        fecha_fin=datetime.now().date(),
+        estado='activo'
+    )
+    db.session.add(proyecto_ejemplo)
+
+    db.session.commit()
+    return True
+
+
+def inicializar_base_datos():
+    """Dejar la base de datos lista para servir; se puede repetir sin efectos.
+
+    Sustituye lo que antes hacía create_app() en cada arranque: tablas,
+    migraciones pendientes, índices de búsqueda, datos iniciales y las filas
+    de estadísticas y versiones. Devuelve las migraciones aplicadas.
+    """
+    db.create_all()
+    aplicadas = aplicar_migraciones()
+    crear_indices_busqueda()
+    crear_datos_iniciales()
+    asegurar_estadisticas()
+    asegurar_versiones()
+    return aplicadas
+
+
+def medir_arranque(app, repeticiones=5):
+    """Importar la aplicación y llamar a create_app() en intérpretes nuevos.
+
+    Devuelve la mediana en milisegundos, las sentencias SQL ejecutadas y los
+    módulos pesados cargados durante el arranque (estas dos deberían estar vacías).
+    """
+    mediciones = []
+    for _ in range(repeticiones):
+        salida = subprocess.run(
+            [sys.executable, '-c', _PROGRAMA_MEDICION],
+            cwd=app.root_path, env=os.environ.copy(),
+            capture_output=True, text=True, check=True
+        ).stdout
+        mediciones.append(json.loads(salida.strip().splitlines()[-1]))
+    return {
+        'milisegundos': statistics.median(m['milisegundos'] for m in mediciones),
+        'sentencias': mediciones[-1]['sentencias'],
+        'modulos_pesados': mediciones[-1]['modulos_pesados'],
+    }
+
+
+def init_arranque(app):
+    """Registrar los comandos de inicialización y de medición del arranque"""
+
+    @app.cli.command('inicializar-bd')
+    def inicializar_bd_comando():
+        """Crear tablas, aplicar migraciones y crear los datos iniciales (ejecutar al desplegar)"""
+        for version, descripcion in inicializar_base_datos():
+            print(f'✅ Migración {version}: {descripcion}')
+        print('✅ Base de datos inicializada')
+
+    @app.cli.command('medir-arranque')
+    @click.option('--repeticiones', default=5, show_default=True)
+    def medir_arranque_comando(repeticiones):
+        """Medir el arranque en frío y fallar si supera ARRANQUE_OBJETIVO_MS o tiene efectos"""
+        resultado = medir_arranque(app, repeticiones)
+        objetivo = app.config['ARRANQUE_OBJETIVO_MS']
+        print(f'Arranque: {resultado["milisegundos"]:.0f} ms (objetivo {objetivo} ms)')
+        problemas = []
+        if resultado['milisegundos'] > objetivo:
+            problemas.append('el arranque supera el objetivo')
+        if resultado['sentencias']:
+            problemas.append(f'create_app() ejecutó {len(resultado["sentencias"])} sentencias SQL')
+        if resultado['modulos_pesados']:
+            problemas.append(f'se importaron al arrancar: {", ".join(resultado["modulos_pesados"])}')
+        for problema in problemas:
+            print(f'❌ {problema}')
+        if problemas:
+            sys.exit(1)
+        print('✅ Arranque sin consultas ni módulos pesados')
@@ -0,0 +1,84 @@
+import json
+import sqlite3
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+
+from models import db
+
+
+def normalizar_uri(uri):
+    """Aceptar también el esquema 'postgres://' que usan algunos proveedores"""
+    if uri.startswith('postgres://'):
+        return 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+
+def opciones_motor(config):
+    """Opciones de create_engine según el motor de SQLALCHEMY_DATABASE_URI.
+
+    SQLite usa el pool por defecto y se ajusta con PRAGMAs al conectar
+    (ver _configurar_sqlite). PostgreSQL usa un QueuePool acotado que
+    descarta conexiones caídas o viejas. SQLALCHEMY_ENGINE_OPTIONS_JSON
+    permite sobrescribir cualquier opción desde el entorno.
+    """
+    motor = make_url(config['SQLALCHEMY_DATABASE_URI']).get_backend_name()
+    opciones = {}
+    if motor == 'postgresql':
+        opciones = {
+            'pool_size': config['DB_POOL_SIZE'],
+            'max_overflow': config['DB_MAX_OVERFLOW'],
+            'pool_timeout': config['DB_POOL_TIMEOUT'],
+            'pool_recycle': config['DB_POOL_RECYCLE'],
+            'pool_pre_ping': True,
+        }
+    opciones.update(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    if config.get('SQLALCHEMY_ENGINE_OPTIONS_JSON'):
+        opciones.update(json.loads(config['SQLALCHEMY_ENGINE_OPTIONS_JSON']))
+    return opciones
+
+
+# PRAGMAs que se aplican a cada conexión SQLite nueva (los carga configurar_base_datos)
+_pragmas_sqlite = {}
+
+
+def _configurar_sqlite(dbapi_connection, connection_record):
+    """Aplicar WAL y el resto de PRAGMAs en cuanto se abre una conexión SQLite"""
+    if not isinstance(dbapi_connection, sqlite3.Connection) or not _pragmas_sqlite:
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        for nombre, valor in _pragmas_sqlite.items():
+            cursor.execute(f'PRAGMA {nombre} = {valor}')
+    finally:
+        cursor.close()
+
+
+def configurar_base_datos(app):
+    """Preparar URI, opciones del motor y PRAGMAs. Debe llamarse antes de db.init_app()"""
+    app.config['SQLALCHEMY_DATABASE_URI'] = normalizar_uri(app.config['SQLALCHEMY_DATABASE_URI'])
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = opciones_motor(app.config)
+
+    # WAL: los lectores no bloquean al escritor ni al revés; el resto de
+    # escrituras esperan su turno hasta busy_timeout en vez de fallar al instante
+    _pragmas_sqlite.update({
+        'journal_mode': app.config['SQLITE_JOURNAL_MODE'],
+        'busy_timeout': int(app.config['SQLITE_BUSY_TIMEOUT']),
+        'synchronous': app.config['SQLITE_SYNCHRONOUS'],
+        'mmap_size': int(app.config['SQLITE_MMAP_SIZE']),
+    })
+    if not event.contains(Engine, 'connect', _configurar_sqlite):
+        event.listen(Engine, 'connect', _configurar_sqlite)
+
+
+def descartar_conexiones_heredadas(app):
+    """Olvidar, sin cerrarlas, las conexiones del pool heredadas al bifurcar el proceso.
+
+    Un servidor con preload_app crea la aplicación en el proceso maestro y
+    luego bifurca los trabajadores: dos procesos usando la misma conexión
+    (el mismo socket de PostgreSQL o el mismo descriptor de SQLite)
+    corromperían sus transacciones. Cada trabajador abre así las suyas.
+    """
+    with app.app_context():
+        for motor in db.engines.values():
+            motor.dispose(close=False)
@@ -0,0 +1,206 @@
+import re
+
+from sqlalchemy import text
+
+from models import db
+
+
+# Índices de texto completo (SQLite FTS5). El tokenizador ignora acentos para
+# que "gonzalez" encuentre "González".
+TOKENIZADOR = "unicode61 remove_diacritics 2"
+
+# Pesos de bm25() por columna, en el orden de declaración de cada índice
+PESOS = {
+    'clientes_fts': (10.0, 10.0, 2.0),
+    'proyectos_fts': (10.0, 1.0),
+    'planos_fts': (10.0, 5.0, 2.0),
+    'materiales_fts': (10.0, 1.0),
+}
+
+# Tablas de contenido externo: el índice lee el texto de la tabla original
+_DDL_TABLAS = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS clientes_fts USING fts5(
+        nombre, apellido, email,
+        content='clientes', content_rowid='id_cliente', tokenize='{TOKENIZADOR}')""",
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS proyectos_fts USING fts5(
+        nombre_proyecto, descripcion,
+        content='proyectos', content_rowid='id_proyecto', tokenize='{TOKENIZADOR}')""",
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS materiales_fts USING fts5(
+        nombre_material, descripcion,
+        content='materiales', content_rowid='id_material', tokenize='{TOKENIZADOR}')""",
+    # Planos combina columnas de tres tablas, por eso guarda su propia copia del texto
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS planos_fts USING fts5(
+        nombre_plano, nombre_proyecto, cliente, tokenize='{TOKENIZADOR}')""",
+]
+
+_SELECT_PLANO_FTS = """
+    SELECT pl.id_plano, pl.nombre_plano, p.nombre_proyecto, c.nombre || ' ' || c.apellido
+    FROM planos pl
+    JOIN proyectos p ON p.id_proyecto = pl.id_proyecto
+    JOIN clientes c ON c.id_cliente = p.id_cliente"""
+
+
+def _triggers_contenido_externo(tabla, indice, clave, columnas):
+    """Triggers que mantienen sincronizado un índice FTS5 de contenido externo"""
+    lista = ', '.join(columnas)
+    nuevos = ', '.join(f'new.{c}' for c in columnas)
+    viejos = ', '.join(f'old.{c}' for c in columnas)
+    borrar = (f"INSERT INTO {indice}({indice}, rowid, {lista}) "
+              f"VALUES ('delete', old.{clave}, {viejos});")
+    insertar = f"INSERT INTO {indice}(rowid, {lista}) VALUES (new.{clave}, {nuevos});"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {indice}_ai AFTER INSERT ON {tabla} BEGIN {insertar} END",
+        f"CREATE TRIGGER IF NOT EXISTS {indice}_ad AFTER DELETE ON {tabla} BEGIN {borrar} END",
+        f"CREATE TRIGGER IF NOT EXISTS {indice}_au AFTER UPDATE ON {tabla} BEGIN {borrar} {insertar} END",
+    ]
+
+
+_DDL_TRIGGERS = (
+    _triggers_contenido_externo('clientes', 'clientes_fts', 'id_cliente',
+                                ('nombre', 'apellido', 'email'))
+    + _triggers_contenido_externo('proyectos', 'proyectos_fts', 'id_proyecto',
+                                  ('nombre_proyecto', 'descripcion'))
+    + _triggers_contenido_externo('materiales', 'materiales_fts', 'id_material',
+                                  ('nombre_material', 'descripcion'))
+    + [
+        f"""CREATE TRIGGER IF NOT EXISTS planos_fts_ai AFTER INSERT ON planos BEGIN
+            INSERT INTO planos_fts(rowid, nombre_plano, nombre_proyecto, cliente)
+            {_SELECT_PLANO_FTS} WHERE pl.id_plano = new.id_plano;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS planos_fts_ad AFTER DELETE ON planos BEGIN
+            DELETE FROM planos_fts WHERE rowid = old.id_plano;
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS planos_fts_au AFTER UPDATE ON planos BEGIN
+            DELETE FROM planos_fts WHERE rowid = old.id_plano;
+            INSERT INTO planos_fts(rowid, nombre_plano, nombre_proyecto, cliente)
+            {_SELECT_PLANO_FTS} WHERE pl.id_plano = new.id_plano;
+        END""",
+        # Cambios en el proyecto o el cliente se propagan a sus planos
+        """CREATE TRIGGER IF NOT EXISTS planos_fts_proyecto_au
+            AFTER UPDATE OF nombre_proyecto, id_cliente ON proyectos BEGIN
+            UPDATE planos_fts SET
+                nombre_proyecto = new.nombre_proyecto,
+                cliente = (SELECT nombre || ' ' || apellido FROM clientes
+                           WHERE id_cliente = new.id_cliente)
+            WHERE rowid IN (SELECT id_plano FROM planos WHERE id_proyecto = new.id_proyecto);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS planos_fts_cliente_au
+            AFTER UPDATE OF nombre, apellido ON clientes BEGIN
+            UPDATE planos_fts SET cliente = new.nombre || ' ' || new.apellido
+            WHERE rowid IN (SELECT pl.id_plano FROM planos pl
+                            JOIN proyectos p ON p.id_proyecto = pl.id_proyecto
+                            WHERE p.id_cliente = new.id_cliente);
+        END""",
+    ]
+)
+
+
+def disponible():
+    """Indicar si la base de datos actual soporta los índices FTS5"""
+    return db.engine.dialect.name == 'sqlite'
+
+
+def crear_indices_busqueda():
+    """Crear las tablas FTS5 y sus triggers. Si el índice es nuevo se llena con los datos existentes"""
+    if not disponible():
+        return
+
+    existentes = {fila[0] for fila in db.session.execute(text(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE '%\\_fts' ESCAPE '\\'"
+    ))}
+    for sentencia in _DDL_TABLAS + _DDL_TRIGGERS:
+        db.session.execute(text(sentencia))
+
+    if not set(PESOS) <= existentes:
+        reconstruir_indices_busqueda()
+    db.session.commit()
+
+
+def reconstruir_indices_busqueda():
+    """Regenerar todos los índices FTS5 a partir de las tablas originales"""
+    for indice in ('clientes_fts', 'proyectos_fts', 'materiales_fts'):
+        db.session.execute(text(f"INSERT INTO {indice}({indice}) VALUES ('rebuild')"))
+
+    db.session.execute(text("DELETE FROM planos_fts"))
+    db.session.execute(text(
+        f"INSERT INTO planos_fts(rowid, nombre_plano, nombre_proyecto, cliente) {_SELECT_PLANO_FTS}"
+    ))
+    db.session.execute(text("INSERT INTO planos_fts(planos_fts) VALUES ('optimize')"))
+
+
+def expresion_fts(termino, columna=None):
+    """Convertir el texto del usuario en una consulta FTS5 de prefijos.
+
+    Cada palabra se busca como prefijo ("maria gon" encuentra "María González")
+    y todas deben aparecer. Devuelve None si no hay palabras que buscar.
+    """
+    palabras = re.findall(r'\w+', termino)
+    if not palabras:
+        return None
+    expresion = ' '.join(f'"{palabra}"*' for palabra in palabras)
+    if columna:
+        expresion = f'{{{columna}}} : ({expresion})'
+    return expresion
+
+
+def filtro_busqueda(id_columna, indice, termino, columnas, columna_fts=None):
+    """Filtro SQLAlchemy que limita `id_columna` a las filas que coinciden con `termino`.
+
+    Con SQLite se resuelve contra el índice FTS5; en otros motores se usa
+    `contains()` sobre `columnas`, igual que antes de existir el índice.
+    """
+    if disponible():
+        expresion = expresion_fts(termino, columna_fts)
+        if expresion is None:
+            return db.true()
+        coincidencias = text(f"SELECT rowid FROM {indice} WHERE {indice} MATCH :expresion") \
+            .bindparams(expresion=expresion).columns(db.column('rowid', db.Integer))
+        return id_columna.in_(coincidencias)
+    return db.or_(*[columna.contains(termino) for columna in columnas])
+
+
+def buscar_ordenado(id_columna, indice, termino, columnas, limite=20, uniones=()):
+    """Ids de las filas que coinciden con `termino`, de mayor a menor relevancia (bm25).
+
+    En otros motores no hay ranking: se usa `contains()` sobre `columnas`
+    (con los joins de `uniones`), como en filtro_busqueda, y se devuelven
+    las primeras `limite` filas por clave primaria.
+    """
+    if not disponible():
+        consulta = db.session.query(id_columna)
+        for union in uniones:
+            consulta = consulta.join(union)
+        filas = consulta.filter(db.or_(*[columna.contains(termino) for columna in columnas])) \
+            .order_by(id_columna).limit(limite)
+        return [fila[0] for fila in filas]
+
+    expresion = expresion_fts(termino)
+    if expresion is None:
+        return []
+    pesos = ', '.join(str(p) for p in PESOS[indice])
+    filas = db.session.execute(
+        text(f"SELECT rowid FROM {indice} WHERE {indice} MATCH :expresion "
+             f"ORDER BY bm25({indice}, {pesos}) LIMIT :limite"),
+        {'expresion': expresion, 'limite': limite}
+    )
+    return [fila[0] for fila in filas]
+
+
+def cargar_en_orden(modelo, id_columna, ids, *opciones):
+    """Cargar las filas de `ids` manteniendo el orden de relevancia"""
+    if not ids:
+        return []
+    filas = modelo.query.options(*opciones).filter(id_columna.in_(ids)).all()
+    posicion = {id_: i for i, id_ in enumerate(ids)}
+    return sorted(filas, key=lambda fila: posicion[getattr(fila, id_columna.key)])
+
+
+def init_busqueda(app):
+    """Registrar el comando de consola para reconstruir los índices"""
+    @app.cli.command('reconstruir-busqueda')
+    def reconstruir_busqueda_comando():
+        """Regenerar los índices de búsqueda de texto completo"""
+        crear_indices_busqueda()
+        reconstruir_indices_busqueda()
+        db.session.commit()
+        print('✅ Índices de búsqueda reconstruidos')
@@ -0,0 +1,116 @@
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from flask_login import UserMixin
+
+from models import db, Usuario, RolesUsuario
+
+
+# Columnas copiadas a la caché: lo que usan current_user y las plantillas
+CAMPOS_SESION = ('id_usuario', 'nombre_usuario', 'email', 'rol', 'nombre_completo', 'activo')
+
+
+class UsuarioSesion(RolesUsuario, UserMixin):
+    """Copia de solo lectura de la identidad y el rol de un usuario.
+
+    No pertenece a ninguna sesión de SQLAlchemy, así que se puede compartir
+    entre peticiones e hilos. Para modificar el usuario hay que cargar la
+    fila con db.session.get(Usuario, current_user.id_usuario).
+    """
+
+    def __init__(self, **campos):
+        for campo in CAMPOS_SESION:
+            setattr(self, campo, campos[campo])
+
+    def get_id(self):
+        return str(self.id_usuario)
+
+    def __repr__(self):
+        return f'<UsuarioSesion {self.nombre_usuario}>'
+
+
+class CacheUsuarios:
+    """Caché LRU con caducidad de los usuarios autenticados, compartida por los hilos del proceso.
+
+    Los demás procesos se enteran de un cambio por un sello en disco: al
+    invalidar se reemplaza el archivo, y cada consulta compara su inodo y
+    fecha de modificación (una llamada a stat, sin ir a la base de datos).
+    La caducidad acota el tiempo que un dato puede quedar obsoleto si los
+    procesos no comparten la carpeta del sello.
+    """
+
+    def __init__(self, ruta_sello, segundos, maximo):
+        self.ruta_sello = ruta_sello
+        self.segundos = segundos
+        self.maximo = maximo
+        self._entradas = OrderedDict()  # id_usuario -> (caduca, UsuarioSesion)
+        self._sello = None
+        self._cerrojo = threading.Lock()
+
+    def _sello_actual(self):
+        try:
+            estado = os.stat(self.ruta_sello)
+        except FileNotFoundError:
+            return None
+        return estado.st_ino, estado.st_mtime_ns
+
+    def obtener(self, id_usuario):
+        """Usuario en caché o leído de la base de datos; None si no existe"""
+        sello = self._sello_actual()
+        with self._cerrojo:
+            if sello != self._sello:
+                self._entradas.clear()
+                self._sello = sello
+            entrada = self._entradas.get(id_usuario)
+            if entrada is not None and entrada[0] > time.monotonic():
+                self._entradas.move_to_end(id_usuario)
+                return entrada[1]
+
+        fila = db.session.query(*(getattr(Usuario, campo) for campo in CAMPOS_SESION)) \
+            .filter(Usuario.id_usuario == id_usuario).first()
+        if fila is None:
+            return None
+        usuario = UsuarioSesion(**fila._asdict())
+
+        with self._cerrojo:
+            # Si alguien invalidó mientras se leía la fila, puede estar obsoleta: no guardarla
+            if self._sello == sello == self._sello_actual():
+                self._entradas[id_usuario] = (time.monotonic() + self.segundos, usuario)
+                self._entradas.move_to_end(id_usuario)
+                while len(self._entradas) > self.maximo:
+                    self._entradas.popitem(last=False)
+        return usuario
+
+    def invalidar(self):
+        """Vaciar la caché en todos los procesos; llamar después de confirmar el cambio"""
+        carpeta = os.path.dirname(os.path.abspath(self.ruta_sello))
+        os.makedirs(carpeta, exist_ok=True)
+        descriptor, temporal = tempfile.mkstemp(dir=carpeta, suffix='.tmp')
+        with os.fdopen(descriptor, 'w') as destino:
+            destino.write(str(time.time()))
+        # Reemplazar (no reescribir) garantiza un inodo nuevo y por tanto un sello distinto
+        os.replace(temporal, self.ruta_sello)
+        with self._cerrojo:
+            self._entradas.clear()
+            self._sello = None
+
+
+def usuario_en_cache(id_usuario):
+    return current_app.extensions['cache_usuarios'].obtener(id_usuario)
+
+
+def invalidar_usuarios():
+    current_app.extensions['cache_usuarios'].invalidar()
+
+
+def init_cache_usuarios(app):
+    """Crear la caché de usuarios de la aplicación"""
+    app.extensions['cache_usuarios'] = CacheUsuarios(
+        app.config['CACHE_USUARIOS_SELLO'],
+        app.config['CACHE_USUARIOS_SEGUNDOS'],
+        app.config['CACHE_USUARIOS_MAXIMO']
+    )
@@ -1,41 +1,148 @@
-import os
-
-class Config:
-    """Configuración base para la aplicación Flask"""
-    
-    # Configuración de la base de datos
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///asplot_database.db'
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
-    
-    # Configuración de seguridad
-    SECRET_KEY = 'asplot-center-secret-key-2025'
-    
-    # Configuración de archivos
-    UPLOAD_FOLDER = os.path.join('static', 'uploads', 'planos')
-    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB máximo por archivo
-    
-    # Tipos de archivos permitidos para planos
-    ALLOWED_EXTENSIONS = {'pdf', 'dwg', 'dxf', 'jpg', 'jpeg', 'png'}
-    
-    # Configuración de sesión
-    PERMANENT_SESSION_LIFETIME = 3600  # 1 hora
-    
-    @staticmethod
-    def init_app(app):
-        """Inicializar configuración específica de la aplicación"""
-        pass
-
-class DevelopmentConfig(Config):
-    """Configuración para desarrollo"""
-    DEBUG = True
-    
-class ProductionConfig(Config):
-    """Configuración para producción"""
-    DEBUG = False
-
-# Configuración por defecto
-config = {
-    'development': DevelopmentConfig,
-    'production': ProductionConfig,
-    'default': DevelopmentConfig
-}
+import os
+
+class Config:
+    """Configuración base para la aplicación Flask"""
+    
+    # Configuración de la base de datos (SQLite por defecto, PostgreSQL con DATABASE_URL)
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///asplot_database.db')
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # JSON con opciones extra de create_engine, p. ej. '{"echo_pool": true}'
+    SQLALCHEMY_ENGINE_OPTIONS_JSON = os.environ.get('SQLALCHEMY_ENGINE_OPTIONS')
+    
+    # SQLite: WAL para que lectores y escritor no se bloqueen entre sí
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))  # milisegundos
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')  # seguro con WAL
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    
+    # PostgreSQL: pool de conexiones por proceso
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))  # segundos esperando conexión libre
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))  # segundos antes de renovar
+    
+    # Configuración de seguridad
+    SECRET_KEY = os.environ.get('SECRET_KEY', 'asplot-center-secret-key-2025')
+    
+    # Configuración de archivos
+    UPLOAD_FOLDER = os.path.join('static', 'uploads', 'planos')
+    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB máximo por petición (archivo o bloque)
+    
+    # Subida por bloques reanudable para planos grandes
+    CARPETA_SUBIDAS = os.path.join('instance', 'subidas')
+    TAMANO_BLOQUE_SUBIDA = 8 * 1024 * 1024  # debe ser menor que MAX_CONTENT_LENGTH
+    TAMANO_MAXIMO_PLANO = int(os.environ.get('TAMANO_MAXIMO_PLANO', 2 * 1024 * 1024 * 1024))
+    SUBIDAS_TIEMPO_MAXIMO = 24 * 3600  # segundos sin actividad antes de descartar una subida
+    SUBIDAS_TIEMPO_BLOQUE = 600  # segundos tras los que un bloque a medias se da por abandonado
+    
+    # Tipos de archivos permitidos para planos
+    ALLOWED_EXTENSIONS = {'pdf', 'dwg', 'dxf', 'jpg', 'jpeg', 'png'}
+    
+    # Configuración de sesión
+    PERMANENT_SESSION_LIFETIME = 3600  # 1 hora
+    
+    # Caché por proceso de los usuarios autenticados (user_loader de Flask-Login)
+    CACHE_USUARIOS_SEGUNDOS = int(os.environ.get('CACHE_USUARIOS_SEGUNDOS', 300))
+    CACHE_USUARIOS_MAXIMO = 1000
+    # Se reemplaza al modificar un usuario para invalidar la caché de todos los procesos
+    CACHE_USUARIOS_SELLO = os.path.join('instance', 'usuarios.sello')
+    
+    # Hash de contraseñas: método y coste en formato de Werkzeug (p. ej. 'scrypt:16384:8:1').
+    # Al cambiarlo, cada hash se actualiza en el siguiente inicio de sesión correcto;
+    # `flask medir-hash` compara el coste de verificación con HASH_OBJETIVO_MS
+    HASH_CONTRASENAS = os.environ.get('HASH_CONTRASENAS', 'pbkdf2:sha256:600000')
+    HASH_OBJETIVO_MS = 250
+    VERIFICACIONES_HILOS = int(os.environ.get('VERIFICACIONES_HILOS', 2))
+    VERIFICACIONES_EN_ESPERA = 32  # más allá se rechaza el inicio de sesión con 503
+    
+    # Paginación de listados (cursor/keyset)
+    ITEMS_POR_PAGINA = int(os.environ.get('ITEMS_POR_PAGINA', 50))
+    # Filas que se leen como mucho para los totales de un listado filtrado; por encima se muestra "1000+"
+    RESUMEN_MAX_FILAS = 1000
+    # Filas por página de la API JSON (/api/v1), por defecto y como máximo con ?limite=
+    API_POR_PAGINA = 100
+    API_MAX_POR_PAGINA = 1000
+    
+    # Líneas admitidas en una sola venta por la API JSON
+    VENTA_MAX_LINEAS = int(os.environ.get('VENTA_MAX_LINEAS', 500))
+    
+    # Importación y exportación masiva en CSV
+    CSV_TAMANO_LOTE = 1000  # filas por INSERT/UPDATE agrupado y por fragmento exportado
+    CSV_TAMANO_MAXIMO = int(os.environ.get('CSV_TAMANO_MAXIMO', 1024 * 1024 * 1024))
+    CSV_MAX_ERRORES_MOSTRADOS = 200
+    
+    # Resultados por sección en la búsqueda global
+    RESULTADOS_BUSQUEDA = 20
+    
+    # Procesos para trabajos pesados en segundo plano (reportes PDF)
+    PROCESOS_TRABAJOS = int(os.environ.get('PROCESOS_TRABAJOS', min(4, os.cpu_count() or 1)))
+    
+    # Caché de reportes generados
+    CARPETA_REPORTES = os.path.join('instance', 'reportes')
+    REPORTES_TIEMPO_MAXIMO = 600  # segundos antes de dar por abandonado un trabajo
+    REPORTES_MAX_CLIENTES = 25  # clientes con más compras listados en el reporte de ventas
+    
+    # Flujos Server-Sent Events (avisos de stock bajo, dashboard en vivo). Cada navegador
+    # conectado ocupa un hilo del servidor, así que por defecto se reserva la mitad
+    # de los hilos de cada proceso (WEB_HILOS en gunicorn.conf.py) para estos flujos
+    SSE_INTERVALO = 2  # segundos entre lecturas de cambios hechos por otros procesos
+    SSE_LATIDO = 15  # segundos sin eventos antes de enviar un comentario de latido
+    SSE_DURACION = 300  # segundos que dura un flujo antes de que el navegador se reconecte
+    SSE_MAX_CONEXIONES = int(os.environ.get(
+        'SSE_MAX_CONEXIONES', max(1, int(os.environ.get('WEB_HILOS', 4)) // 2)))
+    
+    # Facturas PDF generadas, una por venta y versión
+    CARPETA_FACTURAS = os.path.join('instance', 'facturas')
+    FACTURAS_POR_TRABAJO = 25  # facturas que genera cada trabajo del pool en la exportación por periodo
+    FACTURAS_MAX_POR_EXPORTACION = int(os.environ.get('FACTURAS_MAX_POR_EXPORTACION', 20000))
+    
+    # Vistas previas por teselas (pirámide multirresolución) de los planos
+    CARPETA_VISTAS_PREVIAS = os.path.join('instance', 'vistas_previas')
+    TESELA_TAMANO = 256
+    TESELA_CALIDAD_JPEG = 85
+    VISTAS_PREVIAS_DPI_PDF = 150
+    VISTAS_PREVIAS_MAX_PIXELES = 300_000_000  # límite de Pillow contra imágenes maliciosas
+    VISTAS_PREVIAS_TIEMPO_MAXIMO = 600  # segundos para rasterizar un PDF, y antes de reintentar una pirámide fallida o abandonada
+    
+    # Presupuesto de sentencias SQL por ruta: registrar aviso o fallar si se excede
+    PRESUPUESTO_CONSULTAS_ESTRICTO = os.environ.get('PRESUPUESTO_CONSULTAS_ESTRICTO', 'False').lower() == 'true'
+    
+    # Métricas por ruta (/metricas): cada proceso vuelca las suyas aquí para sumarlas
+    CARPETA_METRICAS = os.path.join('instance', 'metricas')
+    METRICAS_VOLCADO_SEGUNDOS = 5
+    # Token para que Prometheus lea /metricas sin sesión (cabecera Authorization: Bearer ...)
+    METRICAS_TOKEN = os.environ.get('METRICAS_TOKEN')
+    
+    # Límite para `flask medir-arranque` (importar app.py y create_app() en un proceso nuevo)
+    ARRANQUE_OBJETIVO_MS = int(os.environ.get('ARRANQUE_OBJETIVO_MS', 1500))
+    
+    # `flask medir-rutas` / `flask prueba-carga`: peticiones por ruta y margen antes de
+    # dar por regresión un p95 más lento que el de la ejecución de referencia
+    RENDIMIENTO_REPETICIONES = 20
+    RENDIMIENTO_TOLERANCIA = 0.25
+    
+    @staticmethod
+    def init_app(app):
+        """Inicializar configuración específica de la aplicación"""
+        pass
+
+class DevelopmentConfig(Config):
+    """Configuración para desarrollo"""
+    DEBUG = True
+    
+class ProductionConfig(Config):
+    """Configuración para producción (wsgi.py)"""
+    DEBUG = False
+    
+    @staticmethod
+    def init_app(app):
+        """No servir en producción con la clave de sesión publicada en el repositorio"""
+        if app.config['SECRET_KEY'] == Config.SECRET_KEY and not os.environ.get('SECRET_KEY'):
+            raise RuntimeError('Define la variable de entorno SECRET_KEY para la configuración de producción')
+
+# Configuración por defecto
+config = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+    'default': DevelopmentConfig
+}
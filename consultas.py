@@ -0,0 +1,134 @@
+from flask import g, has_request_context, request, url_for
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from models import db, Usuario
+
+
+class PresupuestoConsultasExcedido(RuntimeError):
+    """Una ruta ejecutó más sentencias SQL de las declaradas en su presupuesto"""
+
+
+def presupuesto_consultas(maximo):
+    """Declarar el número máximo de sentencias SQL que puede ejecutar una ruta.
+
+    El límite se comprueba al terminar cada petición. Debe colocarse debajo
+    de @login_required para que el atributo se conserve al envolver la vista.
+    """
+    def decorador(vista):
+        vista.presupuesto_consultas = maximo
+        return vista
+    return decorador
+
+
+def _contar_sentencia(conn, cursor, statement, parameters, context, executemany):
+    """Sumar una sentencia al contador de la petición en curso"""
+    if has_request_context():
+        g.consultas_sql = g.get('consultas_sql', 0) + 1
+
+
+# Rutas representativas para `flask explicar-consultas`: (endpoint, argumentos de la URL)
+RUTAS_EXPLICADAS = [
+    ('dashboard', {}),
+    ('clientes', {}),
+    ('proyectos', {'estado': 'activo'}),
+    ('planos', {'tipo': 1}),
+    ('buscar_planos', {'proyecto': 1, 'fecha_desde': '2025-01-01', 'fecha_hasta': '2025-12-31'}),
+    ('inventario', {}),
+    ('materiales', {'categoria': 'papel'}),
+    ('ventas', {}),
+    ('ventas', {'estado': 'completada'}),
+    ('usuarios', {'rol': 'laboral'}),
+]
+
+
+def _plan_sqlite(conexion, sentencia, parametros):
+    """Plan de SQLite con sangría según la jerarquía de pasos"""
+    filas = conexion.exec_driver_sql(f'EXPLAIN QUERY PLAN {sentencia}', parametros).all()
+    profundidad = {0: 0}
+    lineas = []
+    for id_paso, padre, _sin_uso, detalle in filas:
+        profundidad[id_paso] = profundidad.get(padre, 0) + 1
+        lineas.append('  ' * profundidad[id_paso] + detalle)
+    return lineas
+
+
+def explicar_rutas(app, rutas=RUTAS_EXPLICADAS):
+    """Ejecutar cada ruta y devolver el plan de cada SELECT que lanza.
+
+    Devuelve una lista de (url, [(sentencia, [líneas del plan])]).
+    """
+    capturadas = []
+
+    def capturar(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            capturadas.append((statement, parameters))
+
+    with app.app_context():
+        administrador = Usuario.query.filter_by(rol='administrador', activo=True).first()
+    cliente = app.test_client()
+    with cliente.session_transaction() as sesion:
+        sesion['_user_id'] = administrador.get_id()
+
+    resultados = []
+    event.listen(Engine, 'before_cursor_execute', capturar)
+    try:
+        for endpoint, argumentos in rutas:
+            with app.test_request_context():
+                url = url_for(endpoint, **argumentos)
+            capturadas.clear()
+            cliente.get(url)
+            sentencias = list(capturadas)
+
+            planes = []
+            with app.app_context():
+                conexion = db.session.connection()
+                for sentencia, parametros in sentencias:
+                    if db.engine.dialect.name == 'sqlite':
+                        plan = _plan_sqlite(conexion, sentencia, parametros)
+                    else:
+                        plan = [fila[0] for fila in
+                                conexion.exec_driver_sql(f'EXPLAIN {sentencia}', parametros)]
+                    planes.append((sentencia, plan))
+            resultados.append((url, planes))
+    finally:
+        event.remove(Engine, 'before_cursor_execute', capturar)
+    return resultados
+
+
+def init_presupuesto_consultas(app):
+    """Registrar el conteo de sentencias SQL por petición y la verificación de presupuestos"""
+    if not event.contains(Engine, 'before_cursor_execute', _contar_sentencia):
+        event.listen(Engine, 'before_cursor_execute', _contar_sentencia)
+
+    @app.before_request
+    def reiniciar_conteo_consultas():
+        # Dentro de un contexto de aplicación ya abierto (CLI, pruebas) g se comparte entre peticiones
+        g.consultas_sql = 0
+    
+    @app.after_request
+    def verificar_presupuesto_consultas(response):
+        ejecutadas = g.get('consultas_sql', 0)
+        if app.debug or app.testing:
+            response.headers['X-Consultas-SQL'] = str(ejecutadas)
+
+        vista = app.view_functions.get(request.endpoint)
+        maximo = getattr(vista, 'presupuesto_consultas', None)
+        if maximo is not None and ejecutadas > maximo:
+            mensaje = (f'La ruta {request.endpoint} ejecutó {ejecutadas} sentencias SQL '
+                       f'(presupuesto: {maximo})')
+            if app.config['PRESUPUESTO_CONSULTAS_ESTRICTO']:
+                raise PresupuestoConsultasExcedido(mensaje)
+            app.logger.warning(mensaje)
+        return response
+
+    @app.cli.command('explicar-consultas')
+    def explicar_consultas_comando():
+        """Mostrar el plan de ejecución (EXPLAIN QUERY PLAN) de las consultas de cada ruta"""
+        for url, planes in explicar_rutas(app):
+            print(f'== {url}')
+            for sentencia, plan in planes:
+                print('  ' + ' '.join(sentencia.split())[:150])
+                for linea in plan:
+                    print('  ' + linea)
+            print()
@@ -0,0 +1,108 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import click
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class VerificacionesSaturadas(RuntimeError):
+    """Hay demasiadas verificaciones de contraseña en curso o en espera"""
+
+
+def _metodo():
+    return current_app.config['HASH_CONTRASENAS']
+
+
+@lru_cache(maxsize=None)
+def _parametros(metodo):
+    """Parámetros completos de un método, p. ej. 'pbkdf2' -> 'pbkdf2:sha256:600000'.
+
+    Werkzeug completa los valores omitidos con los suyos por defecto; la
+    forma más fiable de conocerlos es generar un hash y leer su prefijo.
+    """
+    return generate_password_hash('', method=metodo).split('$', 1)[0]
+
+
+@lru_cache(maxsize=None)
+def _hash_ficticio(metodo):
+    """Hash con el que comparar cuando el email no existe, para que tarde lo mismo"""
+    return generate_password_hash('', method=metodo)
+
+
+def generar_hash(password):
+    """Hash de la contraseña con el método y coste configurados (HASH_CONTRASENAS)"""
+    return generate_password_hash(password, method=_metodo())
+
+
+def necesita_rehash(hash_guardado):
+    """Si el hash se generó con otro método o coste que el configurado"""
+    return hash_guardado.split('$', 1)[0] != _parametros(_metodo())
+
+
+class VerificadorContrasenas:
+    """Hilos acotados para verificar contraseñas fuera de los hilos de las peticiones.
+
+    Como mucho `hilos` verificaciones se calculan a la vez (hashlib libera el
+    GIL, así que cada una ocupa un núcleo) y `en_espera` aguardan turno; una
+    ráfaga de inicios de sesión por encima de eso se rechaza al momento en
+    lugar de acaparar la CPU del resto de peticiones.
+    """
+
+    def __init__(self, hilos, en_espera):
+        self._ejecutor = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='contrasenas')
+        self._plazas = threading.BoundedSemaphore(hilos + en_espera)
+
+    def verificar(self, hash_guardado, password):
+        if not self._plazas.acquire(blocking=False):
+            raise VerificacionesSaturadas('Demasiados inicios de sesión simultáneos')
+        try:
+            futuro = self._ejecutor.submit(check_password_hash, hash_guardado, password)
+        except BaseException:
+            self._plazas.release()
+            raise
+        futuro.add_done_callback(lambda _: self._plazas.release())
+        return futuro.result()
+
+
+def verificar_contrasena(hash_guardado, password):
+    """Comprobar la contraseña en el ejecutor acotado; `hash_guardado` None si el usuario no existe"""
+    if hash_guardado is None:
+        current_app.extensions['contrasenas'].verificar(_hash_ficticio(_metodo()), password)
+        return False
+    return current_app.extensions['contrasenas'].verificar(hash_guardado, password)
+
+
+def medir_verificacion(metodo, repeticiones=5):
+    """Mediana en milisegundos de una verificación con `metodo`"""
+    hash_prueba = generate_password_hash('contraseña de prueba', method=metodo)
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        check_password_hash(hash_prueba, 'contraseña de prueba')
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
+
+
+def init_contrasenas(app):
+    """Crear el ejecutor de verificaciones y registrar el comando de medición"""
+    app.extensions['contrasenas'] = VerificadorContrasenas(
+        app.config['VERIFICACIONES_HILOS'],
+        app.config['VERIFICACIONES_EN_ESPERA']
+    )
+
+    @app.cli.command('medir-hash')
+    @click.option('--metodo', multiple=True,
+                  help='Métodos a comparar (por defecto el configurado), p. ej. scrypt:16384:8:1')
+    def medir_hash_comando(metodo):
+        """Medir el coste de verificar una contraseña frente a HASH_OBJETIVO_MS"""
+        objetivo = app.config['HASH_OBJETIVO_MS']
+        hilos = app.config['VERIFICACIONES_HILOS']
+        for candidato in metodo or (app.config['HASH_CONTRASENAS'],):
+            milisegundos = medir_verificacion(candidato)
+            veredicto = 'dentro del objetivo' if milisegundos <= objetivo else 'demasiado lento'
+            print(f'{_parametros(candidato)}: {milisegundos:.1f} ms ({veredicto}, objetivo {objetivo} ms); '
+                  f'~{hilos * 1000 / milisegundos:.0f} inicios de sesión por segundo con {hilos} hilos')
@@ -0,0 +1,139 @@
+from sqlalchemy import func, select
+
+from models import (db, Cliente, Proyecto, Plano, Inventario, MovimientoInventario, Venta,
+                    Estadisticas, VersionTabla)
+from estadisticas import ID_ESTADISTICAS, obtener_estadisticas
+from versiones import versiones_tablas
+
+
+# Totales de las tarjetas KPI (columnas de la fila de estadísticas)
+CAMPOS_TOTALES = ('total_clientes', 'total_proyectos', 'total_planos', 'total_ventas',
+                  'existencia_total', 'importe_vendido')
+
+RECIENTES = 5
+
+
+def proyectos_recientes(limite=RECIENTES):
+    return Proyecto.query.options(db.joinedload(Proyecto.cliente)) \
+        .order_by(Proyecto.fecha_inicio.desc()).limit(limite).all()
+
+
+def ventas_recientes(limite=RECIENTES):
+    return Venta.query.options(db.joinedload(Venta.cliente)) \
+        .order_by(Venta.fecha_venta.desc()).limit(limite).all()
+
+
+def _totales():
+    estadisticas = obtener_estadisticas()
+    totales = {campo: getattr(estadisticas, campo) for campo in CAMPOS_TOTALES}
+    totales['importe_vendido'] = float(totales['importe_vendido'])  # Decimal no es JSON
+    return totales
+
+
+def _proyectos():
+    return {'proyectos': [
+        {'id_proyecto': proyecto.id_proyecto, 'nombre_proyecto': proyecto.nombre_proyecto,
+         'cliente': proyecto.cliente.nombre_completo, 'estado': proyecto.estado}
+        for proyecto in proyectos_recientes()
+    ]}
+
+
+def _ventas():
+    return {'ventas': [
+        {'id_venta': venta.id_venta, 'cliente': venta.cliente.nombre_completo,
+         'total': float(venta.total or 0)}
+        for venta in ventas_recientes()
+    ]}
+
+
+# Listas del dashboard: (evento, tablas cuyas versiones la cambian, lectura)
+_LISTAS = (
+    ('proyectos', {Proyecto.__tablename__, Cliente.__tablename__}, _proyectos),
+    ('ventas', {Venta.__tablename__, Cliente.__tablename__}, _ventas),
+)
+
+_TABLAS_LISTAS = sorted(set().union(*(tablas for _evento, tablas, _lectura in _LISTAS)))
+
+# Listas recientes ya leídas en este proceso: (suma de versiones de sus tablas, listas)
+_listas_en_cache = (None, None)
+
+
+def datos_dashboard():
+    """Fila de estadísticas y listas recientes ({evento: datos}) para la página del dashboard.
+
+    La fila se lee por clave primaria junto con la suma de las versiones de
+    las tablas de las listas, en una sola consulta. Las versiones solo
+    crecen, así que la suma cambia con cualquier escritura en esas tablas:
+    mientras no cambie, las listas salen de la caché del proceso.
+    """
+    global _listas_en_cache
+    suma_versiones = select(func.coalesce(func.sum(VersionTabla.version), 0)) \
+        .where(VersionTabla.nombre_tabla.in_(_TABLAS_LISTAS)).scalar_subquery()
+    fila = db.session.query(Estadisticas, suma_versiones) \
+        .filter(Estadisticas.id_estadisticas == ID_ESTADISTICAS).first()
+    if fila is None:
+        return obtener_estadisticas(), {evento: lectura() for evento, _tablas, lectura in _LISTAS}
+
+    estadisticas, version = fila
+    version_cache, listas = _listas_en_cache
+    if version_cache != version:
+        listas = {evento: lectura() for evento, _tablas, lectura in _LISTAS}
+        _listas_en_cache = (version, listas)
+    return estadisticas, listas
+
+
+class CanalDashboard:
+    """Canal del dashboard: totales KPI y listas recientes cuando cambian.
+
+    Cada lectura es una sola consulta a versiones_tablas; los totales y las
+    listas se leen de nuevo solo si cambió la versión de alguna de sus
+    tablas, y solo se publica lo que difiere de lo último enviado. El último
+    estado queda en memoria, así que un navegador que se conecta lo recibe
+    sin consultas.
+    """
+
+    nombre = 'dashboard'
+    tablas = frozenset({Cliente.__tablename__, Proyecto.__tablename__, Plano.__tablename__,
+                        Venta.__tablename__, Inventario.__tablename__,
+                        MovimientoInventario.__tablename__})
+
+    def __init__(self):
+        self._versiones = {}
+        self._estado = {}
+
+    def iniciar(self):
+        self._versiones, self._estado = {}, {}
+        self.leer()
+
+    def leer(self):
+        versiones = versiones_tablas(*self.tablas)
+        cambiadas = {tabla for tabla, version in versiones.items()
+                     if self._versiones.get(tabla) != version}
+        if not cambiadas:
+            return []
+
+        estado, mensajes = dict(self._estado), []
+        totales = _totales()
+        anteriores = estado.get('totales', {})
+        diferencias = {campo: valor for campo, valor in totales.items() if anteriores.get(campo) != valor}
+        if diferencias:
+            estado['totales'] = totales
+            mensajes.append(('totales', diferencias))
+        for evento, tablas, lectura in _LISTAS:
+            if cambiadas & tablas:
+                datos = lectura()
+                if datos != estado.get(evento):
+                    estado[evento] = datos
+                    mensajes.append((evento, datos))
+
+        # Se sustituye de una vez: estado() se lee desde los hilos de las peticiones
+        self._versiones, self._estado = versiones, estado
+        return mensajes
+
+    def estado(self):
+        return list(self._estado.items())
+
+
+def init_dashboard_vivo(app):
+    """Registrar el canal del dashboard en el difusor de eventos"""
+    app.extensions['difusor_sse'].registrar(CanalDashboard())
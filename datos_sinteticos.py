@@ -0,0 +1,301 @@
+import io
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import click
+from sqlalchemy import func, insert, select
+
+from models import db, Usuario, Cliente, Proyecto, TipoPlano, Plano, Material, Venta, DetalleVenta
+from almacen import guardar_archivo, aplicar_variacion_referencias
+from contrasenas import generar_hash
+from estadisticas import reconciliar_estadisticas
+from movimientos import crear_inventarios
+from versiones import incrementar_versiones
+
+
+# Volúmenes con --escala 1 (los de un centro de ploteo con años de historia)
+VOLUMENES = {
+    'clientes': 100_000,
+    'proyectos': 50_000,
+    'planos': 500_000,
+    'detalle_ventas': 1_000_000,
+    'materiales': 500,
+}
+
+NOMBRES = ('María', 'José', 'Luis', 'Ana', 'Carlos', 'Carmen', 'Jorge', 'Rosa', 'Pedro', 'Laura',
+           'Miguel', 'Elena', 'Juan', 'Isabel', 'Andrés', 'Lucía', 'Rafael', 'Patricia', 'Diego', 'Sofía')
+APELLIDOS = ('González', 'Rodríguez', 'Pérez', 'Hernández', 'García', 'Martínez', 'López', 'Díaz',
+             'Ramírez', 'Torres', 'Rojas', 'Morales', 'Castillo', 'Vargas', 'Suárez', 'Mendoza',
+             'Herrera', 'Medina', 'Aguilar', 'Romero')
+CIUDADES = ('Maturín', 'Caracas', 'Valencia', 'Barcelona', 'Puerto La Cruz', 'Cumaná', 'Mérida')
+OBRAS = ('Edificio', 'Residencias', 'Centro Comercial', 'Galpón', 'Clínica', 'Escuela', 'Quinta',
+         'Torre', 'Urbanización', 'Planta')
+
+# Pesos aproximados de cada tipo de plano por nombre; los tipos nuevos pesan 1
+PESOS_TIPO_PLANO = {'Arquitectónico': 35, 'Estructural': 20, 'Eléctrico': 15, 'Plomería': 10,
+                    'Mecánico': 8, 'HVAC': 7, 'Topográfico': 5}
+CATEGORIAS = (('papel', 40), ('tinta', 30), ('herramienta', 10), ('otro', 20))
+ESTADOS_VENTA = (('completada', 85), ('pendiente', 10), ('cancelada', 5))
+METODOS_PAGO = (('efectivo', 40), ('tarjeta', 35), ('transferencia', 25))
+
+# Historia simulada: los datos se reparten en los últimos tres años
+DIAS_HISTORIA = 3 * 365
+
+
+def _sesgado(valores, rng, exponente=3):
+    """Elemento de `valores` con sesgo hacia los primeros (pocos clientes concentran mucho)"""
+    return valores[int(len(valores) * rng.random() ** exponente)]
+
+
+def _ponderado(opciones, rng):
+    return rng.choices([valor for valor, _ in opciones], [peso for _, peso in opciones])[0]
+
+
+def _reciente(rng, ahora):
+    """Fecha de los últimos DIAS_HISTORIA días, más densa hacia hoy (el negocio crece)"""
+    return ahora - timedelta(days=DIAS_HISTORIA * (1 - rng.random() ** 0.5), seconds=rng.randrange(86400))
+
+
+def _insertar(modelo, filas, columna_id=None):
+    """Insertar `filas` en una sentencia de varias filas; con `columna_id` devuelve los ids en orden"""
+    conexion = db.session.connection()
+    if columna_id is None:
+        conexion.execute(insert(modelo.__table__), filas)
+        return None
+    # Ids asignados en el orden de VALUES (ver ventas.registrar_venta)
+    return sorted(conexion.execute(insert(modelo.__table__).returning(columna_id), filas).scalars())
+
+
+def _por_lotes(total, tamano_lote):
+    for inicio in range(0, total, tamano_lote):
+        yield inicio, min(tamano_lote, total - inicio)
+
+
+def _usuarios_sinteticos(rng, cantidad=12):
+    """Personal de mostrador que firma planos y ventas; se reutiliza entre ejecuciones"""
+    existentes = db.session.scalars(
+        select(Usuario.id_usuario).where(Usuario.nombre_usuario.like('vendedor%'))
+    ).all()
+    if existentes:
+        return existentes
+    contrasena = generar_hash('vendedor123')  # un solo hash para todos: generarlo es caro a propósito
+    filas = []
+    for numero in range(1, cantidad + 1):
+        nombre, apellido = rng.choice(NOMBRES), rng.choice(APELLIDOS)
+        filas.append({'nombre_usuario': f'vendedor{numero}', 'email': f'vendedor{numero}@asplot.test',
+                      'contraseña': contrasena, 'rol': 'laboral', 'activo': True,
+                      'nombre_completo': f'{nombre} {apellido}', 'fecha_creacion': datetime.utcnow()})
+    ids = _insertar(Usuario, filas, Usuario.id_usuario)
+    incrementar_versiones(db.session.connection(), {Usuario.__tablename__})
+    return ids
+
+
+def _archivos_muestra(cantidad=10):
+    """Unos pocos PDF reales compartidos por todos los planos generados (almacén por contenido)"""
+    from fpdf import FPDF
+
+    archivos = []
+    for numero in range(1, cantidad + 1):
+        pdf = FPDF()
+        pdf.add_page()
+        pdf.set_font('Helvetica', 'B', 24)
+        pdf.cell(0, 20, f'Plano de muestra {numero}', 0, 1, 'C')
+        pdf.rect(20, 40, 170, 120)
+        archivos.append(guardar_archivo(io.BytesIO(bytes(pdf.output())), f'muestra_{numero}.pdf'))
+    return archivos
+
+
+def generar_clientes(rng, cantidad, tamano_lote):
+    inicio_email = (db.session.query(func.max(Cliente.id_cliente)).scalar() or 0) + 1
+    ids = []
+    for inicio, tamano in _por_lotes(cantidad, tamano_lote):
+        filas = []
+        for numero in range(inicio_email + inicio, inicio_email + inicio + tamano):
+            nombre, apellido = rng.choice(NOMBRES), rng.choice(APELLIDOS)
+            filas.append({
+                'nombre': nombre, 'apellido': apellido,
+                'email': f'{nombre}.{apellido}.{numero}@ejemplo.test'.lower(),
+                'telefono': f'04{rng.choice("12")}{rng.randrange(10)}-{rng.randrange(1000000, 9999999)}',
+                'direccion': f'Calle {rng.randrange(1, 120)}, {rng.choice(CIUDADES)}',
+            })
+        ids += _insertar(Cliente, filas, Cliente.id_cliente)
+        db.session.commit()
+    return ids
+
+
+def generar_proyectos(rng, cantidad, ids_clientes, tamano_lote, ahora):
+    """Proyectos de clientes sesgados; el estado es coherente con sus fechas"""
+    proyectos = []  # (id, fecha_inicio, fecha_fin) para fechar sus planos
+    for _, tamano in _por_lotes(cantidad, tamano_lote):
+        filas = []
+        for _ in range(tamano):
+            fecha_inicio = _reciente(rng, ahora).date()
+            fecha_fin = fecha_inicio + timedelta(days=rng.randrange(30, 540))
+            if fecha_fin < ahora.date():
+                estado = 'cancelado' if rng.random() < 0.1 else 'completado'
+            else:
+                estado = 'planificacion' if rng.random() < 0.2 else 'en_progreso'
+            filas.append({
+                'id_cliente': _sesgado(ids_clientes, rng),
+                'nombre_proyecto': f'{rng.choice(OBRAS)} {rng.choice(APELLIDOS)} {rng.randrange(1, 100)}',
+                'descripcion': f'Obra en {rng.choice(CIUDADES)}',
+                'fecha_inicio': fecha_inicio, 'fecha_fin': fecha_fin, 'estado': estado,
+            })
+        ids = _insertar(Proyecto, filas, Proyecto.id_proyecto)
+        proyectos += [(id_proyecto, fila['fecha_inicio'], fila['fecha_fin'])
+                      for id_proyecto, fila in zip(ids, filas)]
+        db.session.commit()
+    return proyectos
+
+
+def generar_planos(rng, cantidad, proyectos, ids_usuarios, tamano_lote, ahora):
+    """Planos concentrados en pocos proyectos grandes, subidos mientras la obra dura"""
+    tipos = db.session.execute(select(TipoPlano.id_tipo_plano, TipoPlano.nombre_tipo)).all()
+    tipos_ponderados = [(id_tipo, PESOS_TIPO_PLANO.get(nombre, 1)) for id_tipo, nombre in tipos]
+    archivos = _archivos_muestra()
+    referencias = Counter()
+    for _, tamano in _por_lotes(cantidad, tamano_lote):
+        filas = []
+        for _ in range(tamano):
+            id_proyecto, fecha_inicio, fecha_fin = _sesgado(proyectos, rng, exponente=2)
+            dias = max(1, (min(fecha_fin, ahora.date()) - fecha_inicio).days)
+            archivo = rng.choice(archivos)
+            referencias[archivo] += 1
+            filas.append({
+                'id_proyecto': id_proyecto,
+                'id_tipo_plano': _ponderado(tipos_ponderados, rng),
+                'id_usuario': rng.choice(ids_usuarios),
+                'nombre_plano': f'{rng.choice(("Planta", "Corte", "Fachada", "Detalle", "Instalación"))} '
+                                f'{rng.choice("ABCDEF")}-{rng.randrange(1, 40)}',
+                'archivo': archivo,
+                'fecha_subida': datetime.combine(fecha_inicio, datetime.min.time())
+                + timedelta(days=rng.randrange(dias), seconds=rng.randrange(86400)),
+            })
+        _insertar(Plano, filas)
+        db.session.commit()
+    aplicar_variacion_referencias(db.session.connection(), referencias)
+    db.session.commit()
+
+
+def generar_materiales(rng, cantidad):
+    filas = []
+    for numero in range(1, cantidad + 1):
+        categoria = _ponderado(CATEGORIAS, rng)
+        precio = Decimal(round(rng.lognormvariate(2.5, 0.8), 2)).quantize(Decimal('0.01'))
+        filas.append({
+            'nombre_material': f'{categoria.title()} {numero:04d}', 'descripcion': 'Material de prueba',
+            'categoria': categoria, 'precio_unitario': precio,
+            'precio_compra': (precio * Decimal('0.6')).quantize(Decimal('0.01')),
+            'unidad_medida': 'rollo' if categoria == 'papel' else 'unidad',
+            'stock_minimo': rng.choice((5, 10, 20, 50)), 'activo': True,
+        })
+    ids = _insertar(Material, filas, Material.id_material)
+    incrementar_versiones(db.session.connection(), {Material.__tablename__})
+    # Un tercio por debajo del mínimo, para que las alertas de stock tengan contenido
+    crear_inventarios([{'id_material': id_material, 'ubicacion': f'Estante {rng.randrange(1, 30)}',
+                        'cantidad': rng.randrange(0, fila['stock_minimo']) if rng.random() < 0.33
+                        else rng.randrange(fila['stock_minimo'], fila['stock_minimo'] * 10)}
+                       for id_material, fila in zip(ids, filas)])
+    db.session.commit()
+    return [(id_material, fila['precio_unitario']) for id_material, fila in zip(ids, filas)]
+
+
+def generar_ventas(rng, cantidad_detalles, ids_clientes, ids_usuarios, materiales, tamano_lote, ahora):
+    """Ventas de 1 a 20 líneas (media ~4) hasta sumar `cantidad_detalles` líneas"""
+    ids_planos = db.session.scalars(select(Plano.id_plano)).all()
+    creadas = 0
+    detalles_creados = 0
+    while detalles_creados < cantidad_detalles:
+        ventas, lineas_por_venta = [], []
+        while len(ventas) < tamano_lote and detalles_creados < cantidad_detalles:
+            lineas = []
+            for _ in range(min(20, 1 + int(rng.expovariate(1 / 3)), cantidad_detalles - detalles_creados)):
+                cantidad = 1 + int(rng.expovariate(1))
+                if ids_planos and rng.random() < 0.6:
+                    precio = Decimal(rng.choice((3, 5, 8, 12, 20)))
+                    lineas.append({'id_plano': rng.choice(ids_planos), 'id_material': None,
+                                   'descripcion': 'Ploteo de plano', 'cantidad': cantidad,
+                                   'precio_unitario': precio, 'descuento': Decimal('0')})
+                else:
+                    id_material, precio = rng.choice(materiales)
+                    lineas.append({'id_plano': None, 'id_material': id_material,
+                                   'descripcion': 'Venta de material', 'cantidad': cantidad,
+                                   'precio_unitario': precio, 'descuento': Decimal('0')})
+            detalles_creados += len(lineas)
+            subtotal = sum(linea['precio_unitario'] * linea['cantidad'] for linea in lineas)
+            descuento = (subtotal * Decimal('0.05')).quantize(Decimal('0.01')) if rng.random() < 0.1 \
+                else Decimal('0')
+            ventas.append({
+                'id_cliente': _sesgado(ids_clientes, rng), 'id_usuario': rng.choice(ids_usuarios),
+                'fecha_venta': _reciente(rng, ahora), 'subtotal': subtotal, 'impuesto': Decimal('0'),
+                'descuento': descuento, 'total': subtotal - descuento,
+                'estado': _ponderado(ESTADOS_VENTA, rng), 'metodo_pago': _ponderado(METODOS_PAGO, rng),
+            })
+            lineas_por_venta.append(lineas)
+        ids = _insertar(Venta, ventas, Venta.id_venta)
+        detalles = []
+        for id_venta, lineas in zip(ids, lineas_por_venta):
+            for linea in lineas:
+                linea['id_venta'] = id_venta
+                detalles.append(linea)
+        _insertar(DetalleVenta, detalles)
+        db.session.commit()
+        creadas += len(ventas)
+    return creadas
+
+
+def generar_datos(escala=1.0, semilla=42, tamano_lote=5000, informar=print):
+    """Insertar un volumen realista de datos de prueba con SQL de varias filas.
+
+    Todo va por SQLAlchemy Core, fuera del ORM: aquí mismo se actualizan
+    versiones de tablas, referencias de archivos e inventarios, y al final
+    se recalculan las estadísticas del dashboard. Con la misma semilla y
+    escala se generan los mismos datos.
+    """
+    rng = random.Random(semilla)
+    ahora = datetime.utcnow()
+    volumen = {tabla: max(1, int(cantidad * escala)) for tabla, cantidad in VOLUMENES.items()}
+
+    def paso(descripcion, funcion, *args):
+        inicio = time.perf_counter()
+        resultado = funcion(*args)
+        informar(f'  {descripcion}: {time.perf_counter() - inicio:.1f} s')
+        return resultado
+
+    ids_usuarios = _usuarios_sinteticos(rng)
+    ids_clientes = paso(f'{volumen["clientes"]} clientes', generar_clientes,
+                        rng, volumen['clientes'], tamano_lote)
+    proyectos = paso(f'{volumen["proyectos"]} proyectos', generar_proyectos,
+                     rng, volumen['proyectos'], ids_clientes, tamano_lote, ahora)
+    paso(f'{volumen["planos"]} planos', generar_planos,
+         rng, volumen['planos'], proyectos, ids_usuarios, tamano_lote, ahora)
+    materiales = paso(f'{volumen["materiales"]} materiales con inventario', generar_materiales,
+                      rng, volumen['materiales'])
+    paso(f'{volumen["detalle_ventas"]} líneas de venta', generar_ventas,
+         rng, volumen['detalle_ventas'], ids_clientes, ids_usuarios, materiales, tamano_lote, ahora)
+
+    incrementar_versiones(db.session.connection(), {
+        Cliente.__tablename__, Proyecto.__tablename__, Plano.__tablename__,
+        Venta.__tablename__, DetalleVenta.__tablename__,
+    })
+    reconciliar_estadisticas()
+    return volumen
+
+
+def init_datos_sinteticos(app):
+    """Registrar el comando generador de datos de prueba"""
+
+    @app.cli.command('generar-datos')
+    @click.option('--escala', default=1.0, show_default=True,
+                  help='Multiplica los volúmenes (1 = 100k clientes, 500k planos, 1M líneas de venta)')
+    @click.option('--semilla', default=42, show_default=True)
+    @click.option('--lote', 'tamano_lote', default=5000, show_default=True, help='Filas por INSERT')
+    def generar_datos_comando(escala, semilla, tamano_lote):
+        """Llenar la base de datos con datos sintéticos realistas para pruebas de rendimiento"""
+        inicio = time.perf_counter()
+        volumen = generar_datos(escala, semilla, tamano_lote)
+        print(f'✅ Datos generados en {time.perf_counter() - inicio:.1f} s: '
+              + ', '.join(f'{cantidad} {tabla}' for tabla, cantidad in volumen.items()))
@@ -0,0 +1,166 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.orm import Session
+
+from models import db, Cliente, Proyecto, Plano, Inventario, MovimientoInventario, Venta, Estadisticas
+
+
+ID_ESTADISTICAS = 1
+
+# Modelos cuyo número de filas se lleva en un contador
+CONTADORES = {
+    Cliente: 'total_clientes',
+    Proyecto: 'total_proyectos',
+    Plano: 'total_planos',
+    Venta: 'total_ventas',
+}
+
+
+def _decimal(valor):
+    return Decimal(str(valor or 0))
+
+
+def _importe(total, estado):
+    """Importe que aporta una venta al total vendido"""
+    return Decimal('0') if estado == 'cancelada' else _decimal(total)
+
+
+def _valor_actual(obj, atributo):
+    """Valor que se escribirá en la base de datos, aplicando el default de la columna si falta"""
+    valor = getattr(obj, atributo)
+    if valor is None:
+        columna = type(obj).__table__.c[atributo]
+        if columna.default is not None and columna.default.is_scalar:
+            valor = columna.default.arg
+    return valor
+
+
+def _valor_anterior(session, obj, atributo):
+    """Valor del atributo antes de los cambios pendientes en la sesión"""
+    historial = inspect(obj).attrs[atributo].history
+    if historial.deleted:
+        return historial.deleted[0]
+    if not historial.added:
+        # Sin cambios: el valor actual es el guardado (se carga si hace falta)
+        return getattr(obj, atributo)
+
+    # Se modificó sin haber cargado el valor previo: la fila aún no se ha actualizado
+    tabla = type(obj).__table__
+    clave = inspect(obj).identity
+    condiciones = [columna == valor for columna, valor in zip(tabla.primary_key.columns, clave)]
+    return session.connection().execute(select(tabla.c[atributo]).where(*condiciones)).scalar()
+
+
+def _cambio(obj, atributo):
+    return inspect(obj).attrs[atributo].history.has_changes()
+
+
+def calcular_deltas(session):
+    """Variación de cada contador producida por los cambios pendientes de la sesión"""
+    deltas = defaultdict(int)
+
+    for obj in session.new:
+        campo = CONTADORES.get(type(obj))
+        if campo:
+            deltas[campo] += 1
+        if isinstance(obj, Venta):
+            deltas['importe_vendido'] += _importe(obj.total, _valor_actual(obj, 'estado'))
+        elif isinstance(obj, Inventario):
+            deltas['existencia_total'] += obj.cantidad or 0
+        elif isinstance(obj, MovimientoInventario):
+            # La cantidad de inventario la cambió el UPDATE atómico del movimiento
+            deltas['existencia_total'] += obj.cantidad
+
+    for obj in session.deleted:
+        campo = CONTADORES.get(type(obj))
+        if campo:
+            deltas[campo] -= 1
+        if isinstance(obj, Venta):
+            deltas['importe_vendido'] -= _importe(_valor_anterior(session, obj, 'total'),
+                                                  _valor_anterior(session, obj, 'estado'))
+        elif isinstance(obj, Inventario):
+            deltas['existencia_total'] -= _valor_anterior(session, obj, 'cantidad') or 0
+
+    for obj in session.dirty:
+        if isinstance(obj, Venta) and (_cambio(obj, 'total') or _cambio(obj, 'estado')):
+            deltas['importe_vendido'] += (
+                _importe(obj.total, _valor_actual(obj, 'estado'))
+                - _importe(_valor_anterior(session, obj, 'total'),
+                           _valor_anterior(session, obj, 'estado'))
+            )
+        elif isinstance(obj, Inventario) and _cambio(obj, 'cantidad'):
+            deltas['existencia_total'] += (
+                (obj.cantidad or 0) - (_valor_anterior(session, obj, 'cantidad') or 0)
+            )
+
+    return {campo: delta for campo, delta in deltas.items() if delta}
+
+
+def aplicar_deltas(conexion, deltas):
+    """Sumar `deltas` ({campo: variación}) a los totales con un único UPDATE.
+
+    Las operaciones masivas (inserciones Core) la llaman con lo que insertan;
+    las que no lo hacen (query.update/delete) requieren después
+    `flask reconciliar-estadisticas`.
+    """
+    deltas = {campo: delta for campo, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    tabla = Estadisticas.__table__
+    valores = {campo: tabla.c[campo] + delta for campo, delta in deltas.items()}
+    conexion.execute(
+        update(tabla).where(tabla.c.id_estadisticas == ID_ESTADISTICAS).values(**valores)
+    )
+
+
+def _actualizar_estadisticas(session, flush_context, instances):
+    """Aplicar los deltas en la misma transacción que los cambios que los producen"""
+    deltas = calcular_deltas(session)
+    if deltas:
+        aplicar_deltas(session.connection(), deltas)
+
+
+def reconciliar_estadisticas():
+    """Recalcular todos los totales desde cero y guardarlos"""
+    importe = db.session.query(db.func.sum(Venta.total)).filter(
+        db.or_(Venta.estado.is_(None), Venta.estado != 'cancelada')
+    ).scalar()
+
+    estadisticas = db.session.get(Estadisticas, ID_ESTADISTICAS) or \
+        Estadisticas(id_estadisticas=ID_ESTADISTICAS)
+    estadisticas.total_clientes = Cliente.query.count()
+    estadisticas.total_proyectos = Proyecto.query.count()
+    estadisticas.total_planos = Plano.query.count()
+    estadisticas.total_ventas = Venta.query.count()
+    estadisticas.existencia_total = db.session.query(db.func.sum(Inventario.cantidad)).scalar() or 0
+    estadisticas.importe_vendido = _decimal(importe)
+    db.session.add(estadisticas)
+    db.session.commit()
+    return estadisticas
+
+
+def asegurar_estadisticas():
+    """Crear la fila de totales si todavía no existe"""
+    if db.session.get(Estadisticas, ID_ESTADISTICAS) is None:
+        reconciliar_estadisticas()
+
+
+def obtener_estadisticas():
+    """Leer la fila de totales (una lectura por clave primaria)"""
+    return db.session.get(Estadisticas, ID_ESTADISTICAS) or reconciliar_estadisticas()
+
+
+def init_estadisticas(app):
+    """Registrar el mantenimiento incremental y el comando de reconciliación"""
+    if not event.contains(Session, 'before_flush', _actualizar_estadisticas):
+        event.listen(Session, 'before_flush', _actualizar_estadisticas)
+
+    @app.cli.command('reconciliar-estadisticas')
+    def reconciliar_estadisticas_comando():
+        """Recalcular los totales del dashboard desde las tablas"""
+        estadisticas = reconciliar_estadisticas()
+        print(f'✅ Estadísticas reconciliadas: {estadisticas.total_clientes} clientes, '
+              f'{estadisticas.total_ventas} ventas')
@@ -0,0 +1,226 @@
+import json
+import threading
+import time
+from collections import Counter, deque
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from versiones import tablas_modificadas
+
+
+# Mensajes recientes que guarda cada proceso para los flujos que van un poco atrasados
+_MENSAJES_EN_MEMORIA = 1000
+
+# Segundos que un flujo nuevo espera a que el lector tome el punto de partida de sus canales
+_ESPERA_INICIO = 10
+
+
+def mensaje_sse(evento, datos):
+    return f'event: {evento}\ndata: {json.dumps(datos, ensure_ascii=False)}\n\n'
+
+
+class DifusorSSE:
+    """Reparte los eventos de los canales registrados a los flujos SSE abiertos en este proceso.
+
+    Un canal es un objeto con `nombre`, `tablas` (las que lo hacen cambiar),
+    `iniciar()` (fija el punto de partida), `leer()` (pares (evento, datos)
+    nuevos desde la última lectura) y `estado()` (los pares que reconstruyen
+    el estado completo en el navegador).
+
+    Un solo hilo por proceso lee los canales que tienen algún flujo abierto:
+    cada `intervalo` segundos, para ver los cambios de otros procesos, y en
+    cuanto un commit de este proceso toca sus tablas. Después despierta a
+    todos los flujos; diez pestañas abiertas cuestan lo mismo que una. Ese
+    hilo es el único que llama a `iniciar()` y `leer()`, así que el estado
+    interno de un canal no necesita bloqueos propios. Cada
+    flujo ocupa un hilo del servidor mientras dura, por eso el máximo se
+    comparte entre todos los canales y un flujo dura como mucho `duracion`
+    segundos: el navegador se reconecta solo y recibe de nuevo el estado.
+    """
+
+    def __init__(self, app, intervalo, latido, duracion, maximo):
+        self.app = app
+        self.intervalo = intervalo
+        self.latido = latido
+        self.duracion = duracion
+        self.maximo = maximo
+        self._canales = {}
+        self._condicion = threading.Condition()
+        self._mensajes = deque(maxlen=_MENSAJES_EN_MEMORIA)  # (secuencia, canal, mensaje SSE)
+        self._secuencia = 0
+        self._conexiones = 0
+        self._oyentes = Counter()
+        self._por_iniciar = set()
+        self._leyendo = False
+        self._avisado = False
+
+    def registrar(self, canal):
+        self._canales[canal.nombre] = canal
+
+    def abrir(self, nombres):
+        """Ocupar un puesto de flujo para los canales `nombres` y devolver la posición actual.
+
+        Devuelve None si el proceso ya tiene el máximo de flujos. Un canal sin
+        oyentes toma su punto de partida en el lector antes de que esto
+        devuelva la posición, y la petición lee su estado después, para que
+        ningún cambio quede entre ambos.
+        """
+        with self._condicion:
+            if self._conexiones >= self.maximo:
+                return None
+            nuevos = {nombre for nombre in nombres if not self._oyentes[nombre]}
+            self._conexiones += 1
+            self._oyentes.update(nombres)
+            if nuevos:
+                self._por_iniciar |= nuevos
+                self._avisado = True
+                self._condicion.notify_all()
+            if not self._leyendo:
+                self._leyendo = True
+                threading.Thread(target=self._leer, name='difusor-sse', daemon=True).start()
+            # También si otro flujo acaba de pedir el inicio de alguno y el lector aún no lo ha hecho
+            self._condicion.wait_for(lambda: not self._por_iniciar.intersection(nombres),
+                                     timeout=_ESPERA_INICIO)
+            return self._secuencia
+
+    def cerrar(self, nombres):
+        with self._condicion:
+            self._conexiones -= 1
+            self._oyentes.subtract(nombres)
+
+    def avisar(self, tablas):
+        """Adelantar la próxima lectura si `tablas` afectan a algún canal con oyentes"""
+        with self._condicion:
+            if any(self._oyentes[nombre] and canal.tablas & tablas
+                   for nombre, canal in self._canales.items()):
+                self._avisado = True
+                self._condicion.notify_all()
+
+    def _leer(self):
+        while True:
+            with self._condicion:
+                self._condicion.wait_for(lambda: self._avisado, timeout=self.intervalo)
+                self._avisado = False
+                if self._conexiones == 0:
+                    self._leyendo = False
+                    return
+                canales = [canal for nombre, canal in self._canales.items() if self._oyentes[nombre]]
+                por_iniciar = set(self._por_iniciar)
+
+            nuevos = []
+            for canal in canales:
+                try:
+                    with self.app.app_context():
+                        if canal.nombre in por_iniciar:
+                            canal.iniciar()
+                        nuevos.extend((canal.nombre, mensaje_sse(evento, datos))
+                                      for evento, datos in canal.leer())
+                except Exception:
+                    self.app.logger.exception('No se pudo leer el canal de eventos %s', canal.nombre)
+            with self._condicion:
+                for nombre, mensaje in nuevos:
+                    self._secuencia += 1
+                    self._mensajes.append((self._secuencia, nombre, mensaje))
+                self._por_iniciar -= por_iniciar
+                self._condicion.notify_all()
+
+    def flujo(self, posicion, nombres):
+        """Respuesta SSE: el estado de cada canal y después cada mensaje posterior a `posicion`.
+
+        Debe llamarse tras abrir(); el puesto se libera al cerrar la respuesta.
+        """
+        try:
+            iniciales = ''.join(mensaje_sse(evento, datos) for nombre in nombres
+                                for evento, datos in self._canales[nombre].estado())
+        except Exception:
+            self.cerrar(nombres)
+            raise
+        return _FlujoSSE(self._enviar(posicion, set(nombres), iniciales), lambda: self.cerrar(nombres))
+
+    def _enviar(self, posicion, nombres, iniciales):
+        yield f'retry: {int(self.intervalo * 1000) + 2000}\n' + iniciales
+        enviado = time.monotonic()
+        fin = enviado + self.duracion
+        while (restante := fin - time.monotonic()) > 0:
+            with self._condicion:
+                self._condicion.wait_for(lambda: self._secuencia > posicion,
+                                         timeout=min(self.latido, restante))
+                nuevos = [(secuencia, nombre, mensaje) for secuencia, nombre, mensaje in self._mensajes
+                          if secuencia > posicion]
+            if nuevos:
+                posicion = nuevos[-1][0]
+            mensajes = ''.join(mensaje for _secuencia, nombre, mensaje in nuevos if nombre in nombres)
+            if not mensajes and time.monotonic() - enviado >= self.latido:
+                mensajes = ': latido\n\n'  # comentario SSE: mantiene viva la conexión a través de proxies
+            if mensajes:
+                enviado = time.monotonic()
+                yield mensajes
+
+
+class _FlujoSSE:
+    """Iterable de respuesta que libera su puesto al cerrarse, aunque no llegara a empezar"""
+
+    def __init__(self, mensajes, al_cerrar):
+        self._mensajes = mensajes
+        self._al_cerrar = al_cerrar
+
+    def __iter__(self):
+        return self._mensajes
+
+    def close(self):
+        if self._al_cerrar is not None:
+            al_cerrar, self._al_cerrar = self._al_cerrar, None
+            try:
+                self._mensajes.close()
+            finally:
+                al_cerrar()
+
+
+def difusor_sse():
+    return current_app.extensions['difusor_sse']
+
+
+def responder_flujo(*nombres):
+    """Respuesta text/event-stream con los canales `nombres`, o 503 si no quedan puestos"""
+    difusor = difusor_sse()
+    posicion = difusor.abrir(nombres)
+    if posicion is None:
+        return 'Demasiadas conexiones de eventos abiertas', 503, {'Retry-After': '30'}
+    return current_app.response_class(
+        difusor.flujo(posicion, nombres),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+def _anotar_tablas(session, flush_context):
+    session.info.setdefault('tablas_sse', set()).update(tablas_modificadas(session))
+
+
+def _avisar_tras_commit(session):
+    """Despertar al lector del proceso en cuanto se confirman cambios de sus canales"""
+    tablas = session.info.pop('tablas_sse', None)
+    if tablas and has_app_context() and 'difusor_sse' in current_app.extensions:
+        difusor_sse().avisar(tablas)
+
+
+def _descartar_tablas(session):
+    session.info.pop('tablas_sse', None)
+
+
+def init_eventos_sse(app):
+    """Crear el difusor del proceso; cada módulo registra después sus canales"""
+    for nombre, funcion in (('after_flush', _anotar_tablas), ('after_commit', _avisar_tras_commit),
+                            ('after_rollback', _descartar_tablas)):
+        if not event.contains(Session, nombre, funcion):
+            event.listen(Session, nombre, funcion)
+
+    app.extensions['difusor_sse'] = DifusorSSE(
+        app,
+        app.config['SSE_INTERVALO'],
+        app.config['SSE_LATIDO'],
+        app.config['SSE_DURACION'],
+        app.config['SSE_MAX_CONEXIONES']
+    )
@@ -0,0 +1,283 @@
+import glob
+import hashlib
+import io
+import os
+import tempfile
+import zipfile
+from datetime import datetime, timedelta
+
+import click
+
+from models import db, Venta
+from trabajos import enviar_trabajo, app_trabajador
+
+
+# Cambiar al modificar el diseño de la factura: invalida todas las ya generadas
+FORMATO_FACTURA = 2
+
+
+def carpeta_facturas(app):
+    carpeta = os.path.abspath(app.config['CARPETA_FACTURAS'])
+    os.makedirs(carpeta, exist_ok=True)
+    return carpeta
+
+
+def cargar_venta_factura(id_venta):
+    """Venta con cliente y usuario en una sola consulta, o None si no existe"""
+    return Venta.query.options(
+        db.joinedload(Venta.cliente),
+        db.joinedload(Venta.usuario)
+    ).filter_by(id_venta=id_venta).first()
+
+
+def version_factura(venta):
+    """Resumen de todo lo que se imprime en la factura, salvo las líneas.
+
+    Las líneas de una venta no se modifican después de registrarla; el resto
+    (estado al cancelar, importes, nombres de cliente y vendedor) sí, y
+    cualquier cambio produce una versión nueva. Sirve también de ETag.
+    """
+    partes = (
+        FORMATO_FACTURA, venta.id_venta, venta.fecha_venta, venta.estado,
+        venta.subtotal, venta.impuesto, venta.descuento, venta.total,
+        venta.cliente.nombre_completo, venta.usuario.nombre_usuario,
+    )
+    return hashlib.sha256('|'.join(str(p) for p in partes).encode('utf-8')).hexdigest()[:16]
+
+
+def ruta_factura(app, id_venta, version):
+    return os.path.join(carpeta_facturas(app), f'{id_venta}-{version}.pdf')
+
+
+def construir_factura(venta):
+    """Construir el documento PDF de la factura de una venta"""
+    # Diferida: el proceso web solo carga fpdf si sirve una factura no cacheada
+    from fpdf import FPDF
+
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font('Arial', 'B', 16)
+
+    # Encabezado
+    pdf.cell(0, 10, 'ASPLOT CENTER', 0, 1, 'C')
+    pdf.set_font('Arial', '', 10)
+    pdf.cell(0, 5, 'Factura de Venta', 0, 1, 'C')
+    if venta.estado == 'cancelada':
+        pdf.set_font('Arial', 'B', 12)
+        pdf.set_text_color(200, 0, 0)
+        pdf.cell(0, 8, 'VENTA CANCELADA', 0, 1, 'C')
+        pdf.set_text_color(0, 0, 0)
+    pdf.ln(5)
+
+    # Información de la venta
+    pdf.set_font('Arial', 'B', 10)
+    pdf.cell(40, 6, 'Factura No:', 0, 0)
+    pdf.set_font('Arial', '', 10)
+    pdf.cell(60, 6, f'{venta.id_venta:06d}', 0, 0)
+    pdf.set_font('Arial', 'B', 10)
+    pdf.cell(30, 6, 'Fecha:', 0, 0)
+    pdf.set_font('Arial', '', 10)
+    pdf.cell(0, 6, venta.fecha_venta.strftime('%Y-%m-%d %H:%M'), 0, 1)
+
+    pdf.set_font('Arial', 'B', 10)
+    pdf.cell(40, 6, 'Cliente:', 0, 0)
+    pdf.set_font('Arial', '', 10)
+    pdf.cell(0, 6, venta.cliente.nombre_completo, 0, 1)
+
+    pdf.set_font('Arial', 'B', 10)
+    pdf.cell(40, 6, 'Atendido por:', 0, 0)
+    pdf.set_font('Arial', '', 10)
+    pdf.cell(0, 6, venta.usuario.nombre_usuario, 0, 1)
+    pdf.ln(5)
+
+    # Tabla de detalles
+    pdf.set_font('Arial', 'B', 10)
+    pdf.cell(80, 8, 'Descripcion', 1, 0, 'C')
+    pdf.cell(30, 8, 'Cantidad', 1, 0, 'C')
+    pdf.cell(30, 8, 'Precio Unit.', 1, 0, 'C')
+    pdf.cell(30, 8, 'Subtotal', 1, 1, 'C')
+
+    pdf.set_font('Arial', '', 9)
+    for detalle in venta.detalle_ventas:
+        pdf.cell(80, 6, detalle.descripcion[:40], 1, 0)
+        pdf.cell(30, 6, str(detalle.cantidad), 1, 0, 'C')
+        pdf.cell(30, 6, f'${detalle.precio_unitario:.2f}', 1, 0, 'R')
+        pdf.cell(30, 6, f'${detalle.subtotal:.2f}', 1, 1, 'R')
+
+    # Totales
+    pdf.ln(3)
+    pdf.set_font('Arial', 'B', 10)
+    pdf.cell(140, 6, 'Subtotal:', 0, 0, 'R')
+    pdf.cell(30, 6, f'${venta.subtotal:.2f}', 0, 1, 'R')
+
+    if venta.impuesto > 0:
+        pdf.cell(140, 6, 'Impuesto:', 0, 0, 'R')
+        pdf.cell(30, 6, f'${venta.impuesto:.2f}', 0, 1, 'R')
+
+    if venta.descuento > 0:
+        pdf.cell(140, 6, 'Descuento:', 0, 0, 'R')
+        pdf.cell(30, 6, f'-${venta.descuento:.2f}', 0, 1, 'R')
+
+    pdf.set_font('Arial', 'B', 12)
+    pdf.cell(140, 8, 'TOTAL:', 0, 0, 'R')
+    pdf.cell(30, 8, f'${venta.total:.2f}', 0, 1, 'R')
+    return pdf
+
+
+def guardar_factura(app, venta, version):
+    """Generar el PDF de la factura y publicarlo de forma atómica; devuelve su ruta"""
+    ruta = ruta_factura(app, venta.id_venta, version)
+    descriptor, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as destino:
+            construir_factura(venta).output(destino)
+        os.replace(temporal, ruta)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+    # Las versiones anteriores de la misma factura ya no se pueden pedir
+    for anterior in glob.glob(os.path.join(os.path.dirname(ruta), f'{venta.id_venta}-*.pdf')):
+        if anterior != ruta:
+            try:
+                os.remove(anterior)
+            except FileNotFoundError:
+                pass  # otra petición la borró antes
+    return ruta
+
+
+def factura_en_cache(app, venta):
+    """Ruta y versión del PDF de la factura, generándolo solo si esa versión no existe"""
+    version = version_factura(venta)
+    ruta = ruta_factura(app, venta.id_venta, version)
+    if not os.path.exists(ruta):
+        guardar_factura(app, venta, version)
+    return ruta, version
+
+
+def ids_ventas_periodo(desde, hasta, estado=None):
+    """Ids de las ventas entre dos fechas (ambas incluidas), en orden cronológico"""
+    consulta = db.session.query(Venta.id_venta).filter(
+        Venta.fecha_venta >= datetime.combine(desde, datetime.min.time()),
+        Venta.fecha_venta < datetime.combine(hasta + timedelta(days=1), datetime.min.time())
+    )
+    if estado:
+        consulta = consulta.filter(Venta.estado == estado)
+    return [id_venta for id_venta, in consulta.order_by(Venta.fecha_venta, Venta.id_venta)]
+
+
+def generar_facturas_en_trabajador(ids_venta):
+    """Trabajo del pool: asegurar el PDF de un grupo de ventas; devuelve [(id_venta, ruta)].
+
+    Carga el grupo con tres consultas (ventas con cliente y vendedor, y sus
+    líneas) y reutiliza la caché de imprimir_venta, así una factura ya
+    generada no se vuelve a dibujar.
+    """
+    app = app_trabajador()
+    with app.app_context():
+        ventas = Venta.query.options(
+            db.joinedload(Venta.cliente),
+            db.joinedload(Venta.usuario),
+            db.selectinload(Venta.detalle_ventas)
+        ).filter(Venta.id_venta.in_(ids_venta)).all()
+        rutas = {venta.id_venta: factura_en_cache(app, venta)[0] for venta in ventas}
+    # Una venta borrada entre la consulta de ids y este trabajo simplemente se omite
+    return [(id_venta, rutas[id_venta]) for id_venta in ids_venta if id_venta in rutas]
+
+
+def facturas_en_paralelo(app, ids_venta):
+    """Repartir las facturas en grupos entre los procesos del pool.
+
+    Todos los grupos se encolan de inmediato y se ejecutan a la vez en los
+    PROCESOS_TRABAJOS trabajadores; el generador devuelto entrega (id_venta,
+    ruta) en el orden de `ids_venta` a medida que cada grupo termina.
+    """
+    tamano = app.config['FACTURAS_POR_TRABAJO']
+    futuros = [enviar_trabajo(app, generar_facturas_en_trabajador, ids_venta[inicio:inicio + tamano])
+               for inicio in range(0, len(ids_venta), tamano)]
+
+    def resultados():
+        try:
+            for futuro in futuros:
+                yield from futuro.result()
+        finally:
+            # Descarga interrumpida: no generar los grupos que aún no han empezado
+            for futuro in futuros:
+                futuro.cancel()
+    return resultados()
+
+
+class _SalidaZip(io.RawIOBase):
+    """Destino no posicionable para zipfile: acumula lo escrito hasta vaciarlo"""
+
+    def __init__(self):
+        super().__init__()
+        self._partes = []
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def vaciar(self):
+        datos = b''.join(self._partes)
+        self._partes = []
+        return datos
+
+
+def zip_facturas(facturas):
+    """Generar un ZIP con las facturas a medida que llegan, sin tenerlo entero en memoria.
+
+    Los PDF ya van comprimidos, así que se guardan sin volver a comprimir.
+    """
+    salida = _SalidaZip()
+    with zipfile.ZipFile(salida, 'w', zipfile.ZIP_STORED) as archivo_zip:
+        for id_venta, ruta in facturas:
+            archivo_zip.write(ruta, f'factura_{id_venta:06d}.pdf')
+            yield salida.vaciar()
+    yield salida.vaciar()
+
+
+def pdf_unico_facturas(facturas, tamano_fragmento=64 * 1024):
+    """Unir las facturas en un solo PDF (requiere pypdf) y entregarlo por fragmentos"""
+    from pypdf import PdfWriter
+
+    escritor = PdfWriter()
+    for _, ruta in facturas:
+        escritor.append(ruta)
+    with tempfile.TemporaryFile() as temporal:
+        escritor.write(temporal)
+        escritor.close()
+        temporal.seek(0)
+        while fragmento := temporal.read(tamano_fragmento):
+            yield fragmento
+
+
+FORMATOS_LOTE_FACTURAS = {
+    'zip': ('application/zip', zip_facturas),
+    'pdf': ('application/pdf', pdf_unico_facturas),
+}
+
+
+def init_facturas(app):
+    """Registrar el comando de exportación de facturas por periodo"""
+
+    @app.cli.command('exportar-facturas')
+    @click.option('--desde', type=click.DateTime(['%Y-%m-%d']), required=True)
+    @click.option('--hasta', type=click.DateTime(['%Y-%m-%d']), required=True)
+    @click.option('--estado', type=click.Choice(['completada', 'pendiente', 'cancelada']))
+    @click.option('--formato', type=click.Choice(list(FORMATOS_LOTE_FACTURAS)), default='zip')
+    @click.argument('destino', type=click.Path(dir_okay=False, writable=True))
+    def exportar_facturas_comando(desde, hasta, estado, formato, destino):
+        """Generar en paralelo las facturas de un periodo en un ZIP o un único PDF"""
+        ids_venta = ids_ventas_periodo(desde.date(), hasta.date(), estado)
+        if not ids_venta:
+            print('No hay ventas en ese periodo')
+            return
+        _, generar = FORMATOS_LOTE_FACTURAS[formato]
+        with open(destino, 'wb') as archivo:
+            for fragmento in generar(facturas_en_paralelo(app, ids_venta)):
+                archivo.write(fragmento)
+        print(f'✅ {len(ids_venta)} facturas exportadas a {destino}')
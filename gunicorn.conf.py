@@ -0,0 +1,52 @@
+"""Configuración de gunicorn para servir wsgi:app con todos los núcleos.
+
+Procesos × hilos: cada proceso trabajador atiende WEB_HILOS peticiones a la
+vez, lo que cubre la espera de E/S (base de datos, archivos, descargas en
+streaming); los procesos reparten la CPU. Todo se puede ajustar con
+variables de entorno sin tocar este archivo.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('WEB_DIRECCION', '127.0.0.1:8000')
+workers = int(os.environ.get('WEB_PROCESOS', multiprocessing.cpu_count()))
+worker_class = 'gthread'
+threads = int(os.environ.get('WEB_HILOS', 4))
+
+# La aplicación se crea una vez en el maestro y los trabajadores la heredan
+# (create_app() no toca la base de datos); ver post_fork
+preload_app = True
+
+# Reciclar trabajadores de forma escalonada acota cualquier fuga de memoria
+max_requests = int(os.environ.get('WEB_MAX_PETICIONES', 2000))
+max_requests_jitter = max_requests // 10
+
+timeout = 120  # las exportaciones grandes se envían en streaming, no bloquean el latido
+graceful_timeout = 30
+keepalive = 5
+
+# Latido de los trabajadores en memoria, no en un disco que puede ir lento
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+accesslog = '-'
+errorlog = '-'
+
+# Cada trabajador web tiene su propio pool de procesos para PDF e imágenes:
+# repartir los núcleos entre todos en lugar de multiplicarlos
+os.environ.setdefault('PROCESOS_TRABAJOS', str(max(1, multiprocessing.cpu_count() // workers)))
+
+
+def post_fork(server, worker):
+    """Cada trabajador abre sus propias conexiones en lugar de compartir las del maestro"""
+    from base_datos import descartar_conexiones_heredadas
+    from wsgi import app
+
+    descartar_conexiones_heredadas(app)
+
+
+def worker_exit(server, worker):
+    """Volcar las métricas del trabajador al salir (p. ej. reciclado por max_requests)"""
+    from wsgi import app
+
+    app.extensions['metricas'].volcar()
@@ -0,0 +1,316 @@
+import csv
+import io
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import insert, update
+
+from models import db, Cliente, Material, Inventario, Plano, Proyecto, TipoPlano
+from estadisticas import aplicar_deltas
+from movimientos import crear_inventarios
+from versiones import incrementar_versiones
+
+
+# Importación y exportación masiva en CSV. Ambas recorren el archivo o la
+# consulta por lotes de CSV_TAMANO_LOTE filas: la memoria usada no depende
+# del número de filas.
+
+ENTIDADES_CSV = {
+    'clientes': 'Clientes',
+    'materiales': 'Materiales',
+    'planos': 'Planos (metadatos)',
+}
+
+CATEGORIAS_MATERIAL = ('papel', 'tinta', 'herramienta', 'otro')
+
+
+class ErrorImportacion(ValueError):
+    """El archivo no se puede importar (cabecera o codificación incorrectas)"""
+
+
+class ResultadoImportacion:
+    """Resumen de una importación; guarda solo los primeros `max_errores` errores"""
+
+    def __init__(self, max_errores):
+        self.creados = 0
+        self.actualizados = 0
+        self.total_errores = 0
+        self.errores = []
+        self.max_errores = max_errores
+
+    def error(self, fila, mensaje):
+        self.total_errores += 1
+        if len(self.errores) < self.max_errores:
+            self.errores.append((fila, mensaje))
+
+
+def _consulta_exportacion(entidad):
+    """Columnas (cabecera, expresión) y consulta ordenada de cada exportación"""
+    if entidad == 'clientes':
+        columnas = [
+            ('id_cliente', Cliente.id_cliente), ('nombre', Cliente.nombre),
+            ('apellido', Cliente.apellido), ('email', Cliente.email),
+            ('telefono', Cliente.telefono), ('direccion', Cliente.direccion),
+        ]
+        consulta = db.select(*[expresion for _, expresion in columnas]).order_by(Cliente.id_cliente)
+    elif entidad == 'materiales':
+        columnas = [
+            ('id_material', Material.id_material), ('nombre_material', Material.nombre_material),
+            ('descripcion', Material.descripcion), ('categoria', Material.categoria),
+            ('subcategoria', Material.subcategoria), ('precio_unitario', Material.precio_unitario),
+            ('precio_compra', Material.precio_compra), ('unidad_medida', Material.unidad_medida),
+            ('stock_minimo', Material.stock_minimo), ('activo', Material.activo),
+            ('cantidad', Inventario.cantidad), ('ubicacion', Inventario.ubicacion),
+        ]
+        consulta = db.select(*[expresion for _, expresion in columnas]) \
+            .outerjoin(Inventario, Inventario.id_material == Material.id_material) \
+            .order_by(Material.id_material, Inventario.id_inventario)
+    else:
+        columnas = [
+            ('id_plano', Plano.id_plano), ('nombre_plano', Plano.nombre_plano),
+            ('id_proyecto', Plano.id_proyecto), ('nombre_proyecto', Proyecto.nombre_proyecto),
+            ('id_tipo_plano', Plano.id_tipo_plano), ('nombre_tipo', TipoPlano.nombre_tipo),
+            ('id_usuario', Plano.id_usuario), ('archivo', Plano.archivo),
+            ('fecha_subida', Plano.fecha_subida),
+        ]
+        consulta = db.select(*[expresion for _, expresion in columnas]) \
+            .join(Proyecto, Proyecto.id_proyecto == Plano.id_proyecto) \
+            .join(TipoPlano, TipoPlano.id_tipo_plano == Plano.id_tipo_plano) \
+            .order_by(Plano.id_plano)
+    return [cabecera for cabecera, _ in columnas], consulta
+
+
+def exportar_csv(entidad, tamano_lote):
+    """Generador con el CSV de una entidad, un fragmento por lote de filas.
+
+    La consulta selecciona columnas, no objetos, y se recorre con yield_per:
+    ni la sesión ni el cursor acumulan filas ya enviadas.
+    """
+    cabeceras, consulta = _consulta_exportacion(entidad)
+    salida = io.StringIO()
+    escritor = csv.writer(salida)
+    # BOM para que las hojas de cálculo detecten UTF-8
+    salida.write('\ufeff')
+    escritor.writerow(cabeceras)
+
+    resultado = db.session.execute(consulta.execution_options(yield_per=tamano_lote))
+    for filas in resultado.partitions():
+        escritor.writerows(filas)
+        yield salida.getvalue()
+        salida.seek(0)
+        salida.truncate()
+    if salida.tell():
+        yield salida.getvalue()
+
+
+def _texto(fila, campo, maximo, obligatorio=True):
+    valor = (fila.get(campo) or '').strip()
+    if obligatorio and not valor:
+        raise ValueError(f'{campo}: obligatorio')
+    if len(valor) > maximo:
+        raise ValueError(f'{campo}: como mucho {maximo} caracteres')
+    return valor
+
+
+def _entero(fila, campo, minimo=0, por_defecto=None):
+    valor = (fila.get(campo) or '').strip()
+    if not valor and por_defecto is not None:
+        return por_defecto
+    try:
+        entero = int(valor)
+    except ValueError:
+        raise ValueError(f'{campo}: debe ser un número entero')
+    if entero < minimo:
+        raise ValueError(f'{campo}: debe ser mayor o igual que {minimo}')
+    return entero
+
+
+def _importe(fila, campo, por_defecto=None):
+    valor = (fila.get(campo) or '').strip()
+    if not valor and por_defecto is not None:
+        return por_defecto
+    try:
+        importe = Decimal(valor)
+    except InvalidOperation:
+        raise ValueError(f'{campo}: debe ser un importe')
+    if not importe.is_finite() or importe < 0 or importe != importe.quantize(Decimal('0.01')):
+        raise ValueError(f'{campo}: importe no negativo con como mucho dos decimales')
+    return importe
+
+
+def _validar_cliente(fila):
+    return {
+        'nombre': _texto(fila, 'nombre', 50),
+        'apellido': _texto(fila, 'apellido', 50),
+        'email': _texto(fila, 'email', 100),
+        'telefono': _texto(fila, 'telefono', 20),
+        'direccion': _texto(fila, 'direccion', 10000),
+    }
+
+
+def _validar_material(fila):
+    categoria = (fila.get('categoria') or 'otro').strip()
+    if categoria not in CATEGORIAS_MATERIAL:
+        raise ValueError(f'categoria: debe ser una de {", ".join(CATEGORIAS_MATERIAL)}')
+    return {
+        'nombre_material': _texto(fila, 'nombre_material', 100),
+        'descripcion': _texto(fila, 'descripcion', 10000, obligatorio=False),
+        'categoria': categoria,
+        'subcategoria': _texto(fila, 'subcategoria', 50, obligatorio=False),
+        'precio_unitario': _importe(fila, 'precio_unitario'),
+        'precio_compra': _importe(fila, 'precio_compra', Decimal('0')),
+        'unidad_medida': _texto(fila, 'unidad_medida', 20, obligatorio=False) or 'unidad',
+        'stock_minimo': _entero(fila, 'stock_minimo', por_defecto=10),
+        'cantidad': _entero(fila, 'cantidad', por_defecto=0),
+        'ubicacion': _texto(fila, 'ubicacion', 100, obligatorio=False),
+    }
+
+
+def _validar_plano(fila):
+    return {
+        'id_plano': _entero(fila, 'id_plano', minimo=1),
+        'nombre_plano': _texto(fila, 'nombre_plano', 100),
+        'id_proyecto': _entero(fila, 'id_proyecto', minimo=1),
+        'id_tipo_plano': _entero(fila, 'id_tipo_plano', minimo=1),
+    }
+
+
+# Escritura por lotes. Cada lote es una lista de (número de línea, datos), se
+# escribe con una sentencia de varias filas por tabla y se confirma en su
+# propia transacción. Como no pasa por el unit of work del ORM, cada lote
+# actualiza él mismo las versiones de las tablas y los totales del dashboard.
+
+def _guardar_clientes(lote, resultado, id_usuario):
+    emails = [datos['email'] for _, datos in lote]
+    existentes = {email for (email,) in
+                  db.session.query(Cliente.email).filter(Cliente.email.in_(emails))}
+    nuevos = []
+    for numero, datos in lote:
+        if datos['email'] in existentes:
+            resultado.error(numero, f'email: ya existe un cliente con {datos["email"]}')
+            continue
+        existentes.add(datos['email'])
+        nuevos.append(datos)
+    if not nuevos:
+        return
+
+    conexion = db.session.connection()
+    conexion.execute(insert(Cliente.__table__), nuevos)
+    incrementar_versiones(conexion, {Cliente.__tablename__})
+    aplicar_deltas(conexion, {'total_clientes': len(nuevos)})
+    resultado.creados += len(nuevos)
+
+
+def _guardar_materiales(lote, resultado, id_usuario):
+    conexion = db.session.connection()
+    tabla = Material.__table__
+    ids_material = sorted(conexion.execute(
+        insert(tabla).returning(tabla.c.id_material),
+        [dict({campo: valor for campo, valor in datos.items() if campo not in ('cantidad', 'ubicacion')},
+              activo=True)
+         for _, datos in lote]
+    ).scalars())
+    incrementar_versiones(conexion, {Material.__tablename__})
+
+    # La existencia inicial entra como movimiento, igual que al crear un material
+    crear_inventarios([
+        {'id_material': id_material, 'cantidad': datos['cantidad'], 'ubicacion': datos['ubicacion']}
+        for id_material, (_, datos) in zip(ids_material, lote)
+    ], id_usuario)
+    resultado.creados += len(lote)
+
+
+def _guardar_planos(lote, resultado, id_usuario):
+    def existentes(columna, valores):
+        return {valor for (valor,) in db.session.query(columna).filter(columna.in_(valores))}
+
+    planos = existentes(Plano.id_plano, {datos['id_plano'] for _, datos in lote})
+    proyectos = existentes(Proyecto.id_proyecto, {datos['id_proyecto'] for _, datos in lote})
+    tipos = existentes(TipoPlano.id_tipo_plano, {datos['id_tipo_plano'] for _, datos in lote})
+
+    cambios = []
+    for numero, datos in lote:
+        if datos['id_plano'] not in planos:
+            resultado.error(numero, f'id_plano: no existe {datos["id_plano"]}')
+        elif datos['id_proyecto'] not in proyectos:
+            resultado.error(numero, f'id_proyecto: no existe {datos["id_proyecto"]}')
+        elif datos['id_tipo_plano'] not in tipos:
+            resultado.error(numero, f'id_tipo_plano: no existe {datos["id_tipo_plano"]}')
+        else:
+            cambios.append(datos)
+    if not cambios:
+        return
+
+    # UPDATE por clave primaria con varios juegos de parámetros (executemany);
+    # el archivo no cambia, así que no afecta a las referencias del almacén
+    db.session.execute(update(Plano), cambios)
+    incrementar_versiones(db.session.connection(), {Plano.__tablename__})
+    resultado.actualizados += len(cambios)
+
+
+# entidad: (columnas obligatorias en la cabecera, validación de fila, guardado de lote)
+IMPORTADORES = {
+    'clientes': (('nombre', 'apellido', 'email', 'telefono', 'direccion'),
+                 _validar_cliente, _guardar_clientes),
+    'materiales': (('nombre_material', 'precio_unitario'),
+                   _validar_material, _guardar_materiales),
+    'planos': (('id_plano', 'nombre_plano', 'id_proyecto', 'id_tipo_plano'),
+               _validar_plano, _guardar_planos),
+}
+
+
+def importar_csv(entidad, flujo, id_usuario, tamano_lote, max_errores):
+    """Importar un CSV (flujo binario en UTF-8) fila a fila y guardarlo por lotes.
+
+    Las filas no válidas se anotan con su número de línea y se omiten; el
+    resto se guarda. Clientes y materiales se crean siempre como registros
+    nuevos (los clientes con un email ya registrado se rechazan); los planos
+    solo actualizan el nombre, el proyecto y el tipo de planos existentes.
+    """
+    obligatorias, validar, guardar = IMPORTADORES[entidad]
+    texto = io.TextIOWrapper(flujo, encoding='utf-8-sig', newline='')
+    lector = csv.DictReader(texto)
+    resultado = ResultadoImportacion(max_errores)
+
+    def guardar_lote(lote):
+        try:
+            guardar(lote, resultado, id_usuario)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    try:
+        faltantes = [campo for campo in obligatorias if campo not in (lector.fieldnames or [])]
+        if faltantes:
+            raise ErrorImportacion(f'Faltan columnas en la cabecera: {", ".join(faltantes)}')
+
+        lote = []
+        try:
+            for fila in lector:
+                # line_num cuenta líneas físicas: apunta a la última línea de la fila
+                numero = lector.line_num
+                if None in fila or any(valor is None for valor in fila.values()):
+                    resultado.error(numero, 'número de columnas distinto al de la cabecera')
+                    continue
+                try:
+                    lote.append((numero, validar(fila)))
+                except ValueError as e:
+                    resultado.error(numero, str(e))
+                    continue
+                if len(lote) >= tamano_lote:
+                    guardar_lote(lote)
+                    lote = []
+        except (UnicodeDecodeError, csv.Error) as e:
+            # Se guardan las filas leídas hasta el error y se deja de leer
+            motivo = 'no está en UTF-8' if isinstance(e, UnicodeDecodeError) else str(e)
+            resultado.error(lector.line_num + 1, f'importación interrumpida, el archivo {motivo}')
+        if lote:
+            guardar_lote(lote)
+    except UnicodeDecodeError:
+        raise ErrorImportacion('El archivo no está codificado en UTF-8')
+    except csv.Error as e:
+        raise ErrorImportacion(f'La cabecera del CSV no es válida: {e}')
+    finally:
+        # No cerrar el flujo subyacente, que pertenece a la petición
+        texto.detach()
+    return resultado
@@ -0,0 +1,233 @@
+import glob
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# Límites (en segundos) de las cubetas del histograma de duración, como los de Prometheus
+CUBETAS_DURACION = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_AYUDA = {
+    'asplot_peticiones_total': ('counter', 'Peticiones atendidas por ruta, método y código de estado'),
+    'asplot_peticion_duracion_segundos': ('histogram', 'Tiempo hasta tener la respuesta, por ruta'),
+    'asplot_respuesta_bytes': ('summary', 'Tamaño de las respuestas con longitud conocida, por ruta'),
+    'asplot_sql_sentencias_total': ('counter', 'Sentencias SQL ejecutadas por las peticiones de cada ruta'),
+    'asplot_sql_segundos_total': ('counter', 'Tiempo dentro de la base de datos de cada ruta'),
+}
+
+
+def _datos_vacios():
+    return {'peticiones': {}, 'duracion': {}, 'bytes': {}, 'sql': {}}
+
+
+def _fusionar(destino, origen):
+    """Sumar las métricas de `origen` a `destino` (misma estructura que _datos_vacios)"""
+    for clave, cantidad in origen['peticiones'].items():
+        destino['peticiones'][clave] = destino['peticiones'].get(clave, 0) + cantidad
+    for endpoint, (cubetas, suma) in origen['duracion'].items():
+        actual = destino['duracion'].setdefault(endpoint, [[0] * (len(CUBETAS_DURACION) + 1), 0.0])
+        actual[0] = [a + b for a, b in zip(actual[0], cubetas)]
+        actual[1] += suma
+    for seccion in ('bytes', 'sql'):
+        for endpoint, (primero, segundo) in origen[seccion].items():
+            actual = destino[seccion].setdefault(endpoint, [0, 0])
+            actual[0] += primero
+            actual[1] += segundo
+    return destino
+
+
+class Metricas:
+    """Métricas por ruta del proceso actual, volcadas a disco para sumarlas entre procesos.
+
+    Registrar una petición solo toma un cerrojo y suma unos enteros. Cada
+    `intervalo` segundos el proceso escribe su copia en
+    <carpeta>/<máquina>-<pid>.json; quien sirve /metricas suma todas las de
+    la carpeta, así se ven los totales de todos los trabajadores de gunicorn
+    sin ningún servicio externo.
+    """
+
+    def __init__(self, carpeta, intervalo):
+        self.carpeta = carpeta
+        self.intervalo = intervalo
+        self._datos = _datos_vacios()
+        self._cerrojo = threading.Lock()
+        self._ultimo_volcado = 0.0
+        self._prefijo = f'{socket.gethostname()}-'
+
+    def registrar(self, endpoint, metodo, estado, segundos, tamano, sentencias, segundos_sql):
+        clave = f'{endpoint}|{metodo}|{estado}'
+        cubeta = next((i for i, limite in enumerate(CUBETAS_DURACION) if segundos <= limite),
+                      len(CUBETAS_DURACION))
+        with self._cerrojo:
+            datos = self._datos
+            datos['peticiones'][clave] = datos['peticiones'].get(clave, 0) + 1
+            duracion = datos['duracion'].setdefault(endpoint, [[0] * (len(CUBETAS_DURACION) + 1), 0.0])
+            duracion[0][cubeta] += 1
+            duracion[1] += segundos
+            if tamano is not None:
+                bytes_ruta = datos['bytes'].setdefault(endpoint, [0, 0])
+                bytes_ruta[0] += tamano
+                bytes_ruta[1] += 1
+            sql = datos['sql'].setdefault(endpoint, [0, 0.0])
+            sql[0] += sentencias
+            sql[1] += segundos_sql
+            volcar = time.monotonic() - self._ultimo_volcado >= self.intervalo
+        if volcar:
+            self.volcar()
+
+    def _ruta_propia(self):
+        return os.path.join(self.carpeta, f'{self._prefijo}{os.getpid()}.json')
+
+    def volcar(self):
+        """Escribir de forma atómica la copia de este proceso"""
+        with self._cerrojo:
+            contenido = json.dumps(self._datos)
+            self._ultimo_volcado = time.monotonic()
+        os.makedirs(self.carpeta, exist_ok=True)
+        descriptor, temporal = tempfile.mkstemp(dir=self.carpeta, suffix='.tmp')
+        with os.fdopen(descriptor, 'w') as destino:
+            destino.write(contenido)
+        os.replace(temporal, self._ruta_propia())
+
+    def _adoptar_terminados(self):
+        """Sumar a este proceso los contadores de los trabajadores ya terminados de esta máquina.
+
+        gunicorn recicla trabajadores; sin esto sus archivos se acumularían y,
+        si se borraran, los contadores retrocederían. Renombrar el archivo es
+        atómico, así que solo un proceso lo adopta.
+        """
+        for ruta in glob.glob(os.path.join(self.carpeta, f'{self._prefijo}*.json')):
+            pid = os.path.basename(ruta)[len(self._prefijo):-len('.json')]
+            if not pid.isdigit() or int(pid) == os.getpid() or _proceso_vivo(int(pid)):
+                continue
+            reclamado = f'{ruta}.{os.getpid()}.adoptando'
+            try:
+                os.rename(ruta, reclamado)
+            except FileNotFoundError:
+                continue  # otro proceso lo adoptó primero
+            with open(reclamado, encoding='utf-8') as origen:
+                datos = json.load(origen)
+            with self._cerrojo:
+                _fusionar(self._datos, datos)
+            os.remove(reclamado)
+
+    def totales(self):
+        """Suma de las métricas de todos los procesos que comparten la carpeta"""
+        self._adoptar_terminados()
+        self.volcar()
+        total = _datos_vacios()
+        for ruta in glob.glob(os.path.join(self.carpeta, '*.json')):
+            try:
+                with open(ruta, encoding='utf-8') as origen:
+                    _fusionar(total, json.load(origen))
+            except (FileNotFoundError, ValueError):
+                continue  # reemplazado o adoptado mientras se leía
+        return total
+
+
+def _proceso_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _etiquetas(**valores):
+    partes = []
+    for nombre, valor in valores.items():
+        valor = str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        partes.append(f'{nombre}="{valor}"')
+    return '{' + ','.join(partes) + '}'
+
+
+def formato_prometheus(datos):
+    """Texto de exposición de Prometheus (versión 0.0.4) de unas métricas sumadas"""
+    lineas = defaultdict(list)
+    for clave, cantidad in sorted(datos['peticiones'].items()):
+        endpoint, metodo, estado = clave.split('|')
+        lineas['asplot_peticiones_total'].append(
+            f'asplot_peticiones_total{_etiquetas(endpoint=endpoint, metodo=metodo, estado=estado)} {cantidad}')
+    for endpoint, (cubetas, suma) in sorted(datos['duracion'].items()):
+        acumulado = 0
+        for limite, cantidad in zip(CUBETAS_DURACION + ('+Inf',), cubetas):
+            acumulado += cantidad
+            lineas['asplot_peticion_duracion_segundos'].append(
+                f'asplot_peticion_duracion_segundos_bucket{_etiquetas(endpoint=endpoint, le=limite)} {acumulado}')
+        lineas['asplot_peticion_duracion_segundos'] += [
+            f'asplot_peticion_duracion_segundos_sum{_etiquetas(endpoint=endpoint)} {suma:.6f}',
+            f'asplot_peticion_duracion_segundos_count{_etiquetas(endpoint=endpoint)} {acumulado}',
+        ]
+    for endpoint, (suma, cuenta) in sorted(datos['bytes'].items()):
+        lineas['asplot_respuesta_bytes'] += [
+            f'asplot_respuesta_bytes_sum{_etiquetas(endpoint=endpoint)} {suma}',
+            f'asplot_respuesta_bytes_count{_etiquetas(endpoint=endpoint)} {cuenta}',
+        ]
+    for endpoint, (sentencias, segundos) in sorted(datos['sql'].items()):
+        lineas['asplot_sql_sentencias_total'].append(
+            f'asplot_sql_sentencias_total{_etiquetas(endpoint=endpoint)} {sentencias}')
+        lineas['asplot_sql_segundos_total'].append(
+            f'asplot_sql_segundos_total{_etiquetas(endpoint=endpoint)} {segundos:.6f}')
+
+    salida = []
+    for nombre, (tipo, ayuda) in _AYUDA.items():
+        salida += [f'# HELP {nombre} {ayuda}', f'# TYPE {nombre} {tipo}'] + lineas[nombre]
+    return '\n'.join(salida) + '\n'
+
+
+def _inicio_sentencia(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metricas_inicio = time.perf_counter()
+
+
+def _fin_sentencia(conn, cursor, statement, parameters, context, executemany):
+    inicio = getattr(context, '_metricas_inicio', None)
+    if inicio is not None and has_request_context():
+        g.sql_segundos = g.get('sql_segundos', 0.0) + time.perf_counter() - inicio
+
+
+def init_metricas(app):
+    """Medir cada petición y el tiempo de sus sentencias SQL.
+
+    El número de sentencias lo cuenta ya consultas.py (g.consultas_sql), así
+    que debe registrarse después de init_presupuesto_consultas.
+    """
+    metricas = Metricas(app.config['CARPETA_METRICAS'], app.config['METRICAS_VOLCADO_SEGUNDOS'])
+    app.extensions['metricas'] = metricas
+
+    if not event.contains(Engine, 'before_cursor_execute', _inicio_sentencia):
+        event.listen(Engine, 'before_cursor_execute', _inicio_sentencia)
+        event.listen(Engine, 'after_cursor_execute', _fin_sentencia)
+
+    @app.before_request
+    def iniciar_medicion():
+        g.metricas_inicio = time.perf_counter()
+        g.sql_segundos = 0.0
+
+    @app.after_request
+    def registrar_medicion(response):
+        inicio = g.pop('metricas_inicio', None)
+        if inicio is not None:
+            # calculate_content_length() convertiría en lista una respuesta en streaming
+            # (exportaciones, SSE) y la retendría entera en memoria; en esas se usa la cabecera
+            tamano = response.calculate_content_length() if response.is_sequence else response.content_length
+            metricas.registrar(
+                request.url_rule.endpoint if request.url_rule else 'sin_ruta',
+                request.method,
+                response.status_code,
+                time.perf_counter() - inicio,
+                tamano,
+                g.get('consultas_sql', 0),
+                g.get('sql_segundos', 0.0)
+            )
+        return response
@@ -0,0 +1,117 @@
+from datetime import datetime
+
+from sqlalchemy import inspect, update
+
+from models import db, MigracionEsquema, VersionTabla
+from movimientos import movimientos_iniciales
+from stock_bajo import reconstruir_stock_bajo
+
+
+# db.create_all() solo crea tablas nuevas: los cambios sobre tablas existentes
+# (índices, columnas) se aplican con migraciones numeradas que se registran en
+# migraciones_esquema y se ejecutan una sola vez con `flask migrar`.
+
+
+def _crear_indices(*nombres):
+    """Migración que crea los índices declarados en models.py con esos nombres"""
+    def aplicar(conexion):
+        existentes = set()
+        for tabla in db.metadata.sorted_tables:
+            for indice in tabla.indexes:
+                if indice.name in nombres:
+                    indice.create(conexion, checkfirst=True)
+                    existentes.add(indice.name)
+        faltantes = set(nombres) - existentes
+        if faltantes:
+            raise LookupError(f'Índices no declarados en models.py: {", ".join(sorted(faltantes))}')
+    return aplicar
+
+
+def _agregar_columnas(modelo, *nombres):
+    """Añadir a la tabla ya creada de `modelo` las columnas de models.py que aún no tenga"""
+    def aplicar(conexion):
+        tabla = modelo.__table__
+        existentes = {columna['name'] for columna in inspect(conexion).get_columns(tabla.name)}
+        for nombre in nombres:
+            if nombre not in existentes:
+                tipo = tabla.c[nombre].type.compile(dialect=conexion.dialect)
+                conexion.exec_driver_sql(f'ALTER TABLE {tabla.name} ADD COLUMN {nombre} {tipo}')
+    return aplicar
+
+
+def _fecha_versiones(conexion):
+    _agregar_columnas(VersionTabla, 'fecha_actualizacion')(conexion)
+    tabla = VersionTabla.__table__
+    conexion.execute(update(tabla).where(tabla.c.fecha_actualizacion.is_(None))
+                     .values(fecha_actualizacion=datetime.utcnow()))
+
+
+# (versión, descripción, función que recibe la conexión). Nunca se reordenan ni
+# se editan las ya publicadas: cada cambio nuevo es una versión nueva.
+MIGRACIONES = [
+    (1, 'Índices de claves foráneas, fechas, estados y parciales sobre activo',
+     _crear_indices(
+         'ix_usuarios_activos_rol',
+         'ix_proyectos_id_cliente', 'ix_proyectos_estado', 'ix_proyectos_fecha_inicio',
+         'ix_proyectos_nombre_proyecto',
+         'ix_planos_id_proyecto', 'ix_planos_id_tipo_plano', 'ix_planos_id_usuario',
+         'ix_planos_fecha_subida',
+         'ix_materiales_activos', 'ix_materiales_activos_categoria',
+         'ix_inventario_id_material',
+         'ix_ventas_fecha_venta', 'ix_ventas_estado_fecha_venta', 'ix_ventas_id_cliente',
+         'ix_ventas_id_usuario',
+         'ix_detalle_ventas_id_venta', 'ix_detalle_ventas_id_plano',
+         'ix_detalle_ventas_id_material',
+     )),
+    (2, 'Historial de movimientos e instantáneas de inventario',
+     movimientos_iniciales),
+    (3, 'Conjunto de inventarios con stock bajo y sus eventos',
+     reconstruir_stock_bajo),
+    (4, 'Fecha de la última escritura en versiones_tablas',
+     _fecha_versiones),
+]
+
+
+def versiones_aplicadas():
+    if not inspect(db.engine).has_table(MigracionEsquema.__tablename__):
+        return set()
+    return {version for (version,) in db.session.query(MigracionEsquema.version)}
+
+
+def migraciones_pendientes():
+    aplicadas = versiones_aplicadas()
+    return [migracion for migracion in MIGRACIONES if migracion[0] not in aplicadas]
+
+
+def aplicar_migraciones():
+    """Aplicar en orden las migraciones pendientes, cada una en su propia transacción"""
+    MigracionEsquema.__table__.create(db.engine, checkfirst=True)
+    aplicadas = []
+    for version, descripcion, aplicar in migraciones_pendientes():
+        with db.engine.begin() as conexion:
+            aplicar(conexion)
+            conexion.execute(MigracionEsquema.__table__.insert().values(
+                version=version, descripcion=descripcion, fecha_aplicacion=datetime.utcnow()
+            ))
+        aplicadas.append((version, descripcion))
+    return aplicadas
+
+
+def init_migraciones(app):
+    """Registrar los comandos de migración: `flask migrar` y `flask estado-migraciones`"""
+    @app.cli.command('migrar')
+    def migrar_comando():
+        """Aplicar las migraciones de esquema pendientes"""
+        aplicadas = aplicar_migraciones()
+        for version, descripcion in aplicadas:
+            print(f'✅ Migración {version}: {descripcion}')
+        if not aplicadas:
+            print('✅ El esquema ya está al día')
+
+    @app.cli.command('estado-migraciones')
+    def estado_migraciones_comando():
+        """Listar las migraciones y si están aplicadas"""
+        aplicadas = versiones_aplicadas()
+        for version, descripcion, _aplicar in MIGRACIONES:
+            marca = '✅' if version in aplicadas else '⏳'
+            print(f'{marca} {version}: {descripcion}')
@@ -1,222 +1,399 @@
-from flask_sqlalchemy import SQLAlchemy
-from flask_login import UserMixin
-from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
-
-db = SQLAlchemy()
-
-class Usuario(UserMixin, db.Model):
-    """Modelo para la tabla Usuarios"""
-    __tablename__ = 'usuarios'
-    
-    id_usuario = db.Column(db.Integer, primary_key=True)
-    nombre_usuario = db.Column(db.String(50), unique=True, nullable=False)
-    contraseña = db.Column(db.String(255), nullable=False)
-    email = db.Column(db.String(100), unique=True, nullable=False)
-    # Roles: 'administrador', 'laboral', 'cliente'
-    rol = db.Column(db.String(20), default='laboral', nullable=False)
-    nombre_completo = db.Column(db.String(100))
-    telefono = db.Column(db.String(20))
-    direccion = db.Column(db.Text)
-    activo = db.Column(db.Boolean, default=True)
-    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
-    
-    # Relaciones
-    planos = db.relationship('Plano', backref='usuario', lazy=True)
-    ventas = db.relationship('Venta', backref='usuario', lazy=True)
-    
-    # Método requerido por Flask-Login para obtener el ID
-    def get_id(self):
-        return str(self.id_usuario)
-    
-    def set_password(self, password):
-        """Encriptar contraseña"""
-        self.contraseña = generate_password_hash(password)
-    
-    def check_password(self, password):
-        """Verificar contraseña"""
-        return check_password_hash(self.contraseña, password)
-    
-    @property
-    def es_administrador(self):
-        return self.rol == 'administrador'
-    
-    @property
-    def es_laboral(self):
-        return self.rol == 'laboral'
-    
-    @property
-    def es_cliente(self):
-        return self.rol == 'cliente'
-    
-    def __repr__(self):
-        return f'<Usuario {self.nombre_usuario}>'
-
-class Cliente(db.Model):
-    """Modelo para la tabla Clientes"""
-    __tablename__ = 'clientes'
-    
-    id_cliente = db.Column(db.Integer, primary_key=True)
-    nombre = db.Column(db.String(50), nullable=False)
-    apellido = db.Column(db.String(50), nullable=False)
-    email = db.Column(db.String(100), unique=True, nullable=False)
-    telefono = db.Column(db.String(20), nullable=False)
-    direccion = db.Column(db.Text, nullable=False)
-    
-    # Relaciones
-    proyectos = db.relationship('Proyecto', backref='cliente', lazy=True)
-    ventas = db.relationship('Venta', backref='cliente', lazy=True)
-    
-    @property
-    def nombre_completo(self):
-        return f"{self.nombre} {self.apellido}"
-    
-    def __repr__(self):
-        return f'<Cliente {self.nombre_completo}>'
-
-class Proyecto(db.Model):
-    """Modelo para la tabla Proyectos"""
-    __tablename__ = 'proyectos'
-    
-    id_proyecto = db.Column(db.Integer, primary_key=True)
-    id_cliente = db.Column(db.Integer, db.ForeignKey('clientes.id_cliente'), nullable=False)
-    nombre_proyecto = db.Column(db.String(100), nullable=False)
-    descripcion = db.Column(db.Text, nullable=False)
-    fecha_inicio = db.Column(db.Date, nullable=False)
-    fecha_fin = db.Column(db.Date, nullable=False)
-    estado = db.Column(db.String(20), default='planificacion')
-    
-    # Relaciones
-    planos = db.relationship('Plano', backref='proyecto', lazy=True)
-    
-    def __repr__(self):
-        return f'<Proyecto {self.nombre_proyecto}>'
-
-class TipoPlano(db.Model):
-    """Modelo para la tabla Tipos_Plano"""
-    __tablename__ = 'tipos_plano'
-    
-    id_tipo_plano = db.Column(db.Integer, primary_key=True)
-    nombre_tipo = db.Column(db.String(50), nullable=False)
-    descripcion = db.Column(db.Text)
-    
-    # Relaciones
-    planos = db.relationship('Plano', backref='tipo_plano', lazy=True)
-    
-    def __repr__(self):
-        return f'<TipoPlano {self.nombre_tipo}>'
-
-class Plano(db.Model):
-    """Modelo para la tabla Planos"""
-    __tablename__ = 'planos'
-    
-    id_plano = db.Column(db.Integer, primary_key=True)
-    id_proyecto = db.Column(db.Integer, db.ForeignKey('proyectos.id_proyecto'), nullable=False)
-    id_tipo_plano = db.Column(db.Integer, db.ForeignKey('tipos_plano.id_tipo_plano'), nullable=False)
-    id_usuario = db.Column(db.Integer, db.ForeignKey('usuarios.id_usuario'), nullable=False)
-    nombre_plano = db.Column(db.String(100), nullable=False)
-    archivo = db.Column(db.String(255), nullable=False)
-    fecha_subida = db.Column(db.DateTime, default=datetime.utcnow)
-    
-    # Relaciones
-    detalle_ventas = db.relationship('DetalleVenta', backref='plano', lazy=True)
-    
-    def __repr__(self):
-        return f'<Plano {self.nombre_plano}>'
-
-class Material(db.Model):
-    """Modelo para la tabla Materiales"""
-    __tablename__ = 'materiales'
-    
-    id_material = db.Column(db.Integer, primary_key=True)
-    nombre_material = db.Column(db.String(100), nullable=False)
-    descripcion = db.Column(db.Text)
-    # Categorías: 'papel', 'tinta', 'herramienta', 'otro'
-    categoria = db.Column(db.String(50), default='otro')
-    # Subcategoría para papeles: 'A0', 'A1', 'A2', 'A3', 'A4'
-    # Subcategoría para tintas: 'negro', 'color', 'cyan', 'magenta', 'amarillo'
-    subcategoria = db.Column(db.String(50))
-    precio_unitario = db.Column(db.Numeric(10, 2), nullable=False)
-    precio_compra = db.Column(db.Numeric(10, 2), default=0.0)
-    unidad_medida = db.Column(db.String(20), default='unidad')
-    stock_minimo = db.Column(db.Integer, default=10)
-    activo = db.Column(db.Boolean, default=True)
-    
-    # Relaciones
-    inventarios = db.relationship('Inventario', backref='material', lazy=True)
-    detalle_ventas = db.relationship('DetalleVenta', backref='material', lazy=True)
-    
-    def __repr__(self):
-        return f'<Material {self.nombre_material}>'
-
-class Inventario(db.Model):
-    """Modelo para la tabla Inventario"""
-    __tablename__ = 'inventario'
-    
-    id_inventario = db.Column(db.Integer, primary_key=True)
-    id_material = db.Column(db.Integer, db.ForeignKey('materiales.id_material'), nullable=False)
-    cantidad = db.Column(db.Integer, nullable=False, default=0)
-    fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    ubicacion = db.Column(db.String(100))
-    
-    @property
-    def necesita_reposicion(self):
-        """Verifica si el inventario está por debajo del stock mínimo"""
-        return self.cantidad <= self.material.stock_minimo
-    
-    @property
-    def valor_total(self):
-        """Calcula el valor total del inventario"""
-        return float(self.cantidad * self.material.precio_unitario)
-    
-    def __repr__(self):
-        return f'<Inventario {self.material.nombre_material}: {self.cantidad}>'
-
-class Venta(db.Model):
-    """Modelo para la tabla Ventas"""
-    __tablename__ = 'ventas'
-    
-    id_venta = db.Column(db.Integer, primary_key=True)
-    id_cliente = db.Column(db.Integer, db.ForeignKey('clientes.id_cliente'), nullable=False)
-    id_usuario = db.Column(db.Integer, db.ForeignKey('usuarios.id_usuario'), nullable=False)
-    fecha_venta = db.Column(db.DateTime, default=datetime.utcnow)
-    subtotal = db.Column(db.Numeric(10, 2), default=0.0)
-    impuesto = db.Column(db.Numeric(10, 2), default=0.0)
-    descuento = db.Column(db.Numeric(10, 2), default=0.0)
-    total = db.Column(db.Numeric(10, 2), nullable=False)
-    estado = db.Column(db.String(20), default='completada')  # completada, pendiente, cancelada
-    metodo_pago = db.Column(db.String(50))  # efectivo, tarjeta, transferencia
-    notas = db.Column(db.Text)
-    
-    # Relaciones
-    detalle_ventas = db.relationship('DetalleVenta', backref='venta', lazy=True, cascade='all, delete-orphan')
-    
-    def calcular_total(self):
-        """Calcula el total de la venta basado en los detalles"""
-        self.subtotal = sum(detalle.subtotal for detalle in self.detalle_ventas)
-        self.total = float(self.subtotal + self.impuesto - self.descuento)
-        return self.total
-    
-    def __repr__(self):
-        return f'<Venta {self.id_venta}>'
-
-class DetalleVenta(db.Model):
-    """Modelo para la tabla Detalle_Ventas"""
-    __tablename__ = 'detalle_ventas'
-    
-    id_detalle_venta = db.Column(db.Integer, primary_key=True)
-    id_venta = db.Column(db.Integer, db.ForeignKey('ventas.id_venta'), nullable=False)
-    id_plano = db.Column(db.Integer, db.ForeignKey('planos.id_plano'), nullable=True)
-    id_material = db.Column(db.Integer, db.ForeignKey('materiales.id_material'), nullable=True)
-    descripcion = db.Column(db.String(200))
-    cantidad = db.Column(db.Integer, nullable=False)
-    precio_unitario = db.Column(db.Numeric(10, 2), nullable=False)
-    descuento = db.Column(db.Numeric(10, 2), default=0.0)
-    
-    @property
-    def subtotal(self):
-        """Calcula el subtotal del detalle"""
-        return float(self.cantidad * self.precio_unitario - self.descuento)
-    
-    def __repr__(self):
-        return f'<DetalleVenta {self.id_detalle_venta}>'
\ No newline at end of file
+from flask_sqlalchemy import SQLAlchemy
+from flask_login import UserMixin
+from datetime import datetime
+from werkzeug.security import check_password_hash
+from contrasenas import generar_hash
+
+db = SQLAlchemy()
+
+class RolesUsuario:
+    """Consultas de rol comunes al modelo y a su copia en caché (cache_usuarios.UsuarioSesion)"""
+    
+    @property
+    def es_administrador(self):
+        return self.rol == 'administrador'
+    
+    @property
+    def es_laboral(self):
+        return self.rol == 'laboral'
+    
+    @property
+    def es_cliente(self):
+        return self.rol == 'cliente'
+
+class Usuario(RolesUsuario, UserMixin, db.Model):
+    """Modelo para la tabla Usuarios"""
+    __tablename__ = 'usuarios'
+    __table_args__ = (
+        # Listado de usuarios: solo activos, filtrado por rol y paginado por id
+        db.Index('ix_usuarios_activos_rol', 'rol', 'id_usuario',
+                 sqlite_where=db.text('activo = 1'), postgresql_where=db.text('activo')),
+    )
+    
+    id_usuario = db.Column(db.Integer, primary_key=True)
+    nombre_usuario = db.Column(db.String(50), unique=True, nullable=False)
+    contraseña = db.Column(db.String(255), nullable=False)
+    email = db.Column(db.String(100), unique=True, nullable=False)
+    # Roles: 'administrador', 'laboral', 'cliente'
+    rol = db.Column(db.String(20), default='laboral', nullable=False)
+    nombre_completo = db.Column(db.String(100))
+    telefono = db.Column(db.String(20))
+    direccion = db.Column(db.Text)
+    activo = db.Column(db.Boolean, default=True)
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Relaciones
+    planos = db.relationship('Plano', backref='usuario', lazy=True)
+    ventas = db.relationship('Venta', backref='usuario', lazy=True)
+    
+    # Método requerido por Flask-Login para obtener el ID
+    def get_id(self):
+        return str(self.id_usuario)
+    
+    def set_password(self, password):
+        """Encriptar contraseña con el método y coste de HASH_CONTRASENAS"""
+        self.contraseña = generar_hash(password)
+    
+    def check_password(self, password):
+        """Verificar contraseña"""
+        return check_password_hash(self.contraseña, password)
+    
+    def __repr__(self):
+        return f'<Usuario {self.nombre_usuario}>'
+
+class Cliente(db.Model):
+    """Modelo para la tabla Clientes"""
+    __tablename__ = 'clientes'
+    
+    id_cliente = db.Column(db.Integer, primary_key=True)
+    nombre = db.Column(db.String(50), nullable=False)
+    apellido = db.Column(db.String(50), nullable=False)
+    email = db.Column(db.String(100), unique=True, nullable=False)
+    telefono = db.Column(db.String(20), nullable=False)
+    direccion = db.Column(db.Text, nullable=False)
+    
+    # Relaciones
+    proyectos = db.relationship('Proyecto', backref='cliente', lazy=True)
+    ventas = db.relationship('Venta', backref='cliente', lazy=True)
+    
+    @property
+    def nombre_completo(self):
+        return f"{self.nombre} {self.apellido}"
+    
+    def __repr__(self):
+        return f'<Cliente {self.nombre_completo}>'
+
+class Proyecto(db.Model):
+    """Modelo para la tabla Proyectos"""
+    __tablename__ = 'proyectos'
+    __table_args__ = (
+        db.Index('ix_proyectos_id_cliente', 'id_cliente'),
+        # Filtro por estado paginado por id
+        db.Index('ix_proyectos_estado', 'estado', 'id_proyecto'),
+        # Proyectos recientes del dashboard
+        db.Index('ix_proyectos_fecha_inicio', 'fecha_inicio'),
+        # Lista de proyectos de la búsqueda avanzada de planos
+        db.Index('ix_proyectos_nombre_proyecto', 'nombre_proyecto'),
+    )
+    
+    id_proyecto = db.Column(db.Integer, primary_key=True)
+    id_cliente = db.Column(db.Integer, db.ForeignKey('clientes.id_cliente'), nullable=False)
+    nombre_proyecto = db.Column(db.String(100), nullable=False)
+    descripcion = db.Column(db.Text, nullable=False)
+    fecha_inicio = db.Column(db.Date, nullable=False)
+    fecha_fin = db.Column(db.Date, nullable=False)
+    estado = db.Column(db.String(20), default='planificacion')
+    
+    # Relaciones
+    planos = db.relationship('Plano', backref='proyecto', lazy=True)
+    
+    def __repr__(self):
+        return f'<Proyecto {self.nombre_proyecto}>'
+
+class TipoPlano(db.Model):
+    """Modelo para la tabla Tipos_Plano"""
+    __tablename__ = 'tipos_plano'
+    
+    id_tipo_plano = db.Column(db.Integer, primary_key=True)
+    nombre_tipo = db.Column(db.String(50), nullable=False)
+    descripcion = db.Column(db.Text)
+    
+    # Relaciones
+    planos = db.relationship('Plano', backref='tipo_plano', lazy=True)
+    
+    def __repr__(self):
+        return f'<TipoPlano {self.nombre_tipo}>'
+
+class Plano(db.Model):
+    """Modelo para la tabla Planos"""
+    __tablename__ = 'planos'
+    __table_args__ = (
+        # Join con proyectos y filtro por proyecto paginado por id
+        db.Index('ix_planos_id_proyecto', 'id_proyecto', 'id_plano'),
+        # Filtro por tipo paginado por id
+        db.Index('ix_planos_id_tipo_plano', 'id_tipo_plano', 'id_plano'),
+        db.Index('ix_planos_id_usuario', 'id_usuario'),
+        # Rango de fechas de la búsqueda avanzada
+        db.Index('ix_planos_fecha_subida', 'fecha_subida'),
+    )
+    
+    id_plano = db.Column(db.Integer, primary_key=True)
+    id_proyecto = db.Column(db.Integer, db.ForeignKey('proyectos.id_proyecto'), nullable=False)
+    id_tipo_plano = db.Column(db.Integer, db.ForeignKey('tipos_plano.id_tipo_plano'), nullable=False)
+    id_usuario = db.Column(db.Integer, db.ForeignKey('usuarios.id_usuario'), nullable=False)
+    nombre_plano = db.Column(db.String(100), nullable=False)
+    archivo = db.Column(db.String(255), nullable=False)
+    fecha_subida = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Relaciones
+    detalle_ventas = db.relationship('DetalleVenta', backref='plano', lazy=True)
+    
+    def __repr__(self):
+        return f'<Plano {self.nombre_plano}>'
+
+class Material(db.Model):
+    """Modelo para la tabla Materiales"""
+    __tablename__ = 'materiales'
+    __table_args__ = (
+        # Listado de materiales: solo activos, por categoría y paginado por id
+        db.Index('ix_materiales_activos', 'id_material',
+                 sqlite_where=db.text('activo = 1'), postgresql_where=db.text('activo')),
+        db.Index('ix_materiales_activos_categoria', 'categoria', 'id_material',
+                 sqlite_where=db.text('activo = 1'), postgresql_where=db.text('activo')),
+    )
+    
+    id_material = db.Column(db.Integer, primary_key=True)
+    nombre_material = db.Column(db.String(100), nullable=False)
+    descripcion = db.Column(db.Text)
+    # Categorías: 'papel', 'tinta', 'herramienta', 'otro'
+    categoria = db.Column(db.String(50), default='otro')
+    # Subcategoría para papeles: 'A0', 'A1', 'A2', 'A3', 'A4'
+    # Subcategoría para tintas: 'negro', 'color', 'cyan', 'magenta', 'amarillo'
+    subcategoria = db.Column(db.String(50))
+    precio_unitario = db.Column(db.Numeric(10, 2), nullable=False)
+    precio_compra = db.Column(db.Numeric(10, 2), default=0.0)
+    unidad_medida = db.Column(db.String(20), default='unidad')
+    stock_minimo = db.Column(db.Integer, default=10)
+    activo = db.Column(db.Boolean, default=True)
+    
+    # Relaciones
+    inventarios = db.relationship('Inventario', backref='material', lazy=True)
+    detalle_ventas = db.relationship('DetalleVenta', backref='material', lazy=True)
+    
+    def __repr__(self):
+        return f'<Material {self.nombre_material}>'
+
+class Inventario(db.Model):
+    """Modelo para la tabla Inventario"""
+    __tablename__ = 'inventario'
+    __table_args__ = (
+        db.Index('ix_inventario_id_material', 'id_material'),
+    )
+    
+    id_inventario = db.Column(db.Integer, primary_key=True)
+    id_material = db.Column(db.Integer, db.ForeignKey('materiales.id_material'), nullable=False)
+    cantidad = db.Column(db.Integer, nullable=False, default=0)
+    fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    ubicacion = db.Column(db.String(100))
+    
+    @property
+    def necesita_reposicion(self):
+        """Verifica si el inventario está por debajo del stock mínimo"""
+        return self.cantidad <= self.material.stock_minimo
+    
+    @property
+    def valor_total(self):
+        """Calcula el valor total del inventario"""
+        return float(self.cantidad * self.material.precio_unitario)
+    
+    def __repr__(self):
+        return f'<Inventario {self.material.nombre_material}: {self.cantidad}>'
+
+class StockBajo(db.Model):
+    """Inventarios en o por debajo del stock mínimo de su material activo (ver stock_bajo.py)"""
+    __tablename__ = 'stock_bajo'
+    
+    id_inventario = db.Column(db.Integer, db.ForeignKey('inventario.id_inventario'), primary_key=True)
+    # Valores con los que entró en el conjunto o cambió por última vez
+    cantidad = db.Column(db.Integer, nullable=False)
+    stock_minimo = db.Column(db.Integer, nullable=False)
+    desde = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<StockBajo {self.id_inventario}: {self.cantidad}/{self.stock_minimo}>'
+
+class EventoStock(db.Model):
+    """Entradas ('bajo'), cambios y salidas ('repuesto') del conjunto de stock bajo"""
+    __tablename__ = 'eventos_stock'
+    
+    id_evento = db.Column(db.Integer, primary_key=True)
+    id_inventario = db.Column(db.Integer, db.ForeignKey('inventario.id_inventario'), nullable=False)
+    tipo = db.Column(db.String(20), nullable=False)  # bajo, cambio, repuesto
+    cantidad = db.Column(db.Integer, nullable=False)
+    stock_minimo = db.Column(db.Integer, nullable=False)
+    fecha = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<EventoStock {self.id_evento}: {self.tipo} {self.id_inventario}>'
+
+class Venta(db.Model):
+    """Modelo para la tabla Ventas"""
+    __tablename__ = 'ventas'
+    __table_args__ = (
+        # Listado paginado por (fecha_venta, id_venta) descendente y ventas recientes
+        db.Index('ix_ventas_fecha_venta', 'fecha_venta', 'id_venta'),
+        # Filtro por estado con el mismo orden
+        db.Index('ix_ventas_estado_fecha_venta', 'estado', 'fecha_venta', 'id_venta'),
+        db.Index('ix_ventas_id_cliente', 'id_cliente'),
+        db.Index('ix_ventas_id_usuario', 'id_usuario'),
+    )
+    
+    id_venta = db.Column(db.Integer, primary_key=True)
+    id_cliente = db.Column(db.Integer, db.ForeignKey('clientes.id_cliente'), nullable=False)
+    id_usuario = db.Column(db.Integer, db.ForeignKey('usuarios.id_usuario'), nullable=False)
+    fecha_venta = db.Column(db.DateTime, default=datetime.utcnow)
+    subtotal = db.Column(db.Numeric(10, 2), default=0.0)
+    impuesto = db.Column(db.Numeric(10, 2), default=0.0)
+    descuento = db.Column(db.Numeric(10, 2), default=0.0)
+    total = db.Column(db.Numeric(10, 2), nullable=False)
+    estado = db.Column(db.String(20), default='completada')  # completada, pendiente, cancelada
+    metodo_pago = db.Column(db.String(50))  # efectivo, tarjeta, transferencia
+    notas = db.Column(db.Text)
+    
+    # Relaciones
+    detalle_ventas = db.relationship('DetalleVenta', backref='venta', lazy=True, cascade='all, delete-orphan')
+    
+    def calcular_total(self):
+        """Calcula el total de la venta basado en los detalles"""
+        self.subtotal = sum(detalle.subtotal for detalle in self.detalle_ventas)
+        self.total = float(self.subtotal + self.impuesto - self.descuento)
+        return self.total
+    
+    def __repr__(self):
+        return f'<Venta {self.id_venta}>'
+
+class DetalleVenta(db.Model):
+    """Modelo para la tabla Detalle_Ventas"""
+    __tablename__ = 'detalle_ventas'
+    __table_args__ = (
+        db.Index('ix_detalle_ventas_id_venta', 'id_venta'),
+        db.Index('ix_detalle_ventas_id_plano', 'id_plano'),
+        db.Index('ix_detalle_ventas_id_material', 'id_material'),
+    )
+    
+    id_detalle_venta = db.Column(db.Integer, primary_key=True)
+    id_venta = db.Column(db.Integer, db.ForeignKey('ventas.id_venta'), nullable=False)
+    id_plano = db.Column(db.Integer, db.ForeignKey('planos.id_plano'), nullable=True)
+    id_material = db.Column(db.Integer, db.ForeignKey('materiales.id_material'), nullable=True)
+    descripcion = db.Column(db.String(200))
+    cantidad = db.Column(db.Integer, nullable=False)
+    precio_unitario = db.Column(db.Numeric(10, 2), nullable=False)
+    descuento = db.Column(db.Numeric(10, 2), default=0.0)
+    
+    @property
+    def subtotal(self):
+        """Calcula el subtotal del detalle"""
+        return float(self.cantidad * self.precio_unitario - self.descuento)
+    
+    def __repr__(self):
+        return f'<DetalleVenta {self.id_detalle_venta}>'
+
+class Estadisticas(db.Model):
+    """Totales del dashboard, mantenidos de forma incremental (una sola fila)"""
+    __tablename__ = 'estadisticas'
+    
+    id_estadisticas = db.Column(db.Integer, primary_key=True)
+    total_clientes = db.Column(db.Integer, nullable=False, default=0)
+    total_proyectos = db.Column(db.Integer, nullable=False, default=0)
+    total_planos = db.Column(db.Integer, nullable=False, default=0)
+    total_ventas = db.Column(db.Integer, nullable=False, default=0)
+    existencia_total = db.Column(db.Integer, nullable=False, default=0)
+    # Suma de Venta.total de las ventas no canceladas
+    importe_vendido = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<Estadisticas {self.id_estadisticas}>'
+
+
+class VersionTabla(db.Model):
+    """Contador de versión por tabla, se incrementa en cada escritura sobre ella"""
+    __tablename__ = 'versiones_tablas'
+    
+    nombre_tabla = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    # Última escritura sobre la tabla (Last-Modified de la API)
+    fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<VersionTabla {self.nombre_tabla}: {self.version}>'
+
+class ArchivoPlano(db.Model):
+    """Archivo de plano guardado por su hash SHA-256, compartido entre planos idénticos"""
+    __tablename__ = 'archivos_planos'
+    
+    hash_sha256 = db.Column(db.String(64), primary_key=True)
+    # Ruta relativa a UPLOAD_FOLDER, la misma que guarda Plano.archivo
+    ruta = db.Column(db.String(255), unique=True, nullable=False)
+    tamano = db.Column(db.Integer, nullable=False)
+    # Número de planos que usan este archivo; al llegar a cero se borra del disco
+    referencias = db.Column(db.Integer, nullable=False, default=0)
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<ArchivoPlano {self.hash_sha256[:12]}: {self.referencias}>'
+
+
+class MigracionEsquema(db.Model):
+    """Migraciones de esquema ya aplicadas (ver migraciones.py)"""
+    __tablename__ = 'migraciones_esquema'
+    
+    version = db.Column(db.Integer, primary_key=True)
+    descripcion = db.Column(db.String(200), nullable=False)
+    fecha_aplicacion = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<MigracionEsquema {self.version}>'
+
+class MovimientoInventario(db.Model):
+    """Registro inmutable de cada cambio de existencias (solo se insertan filas)"""
+    __tablename__ = 'movimientos_inventario'
+    __table_args__ = (
+        # Historial de una existencia y cálculo de existencias a una fecha
+        db.Index('ix_movimientos_inventario_id_inventario_fecha', 'id_inventario', 'fecha'),
+    )
+    
+    id_movimiento = db.Column(db.Integer, primary_key=True)
+    id_inventario = db.Column(db.Integer, db.ForeignKey('inventario.id_inventario'), nullable=False)
+    id_usuario = db.Column(db.Integer, db.ForeignKey('usuarios.id_usuario'))
+    # Tipos: 'inicial', 'entrada', 'salida', 'ajuste'
+    tipo = db.Column(db.String(20), nullable=False)
+    # Variación con signo: positiva para entradas, negativa para salidas
+    cantidad = db.Column(db.Integer, nullable=False)
+    # Existencia después de aplicar el movimiento
+    cantidad_resultante = db.Column(db.Integer, nullable=False)
+    fecha = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    inventario = db.relationship('Inventario', backref=db.backref('movimientos', lazy='dynamic'))
+    usuario = db.relationship('Usuario')
+    
+    def __repr__(self):
+        return f'<MovimientoInventario {self.tipo} {self.cantidad:+d}>'
+
+
+class InstantaneaInventario(db.Model):
+    """Existencia de cada inventario en un momento, para no sumar todo el historial"""
+    __tablename__ = 'instantaneas_inventario'
+    __table_args__ = (
+        db.Index('ix_instantaneas_inventario_id_inventario_fecha', 'id_inventario', 'fecha'),
+    )
+    
+    id_instantanea = db.Column(db.Integer, primary_key=True)
+    id_inventario = db.Column(db.Integer, db.ForeignKey('inventario.id_inventario'), nullable=False)
+    fecha = db.Column(db.DateTime, nullable=False)
+    cantidad = db.Column(db.Integer, nullable=False)
+    # Último movimiento incluido en `cantidad`
+    id_movimiento = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<InstantaneaInventario {self.id_inventario}: {self.cantidad}>'
\ No newline at end of file
@@ -0,0 +1,184 @@
+from datetime import datetime
+
+from sqlalchemy import event, func, insert, literal, select, update
+from sqlalchemy.orm import Session
+
+from models import db, Inventario, MovimientoInventario, InstantaneaInventario
+from estadisticas import aplicar_deltas
+from versiones import incrementar_versiones
+from stock_bajo import actualizar_stock_bajo
+
+
+TIPOS_MOVIMIENTO = ('inicial', 'entrada', 'salida', 'ajuste')
+
+
+class StockInsuficiente(ValueError):
+    """La salida dejaría la existencia por debajo de cero"""
+
+
+def registrar_movimiento(id_inventario, tipo, cantidad, id_usuario=None):
+    """Aplicar un movimiento de existencias con SQL atómico y anotarlo en el historial.
+
+    Entradas y salidas son incrementos en la propia sentencia UPDATE; la
+    salida solo se aplica si `cantidad >= n` (decremento protegido), así
+    dos ajustes simultáneos nunca pierden ni sobregiran stock. El ajuste a
+    una cantidad exacta bloquea primero la fila con una escritura nula para
+    leer el valor anterior sin carreras. No confirma la transacción.
+    """
+    if tipo not in TIPOS_MOVIMIENTO:
+        raise ValueError(f'Tipo de movimiento no válido: {tipo}')
+    if cantidad < 0:
+        raise ValueError('La cantidad no puede ser negativa')
+
+    tabla = Inventario.__table__
+    conexion = db.session.connection()
+    ahora = datetime.utcnow()
+    fila = tabla.c.id_inventario == id_inventario
+
+    if tipo == 'salida':
+        resultante = conexion.execute(
+            update(tabla).where(fila, tabla.c.cantidad >= cantidad)
+            .values(cantidad=tabla.c.cantidad - cantidad, fecha_actualizacion=ahora)
+            .returning(tabla.c.cantidad)
+        ).scalar()
+        if resultante is None:
+            raise StockInsuficiente('No hay suficiente stock para realizar la salida')
+        variacion = -cantidad
+    elif tipo == 'ajuste':
+        # Escritura nula: toma el bloqueo de escritura (SQLite) o de fila (PostgreSQL)
+        conexion.execute(update(tabla).where(fila).values(cantidad=tabla.c.cantidad))
+        anterior = conexion.execute(select(tabla.c.cantidad).where(fila)).scalar()
+        conexion.execute(update(tabla).where(fila).values(cantidad=cantidad, fecha_actualizacion=ahora))
+        resultante = cantidad
+        variacion = cantidad - anterior
+    else:
+        resultante = conexion.execute(
+            update(tabla).where(fila)
+            .values(cantidad=tabla.c.cantidad + cantidad, fecha_actualizacion=ahora)
+            .returning(tabla.c.cantidad)
+        ).scalar()
+        variacion = cantidad
+
+    movimiento = MovimientoInventario(
+        id_inventario=id_inventario,
+        id_usuario=id_usuario,
+        tipo=tipo,
+        cantidad=variacion,
+        cantidad_resultante=resultante,
+        fecha=ahora
+    )
+    db.session.add(movimiento)
+    return movimiento
+
+
+def crear_inventarios(existencias, id_usuario=None):
+    """Crear por lotes inventarios con su movimiento 'inicial' (versión masiva de crear_material).
+
+    `existencias` es una lista de diccionarios con id_material, cantidad y
+    ubicacion. Inventarios y movimientos se insertan con una sentencia de
+    varias filas cada uno, fuera del ORM, así que aquí mismo se actualizan
+    las versiones de las tablas, el total de existencias y el conjunto de
+    stock bajo.
+    """
+    if not existencias:
+        return []
+    conexion = db.session.connection()
+    ahora = datetime.utcnow()
+    # Ids asignados en el orden de VALUES (ver ventas.registrar_venta)
+    ids_inventario = sorted(conexion.execute(
+        insert(Inventario.__table__).returning(Inventario.__table__.c.id_inventario),
+        [{'id_material': existencia['id_material'], 'cantidad': existencia['cantidad'],
+          'ubicacion': existencia['ubicacion'], 'fecha_actualizacion': ahora}
+         for existencia in existencias]
+    ).scalars())
+    conexion.execute(insert(MovimientoInventario.__table__), [
+        {'id_inventario': id_inventario, 'id_usuario': id_usuario, 'tipo': 'inicial',
+         'cantidad': existencia['cantidad'], 'cantidad_resultante': existencia['cantidad'],
+         'fecha': ahora}
+        for id_inventario, existencia in zip(ids_inventario, existencias)
+    ])
+    incrementar_versiones(conexion, {Inventario.__tablename__, MovimientoInventario.__tablename__})
+    aplicar_deltas(conexion, {'existencia_total': sum(e['cantidad'] for e in existencias)})
+    actualizar_stock_bajo(conexion, ids_inventario)
+    return ids_inventario
+
+
+def tomar_instantanea():
+    """Guardar la existencia actual de cada inventario en una sola sentencia.
+
+    Pensado para ejecutarse periódicamente (`flask instantanea-inventario`
+    desde cron): el cálculo de existencias a una fecha parte de la última
+    instantánea anterior y solo suma los movimientos posteriores.
+    """
+    ultimo_movimiento = select(
+        func.coalesce(func.max(MovimientoInventario.id_movimiento), 0)
+    ).scalar_subquery()
+    resultado = db.session.execute(insert(InstantaneaInventario).from_select(
+        ['id_inventario', 'fecha', 'cantidad', 'id_movimiento'],
+        select(Inventario.id_inventario, literal(datetime.utcnow(), db.DateTime),
+               Inventario.cantidad, ultimo_movimiento)
+    ))
+    db.session.commit()
+    return resultado.rowcount
+
+
+def existencias_en_fecha(fecha, ids_inventario=None):
+    """Existencia de cada inventario en `fecha`: {id_inventario: cantidad}.
+
+    Cada fila parte de su última instantánea anterior a `fecha` y suma los
+    movimientos posteriores a ella hasta `fecha`, usando los índices
+    (id_inventario, fecha) de ambas tablas.
+    """
+    instantanea = InstantaneaInventario.__table__.alias('instantanea')
+    ultima_instantanea = select(func.max(InstantaneaInventario.id_instantanea)).where(
+        InstantaneaInventario.id_inventario == Inventario.id_inventario,
+        InstantaneaInventario.fecha <= fecha
+    ).correlate(Inventario).scalar_subquery()
+    posteriores = select(func.coalesce(func.sum(MovimientoInventario.cantidad), 0)).where(
+        MovimientoInventario.id_inventario == Inventario.id_inventario,
+        MovimientoInventario.fecha <= fecha,
+        MovimientoInventario.id_movimiento > func.coalesce(instantanea.c.id_movimiento, 0)
+    ).correlate(Inventario, instantanea).scalar_subquery()
+
+    consulta = db.session.query(
+        Inventario.id_inventario,
+        func.coalesce(instantanea.c.cantidad, 0) + posteriores
+    ).outerjoin(instantanea, instantanea.c.id_instantanea == ultima_instantanea)
+    if ids_inventario is not None:
+        consulta = consulta.filter(Inventario.id_inventario.in_(ids_inventario))
+    return {id_inventario: int(cantidad) for id_inventario, cantidad in consulta}
+
+
+def movimientos_iniciales(conexion):
+    """Anotar la existencia actual como movimiento 'inicial' de los inventarios sin historial"""
+    MovimientoInventario.__table__.create(conexion, checkfirst=True)
+    InstantaneaInventario.__table__.create(conexion, checkfirst=True)
+    sin_historial = ~select(MovimientoInventario.id_movimiento).where(
+        MovimientoInventario.id_inventario == Inventario.id_inventario
+    ).exists()
+    conexion.execute(insert(MovimientoInventario.__table__).from_select(
+        ['id_inventario', 'tipo', 'cantidad', 'cantidad_resultante', 'fecha'],
+        select(Inventario.id_inventario, literal('inicial'), Inventario.cantidad,
+               Inventario.cantidad, literal(datetime.utcnow(), db.DateTime))
+        .where(sin_historial)
+    ))
+
+
+def _proteger_historial(session, flush_context, instances):
+    """El historial solo admite inserciones"""
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, MovimientoInventario) and (
+                obj in session.deleted or session.is_modified(obj, include_collections=False)):
+            raise ValueError('Los movimientos de inventario no se pueden modificar ni eliminar')
+
+
+def init_movimientos(app):
+    """Registrar la protección del historial y el comando de instantáneas"""
+    if not event.contains(Session, 'before_flush', _proteger_historial):
+        event.listen(Session, 'before_flush', _proteger_historial)
+
+    @app.cli.command('instantanea-inventario')
+    def instantanea_inventario_comando():
+        """Guardar la existencia actual de todos los inventarios"""
+        filas = tomar_instantanea()
+        print(f'✅ Instantánea guardada para {filas} inventarios')
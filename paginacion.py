@@ -0,0 +1,151 @@
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from models import db
+
+
+class Pagina:
+    """Resultado de una consulta paginada por cursor (keyset)"""
+
+    def __init__(self, items, cursor_siguiente=None, cursor_anterior=None):
+        self.items = items
+        self.cursor_siguiente = cursor_siguiente
+        self.cursor_anterior = cursor_anterior
+
+    @property
+    def tiene_siguiente(self):
+        return self.cursor_siguiente is not None
+
+    @property
+    def tiene_anterior(self):
+        return self.cursor_anterior is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+def codificar_cursor(valores):
+    """Codificar los valores de la clave de orden en un cursor opaco para la URL"""
+    serializables = []
+    for valor in valores:
+        if isinstance(valor, (datetime, date)):
+            valor = valor.isoformat()
+        elif isinstance(valor, Decimal):
+            valor = str(valor)
+        serializables.append(valor)
+    datos = json.dumps(serializables, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(datos).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor, orden):
+    """Decodificar un cursor devolviendo los valores con el tipo de cada columna.
+
+    Devuelve None si el cursor no es válido para el orden indicado.
+    """
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        if not isinstance(valores, list) or len(valores) != len(orden):
+            return None
+
+        convertidos = []
+        for valor, (columna, _descendente) in zip(valores, orden):
+            tipo = columna.type.python_type
+            if valor is None:
+                convertidos.append(None)
+            elif tipo is datetime:
+                convertidos.append(datetime.fromisoformat(valor))
+            elif tipo is date:
+                convertidos.append(date.fromisoformat(valor))
+            else:
+                convertidos.append(tipo(valor))
+        return convertidos
+    except (ValueError, TypeError, NotImplementedError):
+        return None
+
+
+def _filtro_keyset(orden, valores, hacia_atras):
+    """Construir la condición (a, b, ...) > (x, y, ...) respetando la dirección de cada columna"""
+    condiciones = []
+    for i, (columna, descendente) in enumerate(orden):
+        # Al retroceder se invierte la comparación de cada columna
+        menor = descendente != hacia_atras
+        comparacion = columna < valores[i] if menor else columna > valores[i]
+        iguales = [orden[j][0] == valores[j] for j in range(i)]
+        condiciones.append(db.and_(*iguales, comparacion))
+    return db.or_(*condiciones)
+
+
+def paginar(query, orden, despues=None, antes=None, por_pagina=50):
+    """Paginar una consulta por cursor sobre las columnas de `orden`.
+
+    `orden` es una lista de tuplas (columna, descendente) cuya combinación
+    debe ser única, normalmente terminando en la clave primaria. El coste
+    de cada página es el de leer `por_pagina` filas del índice, sin OFFSET.
+    """
+    hacia_atras = antes is not None and despues is None
+    cursor = antes if hacia_atras else despues
+    valores = decodificar_cursor(cursor, orden) if cursor else None
+
+    if valores is not None:
+        query = query.filter(_filtro_keyset(orden, valores, hacia_atras))
+    else:
+        hacia_atras = False
+
+    criterios = []
+    for columna, descendente in orden:
+        # Al retroceder se recorre el índice en sentido inverso
+        criterios.append(columna.asc() if descendente == hacia_atras else columna.desc())
+    filas = query.order_by(*criterios).limit(por_pagina + 1).all()
+
+    hay_mas = len(filas) > por_pagina
+    filas = filas[:por_pagina]
+    if hacia_atras:
+        filas.reverse()
+
+    def clave(item):
+        return codificar_cursor([getattr(item, columna.key) for columna, _ in orden])
+
+    cursor_siguiente = None
+    cursor_anterior = None
+    if filas:
+        if hacia_atras:
+            cursor_siguiente = clave(filas[-1])
+            cursor_anterior = clave(filas[0]) if hay_mas else None
+        else:
+            cursor_siguiente = clave(filas[-1]) if hay_mas else None
+            cursor_anterior = clave(filas[0]) if valores is not None else None
+
+    return Pagina(filas, cursor_siguiente, cursor_anterior)
+
+
+def filas_acotadas(query, maximo, *columnas):
+    """Subconsulta con como mucho `maximo` + 1 filas de `query` (solo `columnas`, si se indican).
+
+    Los resúmenes de un listado filtrado se agregan sobre ella: su coste
+    queda acotado aunque el filtro abarque toda la tabla, y la fila de más
+    indica que el total real supera `maximo`.
+    """
+    query = query.order_by(None)
+    if columnas:
+        query = query.with_entities(*columnas)
+    return query.limit(maximo + 1).subquery()
+
+
+def total_acotado(total, maximo):
+    """Total para mostrar: el número, o 'maximo+' si la subconsulta acotada se llenó"""
+    return total if total <= maximo else f'{maximo}+'
+
+
+def contar_acotado(query, maximo):
+    """Filas de `query` leyendo como mucho `maximo` + 1; 'maximo+' si hay más"""
+    total = db.session.query(db.func.count()).select_from(filas_acotadas(query, maximo)).scalar()
+    return total_acotado(total, maximo)
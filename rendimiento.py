@@ -0,0 +1,307 @@
+import gc
+import http.cookiejar
+import json
+import math
+import platform
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import click
+from sqlalchemy import event, func, select
+from sqlalchemy.engine import Engine
+
+from models import (db, Usuario, Cliente, Proyecto, Plano, Material, Inventario, Venta,
+                    DetalleVenta)
+from consultas import RUTAS_EXPLICADAS
+
+
+# Rutas GET que no se miden y por qué; cualquier otra ruta GET nueva se mide sola
+RUTAS_EXCLUIDAS = {
+    'static': 'archivos estáticos',
+    'logout': 'cerraría la sesión de la medición',
+    'eliminar_cliente': 'modifica datos',
+    'eliminar_proyecto': 'modifica datos',
+    'eliminar_material': 'modifica datos',
+    'eliminar_plano': 'modifica datos',
+    'eliminar_usuario': 'modifica datos',
+    'eliminar_venta': 'modifica datos',
+    'exportar_datos': 'exportación masiva, no es una petición interactiva',
+    'exportar_facturas': 'exportación masiva, no es una petición interactiva',
+    'subida_plano': 'necesita una subida en curso',
+    'tesela_plano': 'necesita una vista previa generada',
+    'trabajo_reporte': 'necesita un trabajo de reporte',
+    'descargar_reporte': 'necesita un trabajo de reporte',
+    'estado_trabajo_reporte': 'necesita un trabajo de reporte',
+    'alertas_stock': 'flujo de eventos que no termina',
+    'eventos_dashboard': 'flujo de eventos que no termina',
+}
+
+# Modelo del que sale el <id> de ejemplo de cada ruta con parámetro
+MODELO_POR_RUTA = {
+    'editar_cliente': Cliente.id_cliente,
+    'editar_proyecto': Proyecto.id_proyecto,
+    'detalle_plano': Plano.id_plano,
+    'descargar_plano': Plano.id_plano,
+    'ver_plano': Plano.id_plano,
+    'vista_previa_plano': Plano.id_plano,
+    'editar_material': Material.id_material,
+    'historial_inventario': Inventario.id_inventario,
+    'ajustar_inventario': Inventario.id_inventario,
+    'editar_usuario': Usuario.id_usuario,
+    'ver_venta': Venta.id_venta,
+    'imprimir_venta': Venta.id_venta,
+}
+
+# Variantes con filtros además de la URL sin argumentos de cada ruta
+VARIANTES = RUTAS_EXPLICADAS + [
+    ('clientes', {'search': 'gonzalez'}),
+    ('ventas', {'search': 'garcia', 'estado': 'pendiente'}),
+    ('buscar', {'search': 'torres'}),
+    ('api_listado', {'recurso': 'clientes'}),
+    ('api_listado', {'recurso': 'ventas', 'estado': 'completada', 'campos': 'total,fecha_venta'}),
+]
+
+
+def percentil(valores, p):
+    """Percentil por rango más cercano de una lista ya ordenada"""
+    if not valores:
+        return None
+    return valores[max(0, math.ceil(p / 100 * len(valores)) - 1)]
+
+
+def _resumen(latencias, consultas, estados):
+    ordenadas = sorted(latencias)
+    return {
+        'n': len(ordenadas),
+        'p50_ms': round(percentil(ordenadas, 50) * 1000, 2),
+        'p95_ms': round(percentil(ordenadas, 95) * 1000, 2),
+        'p99_ms': round(percentil(ordenadas, 99) * 1000, 2),
+        'consultas': max(consultas) if consultas else None,
+        'estados': sorted(set(estados)),
+    }
+
+
+def _id_representativo(columna):
+    """Id de la fila en la mitad de la tabla: ni la más antigua ni la recién creada"""
+    total = db.session.query(func.count(columna)).scalar()
+    if not total:
+        return None
+    return db.session.scalar(select(columna).order_by(columna).offset(total // 2).limit(1))
+
+
+def urls_a_medir(app):
+    """[(clave, url)] de todas las rutas GET medibles, y {endpoint: motivo} de las omitidas"""
+    urls, omitidas = [], dict(RUTAS_EXCLUIDAS)
+    with app.app_context(), app.test_request_context():
+        for regla in sorted(app.url_map.iter_rules(), key=lambda r: r.endpoint):
+            if 'GET' not in regla.methods or regla.endpoint in RUTAS_EXCLUIDAS:
+                continue
+            argumentos = {}
+            if regla.arguments:
+                columna = MODELO_POR_RUTA.get(regla.endpoint)
+                if columna is None or regla.arguments != {'id'}:
+                    omitidas[regla.endpoint] = 'sin argumentos de ejemplo (añadir a MODELO_POR_RUTA)'
+                    continue
+                argumentos['id'] = _id_representativo(columna)
+                if argumentos['id'] is None:
+                    omitidas[regla.endpoint] = 'tabla vacía'
+                    continue
+            url = app.url_for(regla.endpoint, **argumentos)
+            if (regla.endpoint, url) not in urls:
+                urls.append((regla.endpoint, url))
+        for endpoint, argumentos in VARIANTES:
+            if not argumentos:
+                continue  # ya medida arriba
+            url = app.url_for(endpoint, **argumentos)
+            clave = f'{endpoint}?{urllib.parse.urlencode(sorted(argumentos.items()))}'
+            urls.append((clave, url))
+    return urls, omitidas
+
+
+def volumen_datos(app):
+    with app.app_context():
+        return {modelo.__tablename__: db.session.query(func.count()).select_from(modelo).scalar()
+                for modelo in (Cliente, Proyecto, Plano, Venta, DetalleVenta, Material)}
+
+
+def medir_rutas(app, repeticiones):
+    """Pasar cada ruta por el cliente de pruebas de Flask, con sesión de administrador.
+
+    Cada URL se pide una vez para calentar cachés y luego `repeticiones`
+    veces; se anota la latencia y las sentencias SQL de cada petición. Como
+    timeit, se desactiva el recolector de basura mientras se mide para que
+    sus pausas no caigan al azar en el p95 de una ruta u otra.
+    """
+    urls, omitidas = urls_a_medir(app)
+    with app.app_context():
+        administrador = Usuario.query.filter_by(rol='administrador', activo=True).first()
+    cliente = app.test_client()
+    with cliente.session_transaction() as sesion:
+        sesion['_user_id'] = administrador.get_id()
+
+    sentencias = [0]
+
+    def contar(*_args):
+        sentencias[0] += 1
+
+    rutas = {}
+    event.listen(Engine, 'before_cursor_execute', contar)
+    try:
+        for clave, url in urls:
+            cliente.get(url).close()
+            latencias, consultas, estados = [], [], []
+            gc.collect()
+            gc.disable()
+            for _ in range(repeticiones):
+                sentencias[0] = 0
+                inicio = time.perf_counter()
+                respuesta = cliente.get(url)
+                respuesta.get_data()
+                latencias.append(time.perf_counter() - inicio)
+                respuesta.close()
+                consultas.append(sentencias[0])
+                estados.append(respuesta.status_code)
+            gc.enable()
+            rutas[clave] = dict(_resumen(latencias, consultas, estados), url=url)
+    finally:
+        gc.enable()
+        event.remove(Engine, 'before_cursor_execute', contar)
+    return rutas, omitidas
+
+
+def prueba_carga(app, base, email, password, hilos, duracion):
+    """Pedir todas las URLs en bucle desde `hilos` usuarios simultáneos contra un servidor real.
+
+    Cada hilo inicia su propia sesión. Las sentencias SQL solo se conocen si
+    el servidor envía X-Consultas-SQL (modo debug o testing).
+    """
+    urls, omitidas = urls_a_medir(app)
+    resultados = defaultdict(lambda: ([], [], []))
+    cerrojo = threading.Lock()
+    fin = time.monotonic() + duracion
+
+    def usuario(numero):
+        navegador = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+        with navegador.open(base + '/login', urllib.parse.urlencode(
+                {'email': email, 'password': password}).encode()) as respuesta:
+            if urllib.parse.urlparse(respuesta.url).path == '/login':
+                raise click.ClickException(f'No se pudo iniciar sesión como {email}')
+        posicion = numero  # cada hilo empieza en una URL distinta
+        while time.monotonic() < fin:
+            clave, url = urls[posicion % len(urls)]
+            posicion += 1
+            inicio = time.perf_counter()
+            try:
+                with navegador.open(base + url) as respuesta:
+                    respuesta.read()
+                    estado, consultas = respuesta.status, respuesta.headers.get('X-Consultas-SQL')
+            except urllib.error.HTTPError as error:
+                estado, consultas = error.code, error.headers.get('X-Consultas-SQL')
+            latencia = time.perf_counter() - inicio
+            with cerrojo:
+                latencias, lista_consultas, estados = resultados[clave]
+                latencias.append(latencia)
+                estados.append(estado)
+                if consultas is not None:
+                    lista_consultas.append(int(consultas))
+
+    inicio = time.monotonic()
+    with ThreadPoolExecutor(hilos) as ejecutor:
+        list(ejecutor.map(usuario, range(hilos)))
+    transcurrido = time.monotonic() - inicio
+
+    rutas = {clave: _resumen(*resultados[clave]) for clave, _ in urls if resultados[clave][0]}
+    total = sum(ruta['n'] for ruta in rutas.values())
+    return rutas, omitidas, {'peticiones': total, 'peticiones_por_segundo': round(total / transcurrido, 1),
+                             'hilos': hilos, 'segundos': round(transcurrido, 1)}
+
+
+def comparar(actual, base, tolerancia, minimo_ms=1.0):
+    """Regresiones de `actual` frente a `base`: p95 más lento o más consultas por petición"""
+    regresiones = []
+    for clave, ruta in actual['rutas'].items():
+        anterior = base['rutas'].get(clave)
+        if anterior is None:
+            continue
+        if (ruta['p95_ms'] > anterior['p95_ms'] * (1 + tolerancia)
+                and ruta['p95_ms'] - anterior['p95_ms'] > minimo_ms):
+            regresiones.append(f'{clave}: p95 {anterior["p95_ms"]} -> {ruta["p95_ms"]} ms')
+        if None not in (ruta['consultas'], anterior['consultas']) and ruta['consultas'] > anterior['consultas']:
+            regresiones.append(f'{clave}: {anterior["consultas"]} -> {ruta["consultas"]} consultas')
+    return regresiones
+
+
+def _informe(app, modo, rutas, omitidas, extra=None):
+    return {
+        'modo': modo,
+        'fecha': datetime.utcnow().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'plataforma': platform.platform(),
+        'base_datos': db.engine.dialect.name,
+        'datos': volumen_datos(app),
+        'rutas': rutas,
+        'omitidas': omitidas,
+        **(extra or {}),
+    }
+
+
+def _mostrar_y_guardar(app, informe, salida, contra):
+    print(f'{"ruta":55} {"p50":>8} {"p95":>8} {"p99":>8} {"sql":>4}  estados')
+    for clave, ruta in informe['rutas'].items():
+        print(f'{clave[:55]:55} {ruta["p50_ms"]:8.1f} {ruta["p95_ms"]:8.1f} {ruta["p99_ms"]:8.1f} '
+              f'{ruta["consultas"] if ruta["consultas"] is not None else "-":>4}  {ruta["estados"]}')
+    if salida:
+        with open(salida, 'w', encoding='utf-8') as archivo:
+            json.dump(informe, archivo, ensure_ascii=False, indent=2)
+        print(f'Resultados guardados en {salida}')
+    if contra:
+        with open(contra, encoding='utf-8') as archivo:
+            base = json.load(archivo)
+        regresiones = comparar(informe, base, app.config['RENDIMIENTO_TOLERANCIA'])
+        for regresion in regresiones:
+            print(f'❌ {regresion}')
+        if regresiones:
+            sys.exit(1)
+        print(f'✅ Sin regresiones frente a {contra}')
+
+
+def init_rendimiento(app):
+    """Registrar los comandos de medición de rutas y de prueba de carga"""
+
+    @app.cli.command('medir-rutas')
+    @click.option('--repeticiones', type=int, help='Por defecto RENDIMIENTO_REPETICIONES')
+    @click.option('--salida', type=click.Path(dir_okay=False), help='Guardar los resultados en JSON')
+    @click.option('--comparar', 'contra', type=click.Path(exists=True, dir_okay=False),
+                  help='JSON de una ejecución anterior; falla si hay regresiones')
+    def medir_rutas_comando(repeticiones, salida, contra):
+        """Latencia p50/p95/p99 y consultas por petición de cada ruta GET (cliente de pruebas)"""
+        repeticiones = repeticiones or app.config['RENDIMIENTO_REPETICIONES']
+        rutas, omitidas = medir_rutas(app, repeticiones)
+        with app.app_context():
+            informe = _informe(app, 'cliente_pruebas', rutas, omitidas, {'repeticiones': repeticiones})
+        _mostrar_y_guardar(app, informe, salida, contra)
+
+    @app.cli.command('prueba-carga')
+    @click.option('--url', 'base', default='http://127.0.0.1:8000', show_default=True)
+    @click.option('--email', default='admin@asplot.com', show_default=True)
+    @click.option('--password', prompt=True, hide_input=True)
+    @click.option('--hilos', default=16, show_default=True, help='Usuarios simultáneos')
+    @click.option('--duracion', default=30, show_default=True, help='Segundos')
+    @click.option('--salida', type=click.Path(dir_okay=False), help='Guardar los resultados en JSON')
+    @click.option('--comparar', 'contra', type=click.Path(exists=True, dir_okay=False),
+                  help='JSON de una ejecución anterior; falla si hay regresiones')
+    def prueba_carga_comando(base, email, password, hilos, duracion, salida, contra):
+        """Carga concurrente por HTTP contra un servidor en marcha (p. ej. gunicorn)"""
+        rutas, omitidas, totales = prueba_carga(app, base.rstrip('/'), email, password, hilos, duracion)
+        with app.app_context():
+            informe = _informe(app, 'http', rutas, omitidas, totales)
+        print(f'{totales["peticiones"]} peticiones en {totales["segundos"]} s '
+              f'({totales["peticiones_por_segundo"]}/s con {hilos} hilos)')
+        _mostrar_y_guardar(app, informe, salida, contra)
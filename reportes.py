@@ -0,0 +1,500 @@
+import glob
+import hashlib
+import os
+import re
+import time
+from datetime import date, datetime, timedelta
+from typing import NamedTuple
+
+from flask import current_app
+from sqlalchemy import case, func, select
+
+from models import db, Cliente, Proyecto, TipoPlano, Plano, Material, Inventario, Venta
+from stock_bajo import inventarios_bajo_stock
+from trabajos import app_trabajador, enviar_trabajo
+from versiones import version_datos
+
+
+# Tablas que lee cada tipo de reporte; su versión forma parte de la clave de caché
+TABLAS_REPORTE = {
+    'clientes': ('clientes',),
+    'proyectos': ('proyectos', 'clientes'),
+    'ventas': ('ventas', 'clientes'),
+    'inventario': ('inventario', 'materiales'),
+    'planos': ('planos', 'proyectos', 'clientes', 'tipos_plano'),
+    'planos_proyecto': ('planos', 'proyectos', 'clientes', 'tipos_plano', 'usuarios'),
+    'stock_bajo': ('inventario', 'materiales'),
+}
+
+# Reportes que se limitan al período elegido; el resto lista el estado actual
+TIPOS_CON_PERIODO = ('ventas', 'proyectos', 'planos')
+
+PERIODOS = {
+    'hoy': 'Hoy',
+    'esta_semana': 'Esta semana',
+    'este_mes': 'Este mes',
+    'mes_pasado': 'Mes pasado',
+    'este_trimestre': 'Este trimestre',
+    'ultimos_3_meses': 'Últimos 3 meses',
+    'ultimos_6_meses': 'Últimos 6 meses',
+    'este_año': 'Este año',
+    'personalizado': 'Rango personalizado',
+    'todos': 'Todos los registros',
+}
+
+_PATRON_CLAVE = re.compile(r'^([a-z_]+)-([0-9a-f]{12})-([0-9a-f]{12})$')
+
+
+class PeriodoInvalido(ValueError):
+    """Período desconocido o rango personalizado incorrecto"""
+
+
+class Periodo(NamedTuple):
+    """Período ya resuelto a fechas: [inicio, fin) o sin límites si ambos son None"""
+    nombre: str
+    inicio: date = None
+    fin: date = None
+
+    @property
+    def descripcion(self):
+        if self.inicio is None:
+            return PERIODOS['todos']
+        ultimo = self.fin - timedelta(days=1)
+        if ultimo == self.inicio:
+            return f'{PERIODOS[self.nombre]} ({self.inicio})'
+        return f'{PERIODOS[self.nombre]} ({self.inicio} a {ultimo})'
+
+    def filtro(self, columna):
+        """Condiciones WHERE sobre una columna de fecha y hora; usan su índice"""
+        if self.inicio is None:
+            return []
+        return [columna >= datetime.combine(self.inicio, datetime.min.time()),
+                columna < datetime.combine(self.fin, datetime.min.time())]
+
+
+def _inicio_mes(fecha, meses_atras=0):
+    indice = fecha.year * 12 + fecha.month - 1 - meses_atras
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+def resolver_periodo(nombre, desde=None, hasta=None, hoy=None):
+    """Convertir el período del formulario en fechas concretas.
+
+    Las ventas y los planos guardan la fecha en UTC, así que los períodos
+    relativos se calculan sobre el día UTC. 'personalizado' usa `desde` y
+    `hasta` (AAAA-MM-DD, ambos incluidos).
+    """
+    hoy = hoy or datetime.utcnow().date()
+    if nombre == 'hoy':
+        return Periodo(nombre, hoy, hoy + timedelta(days=1))
+    if nombre == 'esta_semana':
+        lunes = hoy - timedelta(days=hoy.weekday())
+        return Periodo(nombre, lunes, lunes + timedelta(days=7))
+    if nombre == 'este_mes':
+        return Periodo(nombre, _inicio_mes(hoy), _inicio_mes(hoy, -1))
+    if nombre == 'mes_pasado':
+        return Periodo(nombre, _inicio_mes(hoy, 1), _inicio_mes(hoy))
+    if nombre == 'este_trimestre':
+        inicio = _inicio_mes(hoy, (hoy.month - 1) % 3)
+        return Periodo(nombre, inicio, _inicio_mes(inicio, -3))
+    if nombre in ('ultimos_3_meses', 'ultimos_6_meses'):
+        # El mes en curso y los anteriores hasta completar 3 o 6
+        return Periodo(nombre, _inicio_mes(hoy, int(nombre.split('_')[1]) - 1), _inicio_mes(hoy, -1))
+    if nombre == 'este_año':
+        return Periodo(nombre, date(hoy.year, 1, 1), date(hoy.year + 1, 1, 1))
+    if nombre == 'personalizado':
+        try:
+            inicio = datetime.strptime(desde or '', '%Y-%m-%d').date()
+            ultimo = datetime.strptime(hasta or '', '%Y-%m-%d').date()
+        except ValueError:
+            raise PeriodoInvalido('Indica las fechas desde y hasta del rango personalizado')
+        if inicio > ultimo:
+            raise PeriodoInvalido('La fecha desde no puede ser posterior a la fecha hasta')
+        return Periodo(nombre, inicio, ultimo + timedelta(days=1))
+    if nombre == 'todos':
+        return Periodo(nombre)
+    raise PeriodoInvalido('Período no válido')
+
+
+def agrupacion_periodo(periodo):
+    """Día, semana o mes según la duración del período, para que el reporte tenga pocas filas"""
+    if periodo.inicio is None:
+        return 'mes'
+    dias = (periodo.fin - periodo.inicio).days
+    if dias <= 31:
+        return 'dia'
+    if dias <= 190:
+        return 'semana'
+    return 'mes'
+
+
+def _inicio_grupo(columna, agrupacion):
+    """Expresión SQL con el primer día (AAAA-MM-DD) del día, semana o mes de `columna`"""
+    if db.engine.dialect.name == 'sqlite':
+        if agrupacion == 'dia':
+            return func.date(columna)
+        if agrupacion == 'semana':
+            return func.date(columna, '-6 days', 'weekday 1')  # lunes de esa semana
+        return func.date(columna, 'start of month')
+    unidad = {'dia': 'day', 'semana': 'week', 'mes': 'month'}[agrupacion]
+    return func.to_char(func.date_trunc(unidad, columna), 'YYYY-MM-DD')
+
+
+def resumen_ventas(periodo, max_clientes):
+    """Totales de ventas del período agregados en la base de datos.
+
+    Solo llegan a Python las filas de resumen: una por día/semana/mes, por
+    método de pago y por cada uno de los `max_clientes` mejores clientes,
+    así el coste depende del período y no de todo el historial. Las ventas
+    canceladas se cuentan aparte y no suman importes.
+    """
+    vigente = db.or_(Venta.estado.is_(None), Venta.estado != 'cancelada')
+
+    def suma(columna):
+        return func.coalesce(func.sum(case((vigente, columna), else_=0)), 0)
+
+    ventas = func.count(case((vigente, 1)))
+    canceladas = func.count(case((Venta.estado == 'cancelada', 1)))
+    importe = suma(Venta.total)
+    filtro = periodo.filtro(Venta.fecha_venta)
+
+    totales = db.session.execute(select(
+        ventas.label('ventas'), canceladas.label('canceladas'),
+        suma(Venta.subtotal).label('subtotal'), suma(Venta.impuesto).label('impuesto'),
+        suma(Venta.descuento).label('descuento'), importe.label('total'),
+        func.count(func.distinct(Venta.id_cliente)).label('clientes')
+    ).where(*filtro)).one()
+
+    agrupacion = agrupacion_periodo(periodo)
+    grupo = _inicio_grupo(Venta.fecha_venta, agrupacion).label('grupo')
+    por_periodo = db.session.execute(
+        select(grupo, ventas.label('ventas'), canceladas.label('canceladas'), importe.label('total'))
+        .where(*filtro).group_by(grupo).order_by(grupo)
+    ).all()
+
+    metodo = func.coalesce(Venta.metodo_pago, 'sin especificar').label('metodo')
+    por_metodo = db.session.execute(
+        select(metodo, ventas.label('ventas'), importe.label('total'))
+        .where(*filtro).group_by(metodo).order_by(importe.desc())
+    ).all()
+
+    por_cliente = db.session.execute(
+        select(Cliente.nombre, Cliente.apellido, ventas.label('ventas'), importe.label('total'))
+        .join(Cliente, Cliente.id_cliente == Venta.id_cliente)
+        .where(*filtro)
+        .group_by(Venta.id_cliente, Cliente.nombre, Cliente.apellido)
+        .order_by(importe.desc(), Venta.id_cliente)
+        .limit(max_clientes)
+    ).all()
+
+    return {'agrupacion': agrupacion, 'totales': totales, 'por_periodo': por_periodo,
+            'por_metodo': por_metodo, 'por_cliente': por_cliente}
+
+
+def construir_reporte(tipo_reporte, periodo, id_proyecto=None):
+    """Construir el documento PDF de un reporte; `periodo` es un Periodo resuelto"""
+    from fpdf import FPDF
+
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font('Arial', 'B', 16)
+
+    if tipo_reporte == 'clientes':
+        pdf.cell(0, 10, 'Reporte de Clientes', 0, 1, 'C')
+        pdf.ln(10)
+
+        pdf.set_font('Arial', 'B', 12)
+        pdf.cell(40, 10, 'Nombre', 1, 0, 'C')
+        pdf.cell(60, 10, 'Email', 1, 0, 'C')
+        pdf.cell(40, 10, 'Teléfono', 1, 0, 'C')
+        pdf.cell(50, 10, 'Dirección', 1, 1, 'C')
+
+        pdf.set_font('Arial', '', 10)
+        clientes = Cliente.query.all()
+        for cliente in clientes:
+            pdf.cell(40, 10, cliente.nombre_completo, 1, 0)
+            pdf.cell(60, 10, cliente.email, 1, 0)
+            pdf.cell(40, 10, cliente.telefono, 1, 0)
+            pdf.cell(50, 10, cliente.direccion[:45], 1, 1)
+
+    elif tipo_reporte == 'proyectos':
+        pdf.cell(0, 10, 'Reporte de Proyectos', 0, 1, 'C')
+        pdf.set_font('Arial', '', 10)
+        pdf.cell(0, 6, periodo.descripcion, 0, 1, 'C')
+        pdf.ln(4)
+
+        pdf.set_font('Arial', 'B', 12)
+        pdf.cell(50, 10, 'Proyecto', 1, 0, 'C')
+        pdf.cell(40, 10, 'Cliente', 1, 0, 'C')
+        pdf.cell(30, 10, 'Estado', 1, 0, 'C')
+        pdf.cell(30, 10, 'Inicio', 1, 0, 'C')
+        pdf.cell(30, 10, 'Fin', 1, 1, 'C')
+
+        pdf.set_font('Arial', '', 10)
+        # Proyectos en curso en algún momento del período
+        proyectos = Proyecto.query.join(Cliente).options(db.contains_eager(Proyecto.cliente))
+        if periodo.inicio is not None:
+            proyectos = proyectos.filter(Proyecto.fecha_inicio < periodo.fin,
+                                         Proyecto.fecha_fin >= periodo.inicio)
+        proyectos = proyectos.all()
+        for proyecto in proyectos:
+            pdf.cell(50, 10, proyecto.nombre_proyecto[:25], 1, 0)
+            pdf.cell(40, 10, proyecto.cliente.nombre_completo[:20], 1, 0)
+            pdf.cell(30, 10, proyecto.estado, 1, 0)
+            pdf.cell(30, 10, str(proyecto.fecha_inicio), 1, 0)
+            pdf.cell(30, 10, str(proyecto.fecha_fin), 1, 1)
+
+    elif tipo_reporte == 'ventas':
+        resumen = resumen_ventas(periodo, current_app.config['REPORTES_MAX_CLIENTES'])
+        totales = resumen['totales']
+
+        pdf.cell(0, 10, 'Reporte de Ventas', 0, 1, 'C')
+        pdf.set_font('Arial', '', 10)
+        pdf.cell(0, 6, periodo.descripcion, 0, 1, 'C')
+        pdf.ln(6)
+
+        for etiqueta, valor in (('Ventas', totales.ventas), ('Canceladas', totales.canceladas),
+                                ('Clientes', totales.clientes), ('Subtotal', f'${totales.subtotal:.2f}'),
+                                ('Impuesto', f'${totales.impuesto:.2f}'),
+                                ('Descuento', f'${totales.descuento:.2f}'), ('Total', f'${totales.total:.2f}')):
+            pdf.set_font('Arial', 'B', 10)
+            pdf.cell(40, 6, f'{etiqueta}:', 0, 0)
+            pdf.set_font('Arial', '', 10)
+            pdf.cell(0, 6, str(valor), 0, 1)
+        pdf.ln(5)
+
+        titulo_grupo = {'dia': 'Día', 'semana': 'Semana del', 'mes': 'Mes'}[resumen['agrupacion']]
+        pdf.set_font('Arial', 'B', 12)
+        pdf.cell(50, 10, titulo_grupo, 1, 0, 'C')
+        pdf.cell(30, 10, 'Ventas', 1, 0, 'C')
+        pdf.cell(30, 10, 'Canceladas', 1, 0, 'C')
+        pdf.cell(40, 10, 'Total', 1, 1, 'C')
+        pdf.set_font('Arial', '', 10)
+        for fila in resumen['por_periodo']:
+            pdf.cell(50, 8, fila.grupo[:7] if resumen['agrupacion'] == 'mes' else fila.grupo, 1, 0)
+            pdf.cell(30, 8, str(fila.ventas), 1, 0, 'C')
+            pdf.cell(30, 8, str(fila.canceladas), 1, 0, 'C')
+            pdf.cell(40, 8, f'${fila.total:.2f}', 1, 1, 'R')
+        pdf.ln(5)
+
+        pdf.set_font('Arial', 'B', 12)
+        pdf.cell(50, 10, 'Método de pago', 1, 0, 'C')
+        pdf.cell(30, 10, 'Ventas', 1, 0, 'C')
+        pdf.cell(40, 10, 'Total', 1, 1, 'C')
+        pdf.set_font('Arial', '', 10)
+        for fila in resumen['por_metodo']:
+            pdf.cell(50, 8, fila.metodo[:25], 1, 0)
+            pdf.cell(30, 8, str(fila.ventas), 1, 0, 'C')
+            pdf.cell(40, 8, f'${fila.total:.2f}', 1, 1, 'R')
+        pdf.ln(5)
+
+        pdf.set_font('Arial', 'B', 12)
+        pdf.cell(70, 10, 'Cliente', 1, 0, 'C')
+        pdf.cell(30, 10, 'Ventas', 1, 0, 'C')
+        pdf.cell(40, 10, 'Total', 1, 1, 'C')
+        pdf.set_font('Arial', '', 10)
+        for fila in resumen['por_cliente']:
+            pdf.cell(70, 8, f'{fila.nombre} {fila.apellido}'[:35], 1, 0)
+            pdf.cell(30, 8, str(fila.ventas), 1, 0, 'C')
+            pdf.cell(40, 8, f'${fila.total:.2f}', 1, 1, 'R')
+        otros = totales.clientes - len(resumen['por_cliente'])
+        if otros > 0:
+            pdf.cell(70, 8, f'Otros {otros} clientes', 1, 0)
+            pdf.cell(30, 8, str(totales.ventas - sum(f.ventas for f in resumen['por_cliente'])), 1, 0, 'C')
+            pdf.cell(40, 8, f"${totales.total - sum(f.total for f in resumen['por_cliente']):.2f}", 1, 1, 'R')
+
+    elif tipo_reporte == 'inventario':
+        pdf.cell(0, 10, 'Reporte de Inventario', 0, 1, 'C')
+        pdf.ln(10)
+
+        pdf.set_font('Arial', 'B', 12)
+        pdf.cell(60, 10, 'Material', 1, 0, 'C')
+        pdf.cell(40, 10, 'Categoría', 1, 0, 'C')
+        pdf.cell(30, 10, 'Cantidad', 1, 0, 'C')
+        pdf.cell(30, 10, 'Precio Unit.', 1, 1, 'C')
+
+        pdf.set_font('Arial', '', 10)
+        inventarios = Inventario.query.join(Material).options(db.contains_eager(Inventario.material)) \
+            .filter(Material.activo == True).all()
+        for inventario in inventarios:
+            pdf.cell(60, 10, inventario.material.nombre_material[:30], 1, 0)
+            pdf.cell(40, 10, inventario.material.categoria[:20], 1, 0)
+            pdf.cell(30, 10, str(inventario.cantidad), 1, 0, 'C')
+            pdf.cell(30, 10, f"${inventario.material.precio_unitario:.2f}", 1, 1, 'R')
+
+    elif tipo_reporte == 'planos':
+        pdf.cell(0, 10, 'Reporte de Planos', 0, 1, 'C')
+        pdf.set_font('Arial', '', 10)
+        pdf.cell(0, 6, periodo.descripcion, 0, 1, 'C')
+        pdf.ln(4)
+
+        pdf.set_font('Arial', 'B', 10)
+        pdf.cell(50, 8, 'Nombre Plano', 1, 0, 'C')
+        pdf.cell(40, 8, 'Proyecto', 1, 0, 'C')
+        pdf.cell(30, 8, 'Tipo', 1, 0, 'C')
+        pdf.cell(35, 8, 'Cliente', 1, 0, 'C')
+        pdf.cell(35, 8, 'Fecha', 1, 1, 'C')
+
+        pdf.set_font('Arial', '', 8)
+        planos = Plano.query.join(Proyecto).join(Cliente).join(TipoPlano).options(
+            db.contains_eager(Plano.proyecto).contains_eager(Proyecto.cliente),
+            db.contains_eager(Plano.tipo_plano)
+        ).filter(*periodo.filtro(Plano.fecha_subida)).all()
+        for plano in planos:
+            pdf.cell(50, 6, plano.nombre_plano[:25], 1, 0)
+            pdf.cell(40, 6, plano.proyecto.nombre_proyecto[:20], 1, 0)
+            pdf.cell(30, 6, plano.tipo_plano.nombre_tipo[:15], 1, 0)
+            pdf.cell(35, 6, plano.proyecto.cliente.nombre_completo[:18], 1, 0)
+            pdf.cell(35, 6, plano.fecha_subida.strftime('%Y-%m-%d'), 1, 1, 'C')
+
+    elif tipo_reporte == 'planos_proyecto':
+        proyecto = db.session.get(Proyecto, id_proyecto)
+
+        pdf.cell(0, 10, f'Reporte de Planos - {proyecto.nombre_proyecto}', 0, 1, 'C')
+        pdf.ln(5)
+
+        pdf.set_font('Arial', 'B', 10)
+        pdf.cell(40, 6, 'Cliente:', 0, 0)
+        pdf.set_font('Arial', '', 10)
+        pdf.cell(0, 6, proyecto.cliente.nombre_completo, 0, 1)
+        pdf.set_font('Arial', 'B', 10)
+        pdf.cell(40, 6, 'Estado:', 0, 0)
+        pdf.set_font('Arial', '', 10)
+        pdf.cell(0, 6, proyecto.estado.title(), 0, 1)
+        pdf.ln(5)
+
+        pdf.set_font('Arial', 'B', 10)
+        pdf.cell(70, 8, 'Nombre Plano', 1, 0, 'C')
+        pdf.cell(40, 8, 'Tipo', 1, 0, 'C')
+        pdf.cell(40, 8, 'Usuario', 1, 0, 'C')
+        pdf.cell(40, 8, 'Fecha Subida', 1, 1, 'C')
+
+        pdf.set_font('Arial', '', 9)
+        planos = Plano.query.filter_by(id_proyecto=id_proyecto).options(
+            db.joinedload(Plano.tipo_plano), db.joinedload(Plano.usuario)).all()
+        for plano in planos:
+            pdf.cell(70, 6, plano.nombre_plano[:35], 1, 0)
+            pdf.cell(40, 6, plano.tipo_plano.nombre_tipo, 1, 0)
+            pdf.cell(40, 6, plano.usuario.nombre_usuario, 1, 0)
+            pdf.cell(40, 6, plano.fecha_subida.strftime('%Y-%m-%d'), 1, 1, 'C')
+
+        pdf.ln(5)
+        pdf.set_font('Arial', 'B', 10)
+        pdf.cell(0, 6, f'Total de planos: {len(planos)}', 0, 1)
+
+    elif tipo_reporte == 'stock_bajo':
+        pdf.cell(0, 10, 'Reporte de Stock Bajo', 0, 1, 'C')
+        pdf.ln(10)
+
+        pdf.set_font('Arial', 'B', 10)
+        pdf.cell(60, 8, 'Material', 1, 0, 'C')
+        pdf.cell(30, 8, 'Cantidad', 1, 0, 'C')
+        pdf.cell(30, 8, 'Stock Min.', 1, 0, 'C')
+        pdf.cell(40, 8, 'Ubicación', 1, 1, 'C')
+
+        pdf.set_font('Arial', '', 9)
+        for inventario in inventarios_bajo_stock():
+            pdf.cell(60, 6, inventario['material'][:30], 1, 0)
+            pdf.cell(30, 6, str(inventario['cantidad']), 1, 0, 'C')
+            pdf.cell(30, 6, str(inventario['stock_minimo']), 1, 0, 'C')
+            pdf.cell(40, 6, (inventario['ubicacion'] or 'N/A')[:20], 1, 1)
+
+
+    return pdf
+
+
+def _resumen(*partes):
+    return hashlib.sha256('|'.join(str(p) for p in partes).encode('utf-8')).hexdigest()[:12]
+
+
+def clave_reporte(tipo_reporte, periodo, id_proyecto=None):
+    """Clave de caché: tipo, parámetros del reporte y versión de los datos que lee.
+
+    Cualquier escritura en esas tablas cambia la versión y con ella la clave,
+    por lo que un PDF en caché nunca está desactualizado.
+    """
+    version = version_datos(*TABLAS_REPORTE[tipo_reporte])
+    return f'{tipo_reporte}-{_resumen(tipo_reporte, periodo, id_proyecto)}-{_resumen(version)}'
+
+
+def tipo_de_clave(clave):
+    """Tipo de reporte de una clave válida, o None si la clave no es válida"""
+    coincidencia = _PATRON_CLAVE.match(clave)
+    if not coincidencia or coincidencia.group(1) not in TABLAS_REPORTE:
+        return None
+    return coincidencia.group(1)
+
+
+def carpeta_reportes(app):
+    carpeta = os.path.abspath(app.config['CARPETA_REPORTES'])
+    os.makedirs(carpeta, exist_ok=True)
+    return carpeta
+
+
+def ruta_reporte(app, clave):
+    return os.path.join(carpeta_reportes(app), f'{clave}.pdf')
+
+
+def estado_reporte(app, clave):
+    """'completado', 'error', 'pendiente' o None si el trabajo no existe o quedó abandonado"""
+    ruta = ruta_reporte(app, clave)
+    if os.path.exists(ruta):
+        return 'completado'
+    if os.path.exists(ruta + '.error'):
+        return 'error'
+    marcador = ruta + '.pendiente'
+    if os.path.exists(marcador):
+        if time.time() - os.path.getmtime(marcador) < app.config['REPORTES_TIEMPO_MAXIMO']:
+            return 'pendiente'
+    return None
+
+
+def error_reporte(app, clave):
+    with open(ruta_reporte(app, clave) + '.error', encoding='utf-8') as archivo:
+        return archivo.read()
+
+
+def solicitar_reporte(app, tipo_reporte, periodo, id_proyecto=None):
+    """Devolver la clave del reporte, encolando su generación si no está en caché.
+
+    La clave usa las fechas ya resueltas del período: 'este_mes' deja de
+    servir el PDF del mes anterior cuando cambia el mes.
+    """
+    if tipo_reporte != 'planos_proyecto':
+        id_proyecto = None
+    if tipo_reporte not in TIPOS_CON_PERIODO:
+        periodo = Periodo('todos')
+    clave = clave_reporte(tipo_reporte, periodo, id_proyecto)
+    if estado_reporte(app, clave) in ('completado', 'pendiente'):
+        return clave
+
+    ruta = ruta_reporte(app, clave)
+    if os.path.exists(ruta + '.error'):
+        os.remove(ruta + '.error')
+    with open(ruta + '.pendiente', 'w', encoding='utf-8') as marcador:
+        marcador.write(str(time.time()))
+    enviar_trabajo(app, generar_reporte_en_trabajador, tipo_reporte, periodo, id_proyecto, ruta)
+    return clave
+
+
+def generar_reporte_en_trabajador(tipo_reporte, periodo, id_proyecto, ruta):
+    """Trabajo del pool: construir el PDF y guardarlo de forma atómica en `ruta`"""
+    temporal = f'{ruta}.{os.getpid()}.tmp'
+    try:
+        with app_trabajador().app_context():
+            pdf = construir_reporte(tipo_reporte, periodo, id_proyecto)
+            pdf.output(temporal)
+        os.replace(temporal, ruta)
+
+        # Las versiones anteriores del mismo reporte ya no se pueden pedir
+        prefijo = ruta.rsplit('-', 1)[0]
+        for anterior in glob.glob(f'{prefijo}-*.pdf'):
+            if anterior != ruta:
+                os.remove(anterior)
+    except Exception as e:
+        with open(ruta + '.error', 'w', encoding='utf-8') as archivo:
+            archivo.write(str(e))
+    finally:
+        for sobrante in (temporal, ruta + '.pendiente'):
+            if os.path.exists(sobrante):
+                os.remove(sobrante)
@@ -1,320 +1,602 @@
-// JavaScript principal para As Plot Center
-
-document.addEventListener('DOMContentLoaded', function() {
-    // Inicializar funcionalidades
-    initializeFlashMessages();
-    initializeFileUpload();
-    initializeFormValidation();
-    initializeSearch();
-    initializeModals();
-});
-
-// Manejo de mensajes flash
-function initializeFlashMessages() {
-    const flashMessages = document.querySelectorAll('.flash-message');
-    
-    flashMessages.forEach(message => {
-        // Auto-ocultar mensajes después de 5 segundos
-        setTimeout(() => {
-            message.style.opacity = '0';
-            setTimeout(() => {
-                message.remove();
-            }, 300);
-        }, 5000);
-    });
-}
-
-// Manejo de subida de archivos
-function initializeFileUpload() {
-    const fileInputs = document.querySelectorAll('input[type="file"]');
-    
-    fileInputs.forEach(input => {
-        input.addEventListener('change', function(e) {
-            const file = e.target.files[0];
-            if (file) {
-                // Validar tamaño del archivo (16MB máximo)
-                const maxSize = 16 * 1024 * 1024; // 16MB en bytes
-                if (file.size > maxSize) {
-                    alert('El archivo es demasiado grande. El tamaño máximo permitido es 16MB.');
-                    input.value = '';
-                    return;
-                }
-                
-                // Validar tipo de archivo
-                const allowedTypes = ['pdf', 'dwg', 'dxf', 'jpg', 'jpeg', 'png'];
-                const fileExtension = file.name.split('.').pop().toLowerCase();
-                
-                if (!allowedTypes.includes(fileExtension)) {
-                    alert('Tipo de archivo no permitido. Formatos permitidos: PDF, DWG, DXF, JPG, PNG');
-                    input.value = '';
-                    return;
-                }
-                
-                // Mostrar información del archivo
-                showFileInfo(file);
-            }
-        });
-    });
-}
-
-// Mostrar información del archivo seleccionado
-function showFileInfo(file) {
-    const fileInfo = document.querySelector('.file-upload-info');
-    if (fileInfo) {
-        const sizeInMB = (file.size / (1024 * 1024)).toFixed(2);
-        fileInfo.innerHTML = `
-            <i class="fas fa-file"></i>
-            <p><strong>${file.name}</strong></p>
-            <p>Tamaño: ${sizeInMB} MB</p>
-            <p>Tipo: ${file.type || 'Desconocido'}</p>
-        `;
-    }
-}
-
-// Validación de formularios
-function initializeFormValidation() {
-    const forms = document.querySelectorAll('form');
-    
-    forms.forEach(form => {
-        form.addEventListener('submit', function(e) {
-            if (!validateForm(this)) {
-                e.preventDefault();
-            }
-        });
-    });
-}
-
-// Validar formulario
-function validateForm(form) {
-    let isValid = true;
-    const requiredFields = form.querySelectorAll('[required]');
-    
-    requiredFields.forEach(field => {
-        if (!field.value.trim()) {
-            showFieldError(field, 'Este campo es obligatorio');
-            isValid = false;
-        } else {
-            clearFieldError(field);
-            
-            // Validaciones específicas
-            if (field.type === 'email' && !isValidEmail(field.value)) {
-                showFieldError(field, 'Ingrese un email válido');
-                isValid = false;
-            }
-            
-            if (field.type === 'tel' && !isValidPhone(field.value)) {
-                showFieldError(field, 'Ingrese un teléfono válido');
-                isValid = false;
-            }
-        }
-    });
-    
-    return isValid;
-}
-
-// Mostrar error en campo
-function showFieldError(field, message) {
-    clearFieldError(field);
-    
-    field.style.borderColor = '#dc3545';
-    
-    const errorDiv = document.createElement('div');
-    errorDiv.className = 'field-error';
-    errorDiv.style.color = '#dc3545';
-    errorDiv.style.fontSize = '0.8rem';
-    errorDiv.style.marginTop = '0.25rem';
-    errorDiv.textContent = message;
-    
-    field.parentNode.appendChild(errorDiv);
-}
-
-// Limpiar error de campo
-function clearFieldError(field) {
-    field.style.borderColor = '';
-    
-    const existingError = field.parentNode.querySelector('.field-error');
-    if (existingError) {
-        existingError.remove();
-    }
-}
-
-// Validar email
-function isValidEmail(email) {
-    const emailRegex = /^[^\s@]+@[^\s@]+\.[^\s@]+$/;
-    return emailRegex.test(email);
-}
-
-// Validar teléfono
-function isValidPhone(phone) {
-    const phoneRegex = /^[\+]?[0-9\s\-\(\)]{10,}$/;
-    return phoneRegex.test(phone);
-}
-
-// Funcionalidad de búsqueda
-function initializeSearch() {
-    const searchInputs = document.querySelectorAll('input[type="text"][name="search"]');
-    
-    searchInputs.forEach(input => {
-        let searchTimeout;
-        
-        input.addEventListener('input', function() {
-            clearTimeout(searchTimeout);
-            
-            // Debounce: esperar 500ms después del último input
-            searchTimeout = setTimeout(() => {
-                performSearch(this);
-            }, 500);
-        });
-    });
-}
-
-// Realizar búsqueda
-function performSearch(input) {
-    const form = input.closest('form');
-    if (form) {
-        form.submit();
-    }
-}
-
-// Inicializar modales
-function initializeModals() {
-    // Confirmación de eliminación
-    const deleteButtons = document.querySelectorAll('a[href*="eliminar"]');
-    
-    deleteButtons.forEach(button => {
-        button.addEventListener('click', function(e) {
-            if (!confirm('¿Estás seguro de que quieres eliminar este elemento?')) {
-                e.preventDefault();
-            }
-        });
-    });
-}
-
-// Utilidades generales
-const Utils = {
-    // Formatear fecha
-    formatDate: function(dateString) {
-        const date = new Date(dateString);
-        return date.toLocaleDateString('es-ES', {
-            year: 'numeric',
-            month: '2-digit',
-            day: '2-digit'
-        });
-    },
-    
-    // Formatear moneda
-    formatCurrency: function(amount) {
-        return new Intl.NumberFormat('es-VE', {
-            style: 'currency',
-            currency: 'USD'
-        }).format(amount);
-    },
-    
-    // Mostrar loading
-    showLoading: function(element) {
-        element.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Cargando...';
-        element.disabled = true;
-    },
-    
-    // Ocultar loading
-    hideLoading: function(element, originalText) {
-        element.innerHTML = originalText;
-        element.disabled = false;
-    },
-    
-    // Copiar al portapapeles
-    copyToClipboard: function(text) {
-        navigator.clipboard.writeText(text).then(() => {
-            this.showNotification('Copiado al portapapeles', 'success');
-        }).catch(() => {
-            this.showNotification('Error al copiar', 'error');
-        });
-    },
-    
-    // Mostrar notificación
-    showNotification: function(message, type = 'info') {
-        const notification = document.createElement('div');
-        notification.className = `notification notification-${type}`;
-        notification.innerHTML = `
-            <i class="fas fa-${type === 'success' ? 'check-circle' : type === 'error' ? 'exclamation-circle' : 'info-circle'}"></i>
-            ${message}
-        `;
-        
-        // Estilos para la notificación
-        notification.style.cssText = `
-            position: fixed;
-            top: 20px;
-            right: 20px;
-            background: ${type === 'success' ? '#d4edda' : type === 'error' ? '#f8d7da' : '#d1ecf1'};
-            color: ${type === 'success' ? '#155724' : type === 'error' ? '#721c24' : '#0c5460'};
-            padding: 1rem;
-            border-radius: 6px;
-            box-shadow: 0 4px 12px rgba(0,0,0,0.15);
-            z-index: 1000;
-            display: flex;
-            align-items: center;
-            gap: 0.5rem;
-            animation: slideIn 0.3s ease;
-        `;
-        
-        document.body.appendChild(notification);
-        
-        // Auto-remover después de 3 segundos
-        setTimeout(() => {
-            notification.style.animation = 'slideOut 0.3s ease';
-            setTimeout(() => {
-                notification.remove();
-            }, 300);
-        }, 3000);
-    }
-};
-
-// Agregar estilos CSS para animaciones
-const style = document.createElement('style');
-style.textContent = `
-    @keyframes slideIn {
-        from {
-            transform: translateX(100%);
-            opacity: 0;
-        }
-        to {
-            transform: translateX(0);
-            opacity: 1;
-        }
-    }
-    
-    @keyframes slideOut {
-        from {
-            transform: translateX(0);
-            opacity: 1;
-        }
-        to {
-            transform: translateX(100%);
-            opacity: 0;
-        }
-    }
-    
-    .field-error {
-        animation: fadeIn 0.3s ease;
-    }
-    
-    @keyframes fadeIn {
-        from {
-            opacity: 0;
-            transform: translateY(-10px);
-        }
-        to {
-            opacity: 1;
-            transform: translateY(0);
-        }
-    }
-`;
-document.head.appendChild(style);
-
-// Exportar utilidades para uso global
-window.Utils = Utils;
-
-
-
-
-
+// JavaScript principal para As Plot Center
+
+document.addEventListener('DOMContentLoaded', function() {
+    // Inicializar funcionalidades
+    initializeFlashMessages();
+    initializeFileUpload();
+    initializeFormValidation();
+    initializeSearch();
+    initializeModals();
+    initializeChunkedUpload();
+    initializeLiveEvents();
+});
+
+// Manejo de mensajes flash
+function initializeFlashMessages() {
+    const flashMessages = document.querySelectorAll('.flash-message');
+    
+    flashMessages.forEach(message => {
+        // Auto-ocultar mensajes después de 5 segundos
+        setTimeout(() => {
+            message.style.opacity = '0';
+            setTimeout(() => {
+                message.remove();
+            }, 300);
+        }, 5000);
+    });
+}
+
+// Manejo de subida de archivos
+function initializeFileUpload() {
+    const fileInputs = document.querySelectorAll('input[type="file"]');
+    
+    fileInputs.forEach(input => {
+        input.addEventListener('change', function(e) {
+            const file = e.target.files[0];
+            if (file) {
+                // Validar tamaño del archivo (16MB salvo que el campo indique otro máximo)
+                const maxSize = parseInt(input.dataset.tamanoMaximo, 10) || 16 * 1024 * 1024;
+                if (file.size > maxSize) {
+                    const maxSizeInMB = Math.round(maxSize / (1024 * 1024));
+                    alert(`El archivo es demasiado grande. El tamaño máximo permitido es ${maxSizeInMB}MB.`);
+                    input.value = '';
+                    return;
+                }
+                
+                // Validar tipo de archivo (el atributo accept del campo, o los formatos de planos)
+                const allowedTypes = input.accept
+                    ? input.accept.split(',').map(ext => ext.trim().replace(/^\./, '').toLowerCase())
+                    : ['pdf', 'dwg', 'dxf', 'jpg', 'jpeg', 'png'];
+                const fileExtension = file.name.split('.').pop().toLowerCase();
+                
+                if (!allowedTypes.includes(fileExtension)) {
+                    alert(`Tipo de archivo no permitido. Formatos permitidos: ${allowedTypes.join(', ').toUpperCase()}`);
+                    input.value = '';
+                    return;
+                }
+                
+                // Mostrar información del archivo
+                showFileInfo(file);
+            }
+        });
+    });
+}
+
+// Mostrar información del archivo seleccionado
+function showFileInfo(file) {
+    const fileInfo = document.querySelector('.file-upload-info');
+    if (fileInfo) {
+        const sizeInMB = (file.size / (1024 * 1024)).toFixed(2);
+        fileInfo.innerHTML = `
+            <i class="fas fa-file"></i>
+            <p><strong>${file.name}</strong></p>
+            <p>Tamaño: ${sizeInMB} MB</p>
+            <p>Tipo: ${file.type || 'Desconocido'}</p>
+        `;
+    }
+}
+
+// Validación de formularios
+function initializeFormValidation() {
+    const forms = document.querySelectorAll('form');
+    
+    forms.forEach(form => {
+        form.addEventListener('submit', function(e) {
+            if (!validateForm(this)) {
+                e.preventDefault();
+            }
+        });
+    });
+}
+
+// Validar formulario
+function validateForm(form) {
+    let isValid = true;
+    const requiredFields = form.querySelectorAll('[required]');
+    
+    requiredFields.forEach(field => {
+        if (!field.value.trim()) {
+            showFieldError(field, 'Este campo es obligatorio');
+            isValid = false;
+        } else {
+            clearFieldError(field);
+            
+            // Validaciones específicas
+            if (field.type === 'email' && !isValidEmail(field.value)) {
+                showFieldError(field, 'Ingrese un email válido');
+                isValid = false;
+            }
+            
+            if (field.type === 'tel' && !isValidPhone(field.value)) {
+                showFieldError(field, 'Ingrese un teléfono válido');
+                isValid = false;
+            }
+        }
+    });
+    
+    return isValid;
+}
+
+// Mostrar error en campo
+function showFieldError(field, message) {
+    clearFieldError(field);
+    
+    field.style.borderColor = '#dc3545';
+    
+    const errorDiv = document.createElement('div');
+    errorDiv.className = 'field-error';
+    errorDiv.style.color = '#dc3545';
+    errorDiv.style.fontSize = '0.8rem';
+    errorDiv.style.marginTop = '0.25rem';
+    errorDiv.textContent = message;
+    
+    field.parentNode.appendChild(errorDiv);
+}
+
+// Limpiar error de campo
+function clearFieldError(field) {
+    field.style.borderColor = '';
+    
+    const existingError = field.parentNode.querySelector('.field-error');
+    if (existingError) {
+        existingError.remove();
+    }
+}
+
+// Validar email
+function isValidEmail(email) {
+    const emailRegex = /^[^\s@]+@[^\s@]+\.[^\s@]+$/;
+    return emailRegex.test(email);
+}
+
+// Validar teléfono
+function isValidPhone(phone) {
+    const phoneRegex = /^[\+]?[0-9\s\-\(\)]{10,}$/;
+    return phoneRegex.test(phone);
+}
+
+// Funcionalidad de búsqueda
+function initializeSearch() {
+    const searchInputs = document.querySelectorAll('input[type="text"][name="search"]');
+    
+    searchInputs.forEach(input => {
+        let searchTimeout;
+        
+        input.addEventListener('input', function() {
+            clearTimeout(searchTimeout);
+            
+            // Debounce: esperar 500ms después del último input
+            searchTimeout = setTimeout(() => {
+                performSearch(this);
+            }, 500);
+        });
+    });
+}
+
+// Realizar búsqueda
+function performSearch(input) {
+    const form = input.closest('form');
+    if (form) {
+        form.submit();
+    }
+}
+
+// Inicializar modales
+function initializeModals() {
+    // Confirmación de eliminación
+    const deleteButtons = document.querySelectorAll('a[href*="eliminar"]');
+    
+    deleteButtons.forEach(button => {
+        button.addEventListener('click', function(e) {
+            if (!confirm('¿Estás seguro de que quieres eliminar este elemento?')) {
+                e.preventDefault();
+            }
+        });
+    });
+}
+
+// Subida por bloques reanudable (formularios con data-subida-bloques)
+function initializeChunkedUpload() {
+    const forms = document.querySelectorAll('form[data-subida-bloques]');
+    
+    forms.forEach(form => {
+        form.addEventListener('submit', function(e) {
+            // La validación general se registra antes y puede cancelar el envío
+            if (e.defaultPrevented) {
+                return;
+            }
+            e.preventDefault();
+            
+            const file = form.querySelector('input[type="file"]').files[0];
+            const button = form.querySelector('button[type="submit"]');
+            const originalText = button.innerHTML;
+            Utils.showLoading(button);
+            
+            uploadInChunks(form, file)
+                .then(result => {
+                    window.location = result.url;
+                })
+                .catch(error => {
+                    Utils.hideLoading(button, originalText);
+                    Utils.showNotification(error.message, 'error');
+                });
+        });
+    });
+}
+
+// Clave para recordar una subida y reanudarla si se vuelve a elegir el mismo archivo
+function uploadStorageKey(file) {
+    return `subida:${file.name}:${file.size}:${file.lastModified}`;
+}
+
+// Enviar una petición y devolver el JSON, o lanzar un error con el mensaje del servidor
+async function requestJson(url, options) {
+    const response = await fetch(url, options);
+    const data = await response.json().catch(() => ({}));
+    if (!response.ok) {
+        const error = new Error(data.error || `Error ${response.status}`);
+        error.status = response.status;
+        error.data = data;
+        throw error;
+    }
+    return data;
+}
+
+// SHA-256 en hexadecimal (solo disponible en contextos seguros: HTTPS o localhost)
+async function sha256Hex(buffer) {
+    if (!window.crypto || !window.crypto.subtle) {
+        return null;
+    }
+    const digest = await window.crypto.subtle.digest('SHA-256', buffer);
+    return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+}
+
+// Obtener la subida guardada para este archivo o iniciar una nueva
+async function startOrResumeUpload(form, file) {
+    const key = uploadStorageKey(file);
+    const savedUrl = localStorage.getItem(key);
+    if (savedUrl) {
+        try {
+            return await requestJson(savedUrl, { method: 'GET' });
+        } catch (error) {
+            localStorage.removeItem(key);
+        }
+    }
+    
+    const upload = await requestJson(form.dataset.subidaBloques, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ nombre_archivo: file.name, tamano: file.size })
+    });
+    localStorage.setItem(key, upload.url);
+    return upload;
+}
+
+// Enviar un bloque con su checksum, reintentando ante fallos de red
+async function sendChunk(upload, file, offset) {
+    const end = Math.min(offset + upload.tamano_bloque, file.size);
+    const chunk = await file.slice(offset, end).arrayBuffer();
+    const headers = { 'Content-Range': `bytes ${offset}-${end - 1}/${file.size}` };
+    const checksum = await sha256Hex(chunk);
+    if (checksum) {
+        headers['X-Checksum-SHA256'] = checksum;
+    }
+    
+    for (let attempt = 0; ; attempt++) {
+        try {
+            return await requestJson(upload.url, { method: 'PUT', headers: headers, body: chunk });
+        } catch (error) {
+            // 409: el servidor ya tenía otro desplazamiento, se continúa desde ahí
+            if (error.status === 409 && error.data.desplazamiento !== undefined) {
+                return { desplazamiento: error.data.desplazamiento };
+            }
+            if ((error.status && error.status < 500 && error.status !== 422) || attempt >= 4) {
+                throw error;
+            }
+            await new Promise(resolve => setTimeout(resolve, 1000 * 2 ** attempt));
+        }
+    }
+}
+
+// Subir el archivo por bloques y registrar el plano al terminar
+async function uploadInChunks(form, file) {
+    const upload = await startOrResumeUpload(form, file);
+    const info = form.querySelector('.file-upload-info');
+    let offset = upload.desplazamiento;
+    
+    while (offset < file.size) {
+        if (info) {
+            const percent = Math.floor(offset * 100 / file.size);
+            info.innerHTML = `
+                <i class="fas fa-cloud-upload-alt"></i>
+                <p><strong>${file.name}</strong></p>
+                <p>Subiendo... ${percent}%</p>
+            `;
+        }
+        offset = (await sendChunk(upload, file, offset)).desplazamiento;
+    }
+    
+    const formData = new FormData(form);
+    formData.delete('archivo');
+    const result = await requestJson(`${upload.url}/completar`, { method: 'POST', body: formData });
+    localStorage.removeItem(uploadStorageKey(file));
+    return result;
+}
+
+// Eventos en vivo (Server-Sent Events). Una sola conexión por página: la del
+// dashboard (/dashboard/eventos) trae también los avisos de stock bajo que el
+// resto de páginas recibe por /inventario/alertas
+function initializeLiveEvents() {
+    const dashboard = document.querySelector('[data-eventos-dashboard]');
+    const url = dashboard ? dashboard.dataset.eventosDashboard : document.body.dataset.alertasStock;
+    if (!url || !window.EventSource) {
+        return;
+    }
+    
+    const handlers = Object.assign(stockAlertHandlers(), dashboard ? dashboardHandlers() : {});
+    
+    function connect() {
+        const source = new EventSource(url);
+        Object.entries(handlers).forEach(([name, handler]) => {
+            source.addEventListener(name, e => handler(JSON.parse(e.data)));
+        });
+        
+        // EventSource reintenta solo tras un corte; si el servidor rechaza la conexión
+        // (p. ej. 503 por exceso de flujos) la cierra y hay que volver a abrirla
+        source.onerror = () => {
+            if (source.readyState === EventSource.CLOSED) {
+                setTimeout(connect, 30000);
+            }
+        };
+    }
+    
+    connect();
+}
+
+// Avisos de stock bajo: contador del menú y del inventario, y una notificación por cambio
+function stockAlertHandlers() {
+    const lowStock = new Map();
+    const badge = document.getElementById('contador-stock-bajo');
+    
+    function render() {
+        if (badge) {
+            badge.textContent = lowStock.size;
+            badge.hidden = lowStock.size === 0;
+        }
+        document.querySelectorAll('[data-stock-bajo-total]').forEach(element => {
+            element.textContent = lowStock.size;
+        });
+        document.querySelectorAll('[data-stock-bajo-aviso]').forEach(element => {
+            element.hidden = lowStock.size === 0;
+        });
+    }
+    
+    function describe(item) {
+        const location = item.ubicacion ? ` (${escapeHtml(item.ubicacion)})` : '';
+        return `${escapeHtml(item.material)}${location}: ${item.cantidad} / mínimo ${item.stock_minimo}`;
+    }
+    
+    return {
+        // Al conectar (y al reconectar) llega el conjunto completo
+        estado: data => {
+            lowStock.clear();
+            data.inventarios.forEach(item => lowStock.set(item.id_inventario, item));
+            render();
+        },
+        bajo: item => {
+            lowStock.set(item.id_inventario, item);
+            render();
+            Utils.showNotification(`Stock bajo: ${describe(item)}`, 'error');
+        },
+        cambio: item => {
+            lowStock.set(item.id_inventario, item);
+            render();
+        },
+        repuesto: item => {
+            lowStock.delete(item.id_inventario);
+            render();
+            Utils.showNotification(`Stock repuesto: ${describe(item)}`, 'success');
+        }
+    };
+}
+
+// Dashboard: tarjetas KPI y listas recientes actualizadas en el sitio, sin recargar
+function dashboardHandlers() {
+    function highlight(element) {
+        element.classList.remove('actualizado');
+        void element.offsetWidth;  // reiniciar la animación si ya estaba en curso
+        element.classList.add('actualizado');
+    }
+    
+    function capitalize(text) {
+        // Como str.title() de la plantilla
+        return text.toLowerCase().replace(/[a-záéíóúñü]+/g, word => word[0].toUpperCase() + word.slice(1));
+    }
+    
+    const renderers = {
+        proyectos: proyecto => `
+            <div class="info-item" data-id="${proyecto.id_proyecto}">
+                <i class="fas fa-folder"></i>
+                <div class="info-content">
+                    <strong>${escapeHtml(proyecto.nombre_proyecto)}</strong>
+                    <span>${escapeHtml(proyecto.cliente)}</span>
+                </div>
+                <span class="info-status status-${escapeHtml(proyecto.estado)}">${escapeHtml(capitalize(proyecto.estado))}</span>
+            </div>`,
+        ventas: venta => `
+            <div class="info-item" data-id="${venta.id_venta}">
+                <i class="fas fa-receipt"></i>
+                <div class="info-content">
+                    <strong>Venta #${venta.id_venta}</strong>
+                    <span>${escapeHtml(venta.cliente)}</span>
+                </div>
+                <span class="info-amount">$${venta.total.toFixed(2)}</span>
+            </div>`
+    };
+    
+    function renderList(name, items) {
+        const list = document.querySelector(`[data-lista-dashboard="${name}"]`);
+        if (!list) {
+            return;
+        }
+        const previous = new Set([...list.children].map(item => item.dataset.id));
+        list.innerHTML = items.map(renderers[name]).join('');
+        [...list.children].forEach(item => {
+            if (!previous.has(item.dataset.id)) {
+                highlight(item);
+            }
+        });
+    }
+    
+    return {
+        // Solo llegan los totales que cambiaron (todos al conectar)
+        totales: totals => {
+            Object.entries(totals).forEach(([field, value]) => {
+                document.querySelectorAll(`[data-kpi="${field}"]`).forEach(element => {
+                    const text = 'kpiImporte' in element.dataset ? `$ ${value.toFixed(0)}` : String(value);
+                    if (element.textContent !== text) {
+                        element.textContent = text;
+                        highlight(element);
+                    }
+                });
+            });
+        },
+        proyectos: data => renderList('proyectos', data.proyectos),
+        ventas: data => renderList('ventas', data.ventas)
+    };
+}
+
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text;
+    return div.innerHTML;
+}
+
+// Utilidades generales
+const Utils = {
+    // Formatear fecha
+    formatDate: function(dateString) {
+        const date = new Date(dateString);
+        return date.toLocaleDateString('es-ES', {
+            year: 'numeric',
+            month: '2-digit',
+            day: '2-digit'
+        });
+    },
+    
+    // Formatear moneda
+    formatCurrency: function(amount) {
+        return new Intl.NumberFormat('es-VE', {
+            style: 'currency',
+            currency: 'USD'
+        }).format(amount);
+    },
+    
+    // Mostrar loading
+    showLoading: function(element) {
+        element.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Cargando...';
+        element.disabled = true;
+    },
+    
+    // Ocultar loading
+    hideLoading: function(element, originalText) {
+        element.innerHTML = originalText;
+        element.disabled = false;
+    },
+    
+    // Copiar al portapapeles
+    copyToClipboard: function(text) {
+        navigator.clipboard.writeText(text).then(() => {
+            this.showNotification('Copiado al portapapeles', 'success');
+        }).catch(() => {
+            this.showNotification('Error al copiar', 'error');
+        });
+    },
+    
+    // Mostrar notificación
+    showNotification: function(message, type = 'info') {
+        const notification = document.createElement('div');
+        notification.className = `notification notification-${type}`;
+        notification.innerHTML = `
+            <i class="fas fa-${type === 'success' ? 'check-circle' : type === 'error' ? 'exclamation-circle' : 'info-circle'}"></i>
+            ${message}
+        `;
+        
+        // Estilos para la notificación
+        notification.style.cssText = `
+            position: fixed;
+            top: 20px;
+            right: 20px;
+            background: ${type === 'success' ? '#d4edda' : type === 'error' ? '#f8d7da' : '#d1ecf1'};
+            color: ${type === 'success' ? '#155724' : type === 'error' ? '#721c24' : '#0c5460'};
+            padding: 1rem;
+            border-radius: 6px;
+            box-shadow: 0 4px 12px rgba(0,0,0,0.15);
+            z-index: 1000;
+            display: flex;
+            align-items: center;
+            gap: 0.5rem;
+            animation: slideIn 0.3s ease;
+        `;
+        
+        document.body.appendChild(notification);
+        
+        // Auto-remover después de 3 segundos
+        setTimeout(() => {
+            notification.style.animation = 'slideOut 0.3s ease';
+            setTimeout(() => {
+                notification.remove();
+            }, 300);
+        }, 3000);
+    }
+};
+
+// Agregar estilos CSS para animaciones
+const style = document.createElement('style');
+style.textContent = `
+    @keyframes slideIn {
+        from {
+            transform: translateX(100%);
+            opacity: 0;
+        }
+        to {
+            transform: translateX(0);
+            opacity: 1;
+        }
+    }
+    
+    @keyframes slideOut {
+        from {
+            transform: translateX(0);
+            opacity: 1;
+        }
+        to {
+            transform: translateX(100%);
+            opacity: 0;
+        }
+    }
+    
+    .field-error {
+        animation: fadeIn 0.3s ease;
+    }
+    
+    @keyframes fadeIn {
+        from {
+            opacity: 0;
+            transform: translateY(-10px);
+        }
+        to {
+            opacity: 1;
+            transform: translateY(0);
+        }
+    }
+`;
+document.head.appendChild(style);
+
+// Exportar utilidades para uso global
+window.Utils = Utils;
+
+
+
+
+
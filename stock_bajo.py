@@ -0,0 +1,197 @@
+from datetime import datetime
+
+from sqlalchemy import bindparam, delete, event, func, insert, inspect, or_, select, update
+from sqlalchemy.orm import Session
+
+from models import db, Material, Inventario, MovimientoInventario, StockBajo, EventoStock
+
+
+# Eventos que se conservan en eventos_stock. Solo los leen los flujos SSE
+# abiertos, que van a pocos segundos del último; los anteriores se borran
+EVENTOS_CONSERVADOS = 10000
+
+
+def _condicion_bajo(inventario, material):
+    return (material.c.activo == True) & (inventario.c.cantidad <= material.c.stock_minimo)
+
+
+def actualizar_stock_bajo(conexion, ids_inventario=(), ids_material=()):
+    """Recalcular la pertenencia al conjunto de los inventarios indicados o de esos materiales.
+
+    Compara con lo guardado y escribe solo las diferencias, con un evento por
+    cada inventario que entra ('bajo'), cambia estando dentro ('cambio') o
+    sale ('repuesto'). Las escrituras Core masivas sobre inventario o
+    materiales la llaman directamente, como con aplicar_deltas.
+    """
+    if not ids_inventario and not ids_material:
+        return
+    inventario, material, stock_bajo = Inventario.__table__, Material.__table__, StockBajo.__table__
+
+    afectados = []
+    if ids_inventario:
+        afectados.append(inventario.c.id_inventario.in_(sorted(ids_inventario)))
+    if ids_material:
+        afectados.append(inventario.c.id_material.in_(sorted(ids_material)))
+    actuales = {
+        fila.id_inventario: fila for fila in conexion.execute(
+            select(inventario.c.id_inventario, inventario.c.cantidad, material.c.stock_minimo,
+                   _condicion_bajo(inventario, material).label('bajo'))
+            .join(material, material.c.id_material == inventario.c.id_material)
+            .where(or_(*afectados))
+        )
+    }
+    # Los inventarios borrados ya no salen en `actuales`, pero pueden seguir en el conjunto
+    anteriores = {
+        fila.id_inventario: fila for fila in conexion.execute(
+            select(stock_bajo).where(stock_bajo.c.id_inventario.in_(sorted(set(actuales) | set(ids_inventario))))
+        )
+    }
+
+    ahora = datetime.utcnow()
+    entran, cambian, eventos = [], [], []
+    for id_inventario, fila in actuales.items():
+        anterior = anteriores.get(id_inventario)
+        if fila.bajo and anterior is None:
+            entran.append({'id_inventario': id_inventario, 'cantidad': fila.cantidad,
+                           'stock_minimo': fila.stock_minimo, 'desde': ahora})
+            eventos.append(('bajo', id_inventario, fila.cantidad, fila.stock_minimo))
+        elif fila.bajo and (anterior.cantidad, anterior.stock_minimo) != (fila.cantidad, fila.stock_minimo):
+            cambian.append({'clave': id_inventario, 'cantidad': fila.cantidad, 'stock_minimo': fila.stock_minimo})
+            eventos.append(('cambio', id_inventario, fila.cantidad, fila.stock_minimo))
+    salen = [id_inventario for id_inventario in anteriores
+             if id_inventario not in actuales or not actuales[id_inventario].bajo]
+    for id_inventario in salen:
+        fila = actuales.get(id_inventario, anteriores[id_inventario])
+        eventos.append(('repuesto', id_inventario, fila.cantidad, fila.stock_minimo))
+
+    if entran:
+        conexion.execute(insert(stock_bajo), entran)
+    if cambian:
+        conexion.execute(
+            update(stock_bajo).where(stock_bajo.c.id_inventario == bindparam('clave'))
+            .values(cantidad=bindparam('cantidad'), stock_minimo=bindparam('stock_minimo')),
+            cambian
+        )
+    if salen:
+        conexion.execute(delete(stock_bajo).where(stock_bajo.c.id_inventario.in_(salen)))
+    if eventos:
+        eventos_stock = EventoStock.__table__
+        conexion.execute(insert(eventos_stock), [
+            {'tipo': tipo, 'id_inventario': id_inventario, 'cantidad': cantidad,
+             'stock_minimo': stock_minimo, 'fecha': ahora}
+            for tipo, id_inventario, cantidad, stock_minimo in eventos
+        ])
+        # Rango sobre la clave primaria: cada escritura borra solo los pocos que quedan fuera
+        ultimo = select(func.max(eventos_stock.c.id_evento)).scalar_subquery()
+        conexion.execute(delete(eventos_stock)
+                         .where(eventos_stock.c.id_evento <= ultimo - EVENTOS_CONSERVADOS))
+
+
+def _cambio(obj, *atributos):
+    estado = inspect(obj)
+    return any(estado.attrs[atributo].history.has_changes() for atributo in atributos)
+
+
+def _actualizar_tras_flush(session, flush_context):
+    """Recalcular los inventarios tocados por el flush, ya con sus valores escritos.
+
+    Las salidas y ajustes cambian la existencia con un UPDATE directo
+    (movimientos.registrar_movimiento), así que cuentan por el movimiento
+    que añaden a la sesión.
+    """
+    ids_inventario, ids_material = set(), set()
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, (Inventario, MovimientoInventario)):
+            ids_inventario.add(obj.id_inventario)
+        elif isinstance(obj, Material):
+            ids_material.add(obj.id_material)
+    for obj in session.dirty:
+        if isinstance(obj, Inventario) and _cambio(obj, 'cantidad', 'id_material'):
+            ids_inventario.add(obj.id_inventario)
+        elif isinstance(obj, Material) and _cambio(obj, 'stock_minimo', 'activo'):
+            ids_material.add(obj.id_material)
+    actualizar_stock_bajo(session.connection(), ids_inventario, ids_material)
+
+
+def reconstruir_stock_bajo(conexion):
+    """Rellenar el conjunto desde cero (sin eventos), p. ej. tras cambios hechos fuera de la app"""
+    StockBajo.__table__.create(conexion, checkfirst=True)
+    EventoStock.__table__.create(conexion, checkfirst=True)
+    inventario, material = Inventario.__table__, Material.__table__
+    conexion.execute(delete(StockBajo.__table__))
+    conexion.execute(insert(StockBajo.__table__).from_select(
+        ['id_inventario', 'cantidad', 'stock_minimo', 'desde'],
+        select(inventario.c.id_inventario, inventario.c.cantidad, material.c.stock_minimo,
+               inventario.c.fecha_actualizacion)
+        .join(material, material.c.id_material == inventario.c.id_material)
+        .where(_condicion_bajo(inventario, material))
+    ))
+
+
+def _consulta_detalle(modelo, *columnas):
+    """SELECT de `columnas` de `modelo` con el nombre del material y la ubicación del inventario"""
+    return select(modelo.id_inventario, *columnas, Material.nombre_material.label('material'),
+                  Inventario.ubicacion) \
+        .join(Inventario, Inventario.id_inventario == modelo.id_inventario) \
+        .join(Material, Material.id_material == Inventario.id_material)
+
+
+def contar_stock_bajo():
+    """Número de inventarios con stock bajo (cuenta la tabla del conjunto, sin comparar columnas)"""
+    return db.session.query(func.count()).select_from(StockBajo).scalar()
+
+
+def inventarios_bajo_stock():
+    """Inventarios del conjunto con su material, como diccionarios listos para JSON"""
+    consulta = _consulta_detalle(StockBajo, StockBajo.cantidad, StockBajo.stock_minimo) \
+        .order_by(Material.nombre_material, StockBajo.id_inventario)
+    return [dict(fila._mapping) for fila in db.session.execute(consulta)]
+
+
+def ultimo_evento_stock():
+    return db.session.query(func.coalesce(func.max(EventoStock.id_evento), 0)).scalar()
+
+
+def eventos_stock_desde(id_evento, limite=500):
+    consulta = _consulta_detalle(EventoStock, EventoStock.cantidad, EventoStock.stock_minimo,
+                                 EventoStock.id_evento, EventoStock.tipo) \
+        .where(EventoStock.id_evento > id_evento).order_by(EventoStock.id_evento).limit(limite)
+    return [dict(fila._mapping) for fila in db.session.execute(consulta)]
+
+
+class CanalStock:
+    """Canal de avisos de stock bajo: los eventos nuevos de eventos_stock, por clave primaria"""
+
+    nombre = 'stock'
+    tablas = frozenset({Inventario.__tablename__, Material.__tablename__,
+                        MovimientoInventario.__tablename__})
+
+    def __init__(self):
+        self._ultimo = 0
+
+    def iniciar(self):
+        self._ultimo = ultimo_evento_stock()
+
+    def leer(self):
+        nuevos = eventos_stock_desde(self._ultimo)
+        if nuevos:
+            self._ultimo = nuevos[-1]['id_evento']
+        return [(evento.pop('tipo'), evento) for evento in nuevos]
+
+    def estado(self):
+        return [('estado', {'inventarios': inventarios_bajo_stock()})]
+
+
+def init_stock_bajo(app):
+    """Registrar el mantenimiento del conjunto, su canal de avisos y su comando"""
+    if not event.contains(Session, 'after_flush', _actualizar_tras_flush):
+        event.listen(Session, 'after_flush', _actualizar_tras_flush)
+
+    app.extensions['difusor_sse'].registrar(CanalStock())
+
+    @app.cli.command('reconstruir-stock-bajo')
+    def reconstruir_stock_bajo_comando():
+        """Recalcular el conjunto de stock bajo desde inventario y materiales"""
+        with db.engine.begin() as conexion:
+            reconstruir_stock_bajo(conexion)
+        print(f'✅ Conjunto reconstruido: {contar_stock_bajo()} inventarios con stock bajo')
@@ -0,0 +1,207 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+
+from almacen import TAMANO_BLOQUE, publicar_archivo
+
+
+# Subidas por bloques: cada subida es una carpeta con su estado y los bytes
+# recibidos hasta ahora. El desplazamiento actual es el tamaño de ese archivo,
+# así que una subida interrumpida se reanuda desde donde quedó en cualquier
+# proceso del servidor.
+
+ESTADO = 'estado.json'
+DATOS = 'datos'
+EN_CURSO = 'bloque.en_curso'
+
+_ID_SUBIDA = re.compile(r'^[0-9a-f]{32}$')
+_SHA256 = re.compile(r'^[0-9a-f]{64}$')
+
+
+class ErrorSubida(Exception):
+    """Petición de subida inválida; `estado` es el código HTTP de la respuesta"""
+
+    def __init__(self, mensaje, estado=400, desplazamiento=None):
+        super().__init__(mensaje)
+        self.estado = estado
+        self.desplazamiento = desplazamiento
+
+
+def carpeta_subidas(app):
+    carpeta = os.path.abspath(app.config['CARPETA_SUBIDAS'])
+    os.makedirs(carpeta, exist_ok=True)
+    return carpeta
+
+
+def _carpeta_subida(app, id_subida):
+    return os.path.join(carpeta_subidas(app), id_subida)
+
+
+def _leer_estado(carpeta):
+    with open(os.path.join(carpeta, ESTADO), encoding='utf-8') as archivo:
+        return json.load(archivo)
+
+
+def desplazamiento(app, subida):
+    """Bytes ya recibidos y guardados de la subida"""
+    return os.path.getsize(os.path.join(_carpeta_subida(app, subida['id']), DATOS))
+
+
+def limpiar_subidas_abandonadas(app):
+    """Borrar las subidas sin actividad durante más de SUBIDAS_TIEMPO_MAXIMO segundos"""
+    limite = time.time() - app.config['SUBIDAS_TIEMPO_MAXIMO']
+    for entrada in os.scandir(carpeta_subidas(app)):
+        datos = os.path.join(entrada.path, DATOS)
+        ultima_actividad = os.path.getmtime(datos) if os.path.exists(datos) else entrada.stat().st_mtime
+        if ultima_actividad < limite:
+            shutil.rmtree(entrada.path, ignore_errors=True)
+
+
+def crear_subida(app, id_usuario, nombre_archivo, tamano, sha256=None):
+    """Iniciar una subida y devolver su estado. `sha256` (opcional) es el hash del archivo completo"""
+    if tamano <= 0 or tamano > app.config['TAMANO_MAXIMO_PLANO']:
+        raise ErrorSubida('Tamaño de archivo no válido', 413)
+    if sha256 is not None and not _SHA256.match(sha256):
+        raise ErrorSubida('Hash SHA-256 no válido')
+
+    limpiar_subidas_abandonadas(app)
+    subida = {
+        'id': uuid.uuid4().hex,
+        'id_usuario': id_usuario,
+        'nombre_archivo': nombre_archivo,
+        'tamano': tamano,
+        'sha256': sha256,
+        'creada': time.time(),
+    }
+    carpeta = _carpeta_subida(app, subida['id'])
+    os.makedirs(carpeta)
+    open(os.path.join(carpeta, DATOS), 'wb').close()
+    with open(os.path.join(carpeta, ESTADO), 'w', encoding='utf-8') as archivo:
+        json.dump(subida, archivo)
+    return subida
+
+
+def obtener_subida(app, id_subida, id_usuario):
+    """Estado de una subida del usuario, o None si no existe"""
+    if not _ID_SUBIDA.match(id_subida):
+        return None
+    carpeta = _carpeta_subida(app, id_subida)
+    if not os.path.exists(os.path.join(carpeta, ESTADO)):
+        return None
+    subida = _leer_estado(carpeta)
+    return subida if subida['id_usuario'] == id_usuario else None
+
+
+def _reservar_subida(app, carpeta):
+    """Marcar la subida como ocupada por un bloque; False si otro bloque se está escribiendo.
+
+    El marcador se crea con O_EXCL: de dos peticiones con el mismo bloque
+    (un cliente que reintenta mientras la primera sigue en curso) solo una
+    lo consigue. Un marcador con más de SUBIDAS_TIEMPO_BLOQUE segundos es
+    de un proceso que murió a medias y se descarta.
+    """
+    marcador = os.path.join(carpeta, EN_CURSO)
+    for _intento in range(2):
+        try:
+            os.close(os.open(marcador, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(marcador) < app.config['SUBIDAS_TIEMPO_BLOQUE']:
+                    return False
+                os.remove(marcador)
+            except FileNotFoundError:
+                pass  # la otra petición acaba de terminar
+    return False
+
+
+def escribir_bloque(app, subida, inicio, flujo, longitud, sha256_bloque=None):
+    """Añadir un bloque a partir del byte `inicio` y devolver el nuevo desplazamiento.
+
+    El bloque se copia al disco por partes mientras se calcula su SHA-256,
+    sin tenerlo entero en memoria. Si el hash no coincide con `sha256_bloque`
+    se descartan sus bytes y el cliente debe reenviarlo desde el mismo `inicio`.
+    Los bloques de una misma subida se escriben de uno en uno.
+    """
+    carpeta = _carpeta_subida(app, subida['id'])
+    if not _reservar_subida(app, carpeta):
+        raise ErrorSubida('Otro bloque de esta subida se está recibiendo', 409,
+                          desplazamiento(app, subida))
+    try:
+        return _escribir_bloque(app, subida, inicio, flujo, longitud, sha256_bloque)
+    finally:
+        try:
+            os.remove(os.path.join(carpeta, EN_CURSO))
+        except FileNotFoundError:
+            pass  # la subida se descartó mientras tanto
+
+
+def _escribir_bloque(app, subida, inicio, flujo, longitud, sha256_bloque):
+    actual = desplazamiento(app, subida)
+    if inicio != actual:
+        # Bloque repetido o fuera de orden: el cliente reanuda desde `actual`
+        raise ErrorSubida('El bloque no continúa la subida', 409, actual)
+    if longitud is None or longitud <= 0:
+        raise ErrorSubida('Falta el contenido del bloque', 411, actual)
+    if longitud > app.config['TAMANO_BLOQUE_SUBIDA'] or inicio + longitud > subida['tamano']:
+        raise ErrorSubida('El bloque excede el tamaño permitido', 413, actual)
+    if sha256_bloque is not None and not _SHA256.match(sha256_bloque):
+        raise ErrorSubida('Hash SHA-256 del bloque no válido', 400, actual)
+
+    sha = hashlib.sha256()
+    recibidos = 0
+    ruta = os.path.join(_carpeta_subida(app, subida['id']), DATOS)
+    with open(ruta, 'r+b') as datos:
+        datos.seek(inicio)
+        try:
+            while recibidos < longitud:
+                parte = flujo.read(min(TAMANO_BLOQUE, longitud - recibidos))
+                if not parte:
+                    break
+                sha.update(parte)
+                datos.write(parte)
+                recibidos += len(parte)
+
+            if recibidos != longitud:
+                raise ErrorSubida('El bloque llegó incompleto', 400, inicio)
+            if sha256_bloque is not None and sha.hexdigest() != sha256_bloque:
+                raise ErrorSubida('El hash del bloque no coincide', 422, inicio)
+        except BaseException:
+            # Deshacer los bytes del bloque fallido (conexión cortada incluida)
+            datos.truncate(inicio)
+            raise
+    return inicio + longitud
+
+
+def completar_subida(app, subida):
+    """Verificar la subida terminada y pasarla al almacén de planos.
+
+    Devuelve el valor para Plano.archivo. Solo después de esta verificación
+    se debe crear el registro del plano; si su commit falla, el almacén
+    retira el archivo publicado.
+    """
+    carpeta = _carpeta_subida(app, subida['id'])
+    ruta = os.path.join(carpeta, DATOS)
+    if os.path.getsize(ruta) != subida['tamano']:
+        raise ErrorSubida('La subida no está completa', 409, os.path.getsize(ruta))
+
+    sha = hashlib.sha256()
+    with open(ruta, 'rb') as datos:
+        for bloque in iter(lambda: datos.read(TAMANO_BLOQUE), b''):
+            sha.update(bloque)
+    codigo = sha.hexdigest()
+    if subida['sha256'] is not None and codigo != subida['sha256']:
+        descartar_subida(app, subida)
+        raise ErrorSubida('El archivo recibido no coincide con el hash declarado', 422)
+
+    archivo = publicar_archivo(ruta, codigo, subida['nombre_archivo'])
+    descartar_subida(app, subida)
+    return archivo
+
+
+def descartar_subida(app, subida):
+    shutil.rmtree(_carpeta_subida(app, subida['id']), ignore_errors=True)
@@ -0,0 +1,65 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+# Ejecutor compartido por el proceso web; se crea al enviar el primer trabajo
+_ejecutor = None
+_bloqueo_ejecutor = threading.Lock()
+
+# Aplicación Flask propia de cada proceso trabajador
+_app_trabajador = None
+
+
+def _inicializar_trabajador():
+    """Crear la aplicación una sola vez por proceso trabajador"""
+    global _app_trabajador
+    from app import create_app
+    _app_trabajador = create_app()
+
+
+def app_trabajador():
+    """Aplicación Flask del proceso trabajador actual"""
+    return _app_trabajador
+
+
+def obtener_ejecutor(app):
+    """Pool de procesos para trabajos pesados (PDF, imágenes) fuera de los hilos web.
+
+    Se usa 'spawn' para que los trabajadores no hereden conexiones ni hilos
+    del proceso web.
+    """
+    global _ejecutor
+    with _bloqueo_ejecutor:
+        if _ejecutor is None:
+            _ejecutor = ProcessPoolExecutor(
+                max_workers=app.config['PROCESOS_TRABAJOS'],
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_inicializar_trabajador
+            )
+        return _ejecutor
+
+
+def _descartar_ejecutor(ejecutor):
+    """Olvidar un pool roto para que el siguiente trabajo cree otro"""
+    global _ejecutor
+    with _bloqueo_ejecutor:
+        if _ejecutor is ejecutor:
+            _ejecutor = None
+    ejecutor.shutdown(wait=False, cancel_futures=True)
+
+
+def enviar_trabajo(app, funcion, *args):
+    """Ejecutar `funcion(*args)` en el pool. `funcion` debe poder importarse a nivel de módulo.
+
+    Si un trabajador murió, el pool queda roto y rechaza todo trabajo nuevo:
+    se sustituye por uno nuevo y se reintenta una vez.
+    """
+    ejecutor = obtener_ejecutor(app)
+    try:
+        return ejecutor.submit(funcion, *args)
+    except BrokenProcessPool:
+        app.logger.warning('Pool de trabajos roto; se crea uno nuevo')
+        _descartar_ejecutor(ejecutor)
+        return obtener_ejecutor(app).submit(funcion, *args)
@@ -0,0 +1,219 @@
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import insert
+
+from models import db, Cliente, Plano, Material, Venta, DetalleVenta
+
+
+CENTIMO = Decimal('0.01')
+# Numeric(10, 2): hasta 99.999.999,99
+IMPORTE_MAXIMO = Decimal('99999999.99')
+
+METODOS_PAGO = ('efectivo', 'tarjeta', 'transferencia')
+# Estados con los que se puede registrar una venta nueva
+ESTADOS_INICIALES = ('completada', 'pendiente')
+
+
+class VentaInvalida(ValueError):
+    """Datos de venta rechazados; `errores` lista cada problema encontrado"""
+
+    def __init__(self, errores):
+        super().__init__('; '.join(errores))
+        self.errores = errores
+
+
+def _importe(valor, campo, errores):
+    """Importe no negativo con como mucho dos decimales, o None si no es válido.
+
+    Se aceptan enteros, cadenas y Decimal, nunca float: el JSON se lee con
+    parse_float=Decimal para no perder céntimos por el camino.
+    """
+    if isinstance(valor, bool) or not isinstance(valor, (int, str, Decimal)):
+        errores.append(f'{campo}: debe ser un importe')
+        return None
+    try:
+        importe = Decimal(str(valor).strip())
+    except InvalidOperation:
+        errores.append(f'{campo}: debe ser un importe')
+        return None
+    if not importe.is_finite() or importe < 0 or importe > IMPORTE_MAXIMO:
+        errores.append(f'{campo}: importe fuera de rango')
+        return None
+    if importe != importe.quantize(CENTIMO):
+        errores.append(f'{campo}: como mucho dos decimales')
+        return None
+    return importe.quantize(CENTIMO)
+
+
+def _entero(valor, campo, errores, minimo=1):
+    if isinstance(valor, bool):
+        valor = None
+    try:
+        entero = int(valor)
+    except (TypeError, ValueError):
+        errores.append(f'{campo}: debe ser un número entero')
+        return None
+    if entero < minimo or entero != Decimal(str(valor).strip()):
+        errores.append(f'{campo}: debe ser un entero mayor o igual que {minimo}')
+        return None
+    return entero
+
+
+def _referencia(valor, campo, errores):
+    """Id opcional de plano o material"""
+    if valor is None or valor == '':
+        return None
+    return _entero(valor, campo, errores)
+
+
+def validar_venta(datos, max_lineas):
+    """Validar una venta completa y calcular sus importes en una sola pasada.
+
+    `datos` es un diccionario con id_cliente, metodo_pago, estado, notas,
+    impuesto, descuento y `lineas` (descripcion, cantidad, precio_unitario y,
+    opcionalmente, descuento, id_plano e id_material). Devuelve los valores
+    listos para insertar; si hay errores lanza VentaInvalida con todos ellos.
+    """
+    if not isinstance(datos, dict):
+        raise VentaInvalida(['La venta debe ser un objeto JSON'])
+
+    errores = []
+    venta = {
+        'id_cliente': _entero(datos.get('id_cliente'), 'id_cliente', errores),
+        'metodo_pago': datos.get('metodo_pago') or 'efectivo',
+        'estado': datos.get('estado') or 'completada',
+        'notas': datos.get('notas') or '',
+        'impuesto': _importe(datos.get('impuesto', 0), 'impuesto', errores),
+        'descuento': _importe(datos.get('descuento', 0), 'descuento', errores),
+    }
+    if venta['metodo_pago'] not in METODOS_PAGO:
+        errores.append(f'metodo_pago: debe ser uno de {", ".join(METODOS_PAGO)}')
+    if venta['estado'] not in ESTADOS_INICIALES:
+        errores.append(f'estado: debe ser uno de {", ".join(ESTADOS_INICIALES)}')
+    if not isinstance(venta['notas'], str):
+        errores.append('notas: debe ser texto')
+
+    lineas = datos.get('lineas')
+    if not isinstance(lineas, list) or not lineas:
+        raise VentaInvalida(errores + ['lineas: la venta necesita al menos una línea'])
+    if len(lineas) > max_lineas:
+        raise VentaInvalida(errores + [f'lineas: como mucho {max_lineas} líneas por venta'])
+
+    subtotal = Decimal('0.00')
+    detalles = []
+    for i, linea in enumerate(lineas):
+        campo = f'lineas[{i}]'
+        if not isinstance(linea, dict):
+            errores.append(f'{campo}: debe ser un objeto')
+            continue
+        descripcion = linea.get('descripcion')
+        if not isinstance(descripcion, str) or not descripcion.strip() or len(descripcion) > 200:
+            errores.append(f'{campo}.descripcion: texto de 1 a 200 caracteres')
+        detalle = {
+            'descripcion': descripcion,
+            'cantidad': _entero(linea.get('cantidad'), f'{campo}.cantidad', errores),
+            'precio_unitario': _importe(linea.get('precio_unitario'), f'{campo}.precio_unitario', errores),
+            'descuento': _importe(linea.get('descuento', 0), f'{campo}.descuento', errores),
+            'id_plano': _referencia(linea.get('id_plano'), f'{campo}.id_plano', errores),
+            'id_material': _referencia(linea.get('id_material'), f'{campo}.id_material', errores),
+        }
+        if None not in (detalle['cantidad'], detalle['precio_unitario'], detalle['descuento']):
+            importe = detalle['cantidad'] * detalle['precio_unitario'] - detalle['descuento']
+            if importe < 0:
+                errores.append(f'{campo}.descuento: mayor que el importe de la línea')
+            subtotal += importe
+        detalles.append(detalle)
+
+    if not errores:
+        total = subtotal + venta['impuesto'] - venta['descuento']
+        if total < 0:
+            errores.append('descuento: mayor que el importe de la venta')
+        elif total > IMPORTE_MAXIMO:
+            errores.append('total: importe fuera de rango')
+    if errores:
+        raise VentaInvalida(errores)
+
+    _comprobar_referencias(venta, detalles)
+    venta.update(subtotal=subtotal, total=total, lineas=detalles)
+    return venta
+
+
+def _comprobar_referencias(venta, detalles):
+    """Comprobar con una consulta por tabla que existen el cliente, los planos y los materiales"""
+    errores = []
+    if db.session.get(Cliente, venta['id_cliente']) is None:
+        errores.append('id_cliente: el cliente no existe')
+    for modelo, clave in ((Plano, 'id_plano'), (Material, 'id_material')):
+        pedidos = {detalle[clave] for detalle in detalles if detalle[clave] is not None}
+        if not pedidos:
+            continue
+        columna = getattr(modelo, clave)
+        existentes = {valor for (valor,) in db.session.query(columna).filter(columna.in_(pedidos))}
+        for faltante in sorted(pedidos - existentes):
+            errores.append(f'{clave}: no existe {faltante}')
+    if errores:
+        raise VentaInvalida(errores)
+
+
+def registrar_venta(datos, id_usuario):
+    """Insertar una venta validada por validar_venta y todas sus líneas.
+
+    Las líneas se insertan con una sola sentencia INSERT de varias filas.
+    Devuelve la venta y los ids de sus líneas, en el orden recibido. No
+    confirma la transacción.
+    """
+    venta = Venta(
+        id_cliente=datos['id_cliente'],
+        id_usuario=id_usuario,
+        metodo_pago=datos['metodo_pago'],
+        estado=datos['estado'],
+        notas=datos['notas'],
+        subtotal=datos['subtotal'],
+        impuesto=datos['impuesto'],
+        descuento=datos['descuento'],
+        total=datos['total']
+    )
+    db.session.add(venta)
+    db.session.flush()
+
+    # Una sola sentencia de varias filas: la clave autoincremental se asigna en
+    # el orden de VALUES, así que ordenar los ids devueltos recupera el de las
+    # líneas. (sort_by_parameter_order haría un INSERT por fila en SQLite.)
+    ids_detalle = sorted(db.session.scalars(
+        insert(DetalleVenta).returning(DetalleVenta.id_detalle_venta),
+        [dict(linea, id_venta=venta.id_venta) for linea in datos['lineas']]
+    ))
+    return venta, ids_detalle
+
+
+def venta_a_json(venta, datos, ids_detalle):
+    """Representación JSON de una venta recién registrada, sin volver a leerla.
+
+    Los importes van como cadenas para conservar los céntimos exactos.
+    """
+    return {
+        'id_venta': venta.id_venta,
+        'id_cliente': venta.id_cliente,
+        'id_usuario': venta.id_usuario,
+        'fecha_venta': venta.fecha_venta.isoformat(),
+        'estado': venta.estado,
+        'metodo_pago': venta.metodo_pago,
+        'notas': venta.notas,
+        'subtotal': str(datos['subtotal']),
+        'impuesto': str(datos['impuesto']),
+        'descuento': str(datos['descuento']),
+        'total': str(datos['total']),
+        'lineas': [
+            {
+                'id_detalle_venta': id_detalle,
+                'descripcion': linea['descripcion'],
+                'cantidad': linea['cantidad'],
+                'precio_unitario': str(linea['precio_unitario']),
+                'descuento': str(linea['descuento']),
+                'subtotal': str(linea['cantidad'] * linea['precio_unitario'] - linea['descuento']),
+                'id_plano': linea['id_plano'],
+                'id_material': linea['id_material'],
+            }
+            for id_detalle, linea in zip(ids_detalle, datos['lineas'])
+        ],
+    }
@@ -0,0 +1,92 @@
+from datetime import datetime
+
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+
+from models import (db, Estadisticas, VersionTabla, Inventario, MovimientoInventario, Venta,
+                    DetalleVenta, StockBajo, EventoStock)
+
+
+# Tablas internas que no generan versión propia
+_EXCLUIDAS = {Estadisticas.__tablename__, VersionTabla.__tablename__,
+              # Derivadas de inventario y materiales, cuyas versiones ya cambian con ellas
+              StockBajo.__tablename__, EventoStock.__tablename__}
+
+# Tablas que se modifican con SQL directo al insertar filas en otra
+_MODIFICADAS_JUNTO_A = {
+    MovimientoInventario.__tablename__: {Inventario.__tablename__},
+    # Las líneas de una venta nueva se insertan en bloque junto a ella
+    Venta.__tablename__: {DetalleVenta.__tablename__},
+}
+
+
+def tablas_modificadas(session):
+    """Nombres de las tablas con filas nuevas, modificadas o eliminadas en la sesión"""
+    tablas = set()
+    for obj in list(session.new) + list(session.deleted):
+        tablas.add(obj.__table__.name)
+        tablas |= _MODIFICADAS_JUNTO_A.get(obj.__table__.name, set())
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            tablas.add(obj.__table__.name)
+    return tablas - _EXCLUIDAS
+
+
+def incrementar_versiones(conexion, tablas):
+    """Incrementar la versión de `tablas`; las escrituras Core masivas la llaman directamente"""
+    if not tablas:
+        return
+
+    tabla = VersionTabla.__table__
+    conexion.execute(
+        update(tabla)
+        .where(tabla.c.nombre_tabla.in_(sorted(tablas)))
+        .values(version=tabla.c.version + 1, fecha_actualizacion=datetime.utcnow())
+    )
+
+
+def _incrementar_versiones(session, flush_context, instances):
+    """Incrementar la versión de cada tabla afectada, en la misma transacción"""
+    incrementar_versiones(session.connection(), tablas_modificadas(session))
+
+
+def asegurar_versiones():
+    """Crear el contador de cada tabla del esquema que aún no lo tenga"""
+    existentes = {nombre for (nombre,) in db.session.query(VersionTabla.nombre_tabla)}
+    for nombre in sorted(set(db.metadata.tables) - _EXCLUIDAS - existentes):
+        db.session.add(VersionTabla(nombre_tabla=nombre, version=0))
+    db.session.commit()
+
+
+def versiones_tablas(*tablas):
+    """Versión actual de cada una de las tablas indicadas, p. ej. {'clientes': 4, 'ventas': 17}"""
+    filas = db.session.query(VersionTabla.nombre_tabla, VersionTabla.version) \
+        .filter(VersionTabla.nombre_tabla.in_(tablas)).all()
+    versiones = dict(filas)
+    return {tabla: versiones.get(tabla, 0) for tabla in tablas}
+
+
+def _firma(versiones):
+    return '|'.join(f'{tabla}:{version}' for tabla, version in sorted(versiones.items()))
+
+
+def version_datos(*tablas):
+    """Firma de la versión actual de las tablas indicadas, p. ej. 'clientes:4|ventas:17'"""
+    return _firma(versiones_tablas(*tablas))
+
+
+def version_y_fecha(*tablas):
+    """Firma de version_datos y fecha de la última escritura sobre esas tablas, en una consulta"""
+    filas = db.session.query(VersionTabla.nombre_tabla, VersionTabla.version,
+                             VersionTabla.fecha_actualizacion) \
+        .filter(VersionTabla.nombre_tabla.in_(tablas)).all()
+    versiones = dict.fromkeys(tablas, 0)
+    versiones.update({nombre: version for nombre, version, _fecha in filas})
+    fechas = [fecha for _nombre, _version, fecha in filas if fecha is not None]
+    return _firma(versiones), max(fechas, default=None)
+
+
+def init_versiones(app):
+    """Registrar el incremento de versiones en cada flush"""
+    if not event.contains(Session, 'before_flush', _incrementar_versiones):
+        event.listen(Session, 'before_flush', _incrementar_versiones)
@@ -0,0 +1,188 @@
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+from flask import url_for
+
+from almacen import hash_de_nombre, ruta_absoluta
+from trabajos import app_trabajador, enviar_trabajo
+
+
+# Formatos con vista previa; los PDF se rasterizan (primera página) con pdftoppm
+EXTENSIONES_RASTER = {'.jpg', '.jpeg', '.png'}
+EXTENSIONES_PDF = {'.pdf'}
+
+INFO = 'info.json'
+
+
+def carpeta_vistas_previas(app):
+    carpeta = os.path.abspath(app.config['CARPETA_VISTAS_PREVIAS'])
+    os.makedirs(carpeta, exist_ok=True)
+    return carpeta
+
+
+def carpeta_vista_previa(app, codigo):
+    """Carpeta con la pirámide de teselas de un archivo, identificado por su hash"""
+    return os.path.join(carpeta_vistas_previas(app), codigo)
+
+
+def admite_vista_previa(archivo):
+    """Indicar si se puede generar la pirámide para un valor de Plano.archivo"""
+    if hash_de_nombre(archivo) is None:
+        return False
+    extension = os.path.splitext(archivo)[1].lower()
+    if extension in EXTENSIONES_PDF:
+        return shutil.which('pdftoppm') is not None
+    return extension in EXTENSIONES_RASTER
+
+
+def estado_vista_previa(app, archivo):
+    """'completado', 'error', 'pendiente', 'no_disponible' o None si aún no se ha pedido"""
+    if not admite_vista_previa(archivo):
+        return 'no_disponible'
+    carpeta = carpeta_vista_previa(app, hash_de_nombre(archivo))
+    if os.path.exists(os.path.join(carpeta, INFO)):
+        return 'completado'
+    # Un fallo puede ser pasajero (disco lleno, tiempo agotado, proceso muerto): pasado
+    # el tiempo máximo se vuelve a intentar, igual que con un trabajo abandonado
+    for marcador, estado in ((carpeta + '.error', 'error'), (carpeta + '.pendiente', 'pendiente')):
+        if os.path.exists(marcador):
+            if time.time() - os.path.getmtime(marcador) < app.config['VISTAS_PREVIAS_TIEMPO_MAXIMO']:
+                return estado
+    return None
+
+
+def info_vista_previa(app, archivo):
+    """Dimensiones de la pirámide: tamaño de tesela y tamaño de cada nivel (0 = el más pequeño)"""
+    with open(os.path.join(carpeta_vista_previa(app, hash_de_nombre(archivo)), INFO),
+              encoding='utf-8') as archivo_info:
+        return json.load(archivo_info)
+
+
+def ruta_tesela(app, codigo, nivel, columna, fila):
+    return os.path.join(carpeta_vista_previa(app, codigo), str(nivel), f'{columna}_{fila}.jpg')
+
+
+def solicitar_vista_previa(app, archivo):
+    """Encolar la generación de la pirámide si no existe ni está en curso. Devuelve el estado"""
+    estado = estado_vista_previa(app, archivo)
+    if estado is not None:
+        return estado
+
+    carpeta = carpeta_vista_previa(app, hash_de_nombre(archivo))
+    if os.path.exists(carpeta + '.error'):
+        os.remove(carpeta + '.error')
+    with open(carpeta + '.pendiente', 'w', encoding='utf-8') as marcador:
+        marcador.write(str(time.time()))
+    try:
+        enviar_trabajo(app, generar_vista_previa_en_trabajador, ruta_absoluta(archivo), carpeta)
+    except Exception:
+        # Sin trabajo en curso no debe quedar como pendiente: la próxima visita lo vuelve a pedir
+        os.remove(carpeta + '.pendiente')
+        raise
+    return 'pendiente'
+
+
+def resumen_vista_previa(app, archivo):
+    """Estado de la vista previa de un plano para el visor, pidiendo su generación si falta"""
+    estado = solicitar_vista_previa(app, archivo)
+    resumen = {'estado': estado}
+    if estado == 'completado':
+        codigo = hash_de_nombre(archivo)
+        resumen['info'] = info_vista_previa(app, archivo)
+        # Prefijo común de las teselas; el visor añade /<nivel>/<columna>_<fila>.jpg
+        resumen['url_teselas'] = url_for('tesela_plano', codigo=codigo, nivel=0,
+                                         columna=0, fila=0).rsplit('/', 2)[0]
+    elif estado == 'error':
+        # El detalle (rutas del servidor incluidas) queda en el registro del trabajador
+        resumen['error'] = 'No se pudo generar la vista previa'
+    return resumen
+
+
+def _abrir_imagen(origen, app, temporal):
+    """Abrir el archivo como imagen RGB; los PDF se rasterizan antes en `temporal`"""
+    from PIL import Image
+
+    Image.MAX_IMAGE_PIXELS = app.config['VISTAS_PREVIAS_MAX_PIXELES']
+    if os.path.splitext(origen)[1].lower() in EXTENSIONES_PDF:
+        prefijo = os.path.join(temporal, 'pagina')
+        subprocess.run(
+            ['pdftoppm', '-f', '1', '-l', '1', '-singlefile', '-png',
+             '-r', str(app.config['VISTAS_PREVIAS_DPI_PDF']), origen, prefijo],
+            check=True, capture_output=True, timeout=app.config['VISTAS_PREVIAS_TIEMPO_MAXIMO']
+        )
+        origen = prefijo + '.png'
+
+    imagen = Image.open(origen)
+    if imagen.mode in ('RGBA', 'LA', 'P'):
+        # Las zonas transparentes de un plano se ven como papel blanco
+        imagen = imagen.convert('RGBA')
+        fondo = Image.new('RGB', imagen.size, 'white')
+        fondo.paste(imagen, mask=imagen.getchannel('A'))
+        return fondo
+    return imagen.convert('RGB')
+
+
+def construir_piramide(imagen, destino, tamano_tesela, calidad):
+    """Guardar en `destino` las teselas de todos los niveles y devolver la info de la pirámide.
+
+    El nivel más alto es la imagen original; cada nivel inferior mide la
+    mitad, hasta el nivel 0, que cabe en una sola tesela.
+    """
+    niveles = 1
+    while max(imagen.size) > tamano_tesela * 2 ** (niveles - 1):
+        niveles += 1
+
+    tamanos = []
+    for nivel in reversed(range(niveles)):
+        ancho, alto = imagen.size
+        tamanos.append([ancho, alto])
+        carpeta_nivel = os.path.join(destino, str(nivel))
+        os.makedirs(carpeta_nivel)
+        for fila, y in enumerate(range(0, alto, tamano_tesela)):
+            for columna, x in enumerate(range(0, ancho, tamano_tesela)):
+                tesela = imagen.crop((x, y, min(x + tamano_tesela, ancho), min(y + tamano_tesela, alto)))
+                tesela.save(os.path.join(carpeta_nivel, f'{columna}_{fila}.jpg'),
+                            'JPEG', quality=calidad, optimize=True)
+        if nivel:
+            imagen = imagen.reduce(2)
+
+    tamanos.reverse()
+    return {'tamano_tesela': tamano_tesela, 'niveles': tamanos}
+
+
+def generar_vista_previa_en_trabajador(origen, carpeta):
+    """Trabajo del pool: construir la pirámide en una carpeta temporal y publicarla de forma atómica"""
+    temporal = None
+    try:
+        app = app_trabajador()
+        temporal = tempfile.mkdtemp(dir=os.path.dirname(carpeta), suffix='.tmp')
+        imagen = _abrir_imagen(origen, app, temporal)
+        destino = os.path.join(temporal, 'teselas')
+        info = construir_piramide(imagen, destino, app.config['TESELA_TAMANO'],
+                                  app.config['TESELA_CALIDAD_JPEG'])
+        with open(os.path.join(destino, INFO), 'w', encoding='utf-8') as archivo_info:
+            json.dump(info, archivo_info)
+        if not os.path.exists(carpeta):
+            os.rename(destino, carpeta)
+    except Exception as e:
+        app_trabajador().logger.exception('No se pudo generar la vista previa de %s', origen)
+        with open(carpeta + '.error', 'w', encoding='utf-8') as archivo_error:
+            archivo_error.write(str(e))
+    finally:
+        if temporal is not None:
+            shutil.rmtree(temporal, ignore_errors=True)
+        if os.path.exists(carpeta + '.pendiente'):
+            os.remove(carpeta + '.pendiente')
+
+
+def eliminar_vista_previa(app, codigo):
+    """Borrar la pirámide de un archivo que ya no usa ningún plano"""
+    carpeta = carpeta_vista_previa(app, codigo)
+    shutil.rmtree(carpeta, ignore_errors=True)
+    for marcador in (carpeta + '.error', carpeta + '.pendiente'):
+        if os.path.exists(marcador):
+            os.remove(marcador)
@@ -0,0 +1,15 @@
+"""Punto de entrada WSGI para producción.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+La configuración sale de FLASK_CONFIG ('production' si no se indica) y la
+base de datos se prepara antes, al desplegar, con `flask inicializar-bd`.
+"""
+import os
+
+# Antes de crear la aplicación: los procesos del pool de trabajos la heredan
+os.environ.setdefault('FLASK_CONFIG', 'production')
+
+from app import create_app
+
+app = create_app()